@@ -1,6 +1,8 @@
 from src.orchestrator import run_batch_once
+from src.config import PRIVATE_KEYS
 from src.util import init_logging
 log = init_logging()  
 
 if __name__ == "__main__":
+    log.info(f"config: PRIVATE_KEYS loaded: {len(PRIVATE_KEYS)}")
     run_batch_once()
@@ -0,0 +1,85 @@
+# src/abi.py
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+from eth_abi import encode
+from eth_utils import function_signature_to_4byte_selector
+from web3 import Web3
+
+from .util import erc20_min_abi, swap_router_v3_abi, v3_factory_abi, position_manager_abi
+
+# имя -> фабрика ABI из util; ключ кэшей ниже — имя, а не сам list
+ABIS: Dict[str, Callable[[], List[dict]]] = {
+    "erc20": erc20_min_abi,
+    "router_v3": swap_router_v3_abi,
+    "factory_v3": v3_factory_abi,
+    "position_manager": position_manager_abi,
+}
+
+@lru_cache(maxsize=None)
+def abi(name: str) -> List[dict]:
+    return ABIS[name]()
+
+@lru_cache(maxsize=4096)
+def checksum(addr: str) -> str:
+    return Web3.to_checksum_address(addr)
+
+def _canonical(inp: dict) -> str:
+    t = inp["type"]
+    if t.startswith("tuple"):
+        inner = ",".join(_canonical(c) for c in inp["components"])
+        return f"({inner}){t[5:]}"
+    return t
+
+def _normalize(inp: dict, value: Any) -> Any:
+    """dict для struct -> tuple в порядке components (eth_abi хочет позиционно)."""
+    if inp["type"] == "tuple":
+        comps = inp["components"]
+        if isinstance(value, dict):
+            value = [value[c["name"]] for c in comps]
+        return tuple(_normalize(c, v) for c, v in zip(comps, value))
+    return value
+
+class FnEncoder:
+    """Селектор и типы функции считаются один раз; encode() — только eth_abi.encode."""
+    __slots__ = ("name", "inputs", "types", "signature", "selector")
+
+    def __init__(self, entry: dict):
+        self.name = entry["name"]
+        self.inputs = entry.get("inputs", [])
+        self.types = [_canonical(i) for i in self.inputs]
+        self.signature = f"{self.name}({','.join(self.types)})"
+        self.selector = function_signature_to_4byte_selector(self.signature)
+
+    def encode(self, *args: Any) -> bytes:
+        vals = [_normalize(i, a) for i, a in zip(self.inputs, args)]
+        return self.selector + encode(self.types, vals)
+
+    def encode_hex(self, *args: Any) -> str:
+        return "0x" + self.encode(*args).hex()
+
+@lru_cache(maxsize=None)
+def encoder(abi_name: str, fn_name: str) -> FnEncoder:
+    for entry in abi(abi_name):
+        if entry.get("type") == "function" and entry.get("name") == fn_name:
+            return FnEncoder(entry)
+    raise KeyError(f"{fn_name} not in {abi_name} ABI")
+
+def calldata(abi_name: str, fn_name: str, *args: Any) -> str:
+    return encoder(abi_name, fn_name).encode_hex(*args)
+
+_CONTRACTS: Dict[Tuple[int, str, str], Any] = {}
+_CONTRACTS_LOCK = threading.Lock()
+
+def contract(w3: Web3, address: str, abi_name: str):
+    """web3 Contract по (w3, address, abi) — собирается один раз."""
+    addr = checksum(address)
+    k = (id(w3), addr, abi_name)
+    c = _CONTRACTS.get(k)
+    if c is None:
+        with _CONTRACTS_LOCK:
+            c = _CONTRACTS.get(k)
+            if c is None:
+                c = _CONTRACTS[k] = w3.eth.contract(address=addr, abi=abi(abi_name))
+    return c
@@ -0,0 +1,125 @@
+# src/allowances.py
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from web3 import Web3
+
+from . import multicall
+
+MAX_UINT256 = 2**256 - 1
+
+Key = Tuple[str, str, str]
+
+def _key(owner: str, token: str, spender: str) -> Key:
+    return owner.lower(), token.lower(), spender.lower()
+
+class AllowanceLedger:
+    """
+    Локальная копия allowance(owner, token, spender).
+    Сидится одним батч-чтением, дальше живёт на наших же approve / swap / mint;
+    при неудачной tx запись сбрасывается и следующий get() перечитает цепь.
+    sink(key, value | None) — куда дублировать изменения (state store), None — никуда.
+    В sink уходит только подтверждённое: прочитанное из цепи и то, что подтвердил receipt
+    (confirm_approve / confirm_spend). Оптимистичные set / spend живут лишь в памяти.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vals: Dict[Key, int] = {}
+        self._confirmed: Dict[Key, int] = {}
+        self.sink: Optional[Callable[[Key, Optional[int]], None]] = None
+
+    def _emit(self, k: Key, v: Optional[int]) -> None:
+        if self.sink is not None:
+            self.sink(k, v)
+
+    def load(self, vals: Dict[Key, int]) -> None:
+        """Поднять сохранённые значения (без записи обратно в sink)."""
+        with self._lock:
+            for k, v in vals.items():
+                self._vals.setdefault(_key(*k), int(v))
+                self._confirmed.setdefault(_key(*k), int(v))
+
+    def seed(self, w3: Web3, triples: Iterable[Tuple[str, str, str]]) -> int:
+        # что уже известно (наши tx или восстановлено из state) — не перечитываем
+        with self._lock:
+            triples = [tr for tr in triples if _key(*tr) not in self._vals]
+        if not triples:
+            return 0
+        vals = multicall.allowances(w3, triples)
+        n = 0
+        with self._lock:
+            for (o, t, s), v in zip(triples, vals):
+                if v is not None:
+                    self._vals[_key(o, t, s)] = self._confirmed[_key(o, t, s)] = int(v)
+                    n += 1
+        if self.sink is not None:
+            for (o, t, s), v in zip(triples, vals):
+                if v is not None:
+                    self.sink(_key(o, t, s), int(v))
+        return n
+
+    def peek(self, owner: str, token: str, spender: str) -> Optional[int]:
+        with self._lock:
+            return self._vals.get(_key(owner, token, spender))
+
+    def get(self, w3: Web3, owner: str, token: str, spender: str) -> int:
+        v = self.peek(owner, token, spender)
+        if v is not None:
+            return v
+        (v,) = multicall.allowances(w3, [(owner, token, spender)])
+        if v is None:
+            raise RuntimeError(f"allowance read failed for {token}")
+        k = _key(owner, token, spender)
+        with self._lock:
+            self._vals[k] = self._confirmed[k] = int(v)
+        self._emit(k, int(v))
+        return int(v)
+
+    def set(self, owner: str, token: str, spender: str, value: int) -> None:
+        """Оптимистично, сразу после отправки approve; в sink — только из confirm_approve."""
+        with self._lock:
+            self._vals[_key(owner, token, spender)] = int(value)
+
+    def spend(self, owner: str, token: str, spender: str, amount: int) -> None:
+        """transferFrom со стороны spender (swap/mint). Бесконечный approve не убывает."""
+        k = _key(owner, token, spender)
+        with self._lock:
+            v = self._vals.get(k)
+            if v is None or v == MAX_UINT256:
+                return
+            self._vals[k] = max(0, v - int(amount))
+
+    def confirm_approve(self, owner: str, token: str, spender: str, value: int) -> None:
+        """Receipt approve со status=1."""
+        k = _key(owner, token, spender)
+        with self._lock:
+            self._confirmed[k] = int(value)
+        self._emit(k, int(value))
+
+    def confirm_spend(self, owner: str, token: str, spender: str, amount: int) -> None:
+        """Receipt swap/mint со status=1: списать amount с подтверждённого значения."""
+        k = _key(owner, token, spender)
+        with self._lock:
+            v = self._confirmed.get(k)
+            if v == MAX_UINT256:
+                return
+            if v is not None:
+                v = self._confirmed[k] = max(0, v - int(amount))
+        # подтверждённого значения не было — в базе ему тоже не место
+        self._emit(k, v)
+
+    def forget(self, owner: str, token: str, spender: str) -> None:
+        k = _key(owner, token, spender)
+        with self._lock:
+            self._vals.pop(k, None)
+            self._confirmed.pop(k, None)
+        self._emit(k, None)
+
+ALLOWANCES = AllowanceLedger()
+
+def seed_for_owners(w3: Web3, owners: Iterable[str], tokens: Iterable[str], spenders: Iterable[str]) -> int:
+    """Один батч на все (owner × token × spender) перед прогоном."""
+    tokens, spenders = list(tokens), list(spenders)
+    triples = [(o, t, s) for o in owners for t in tokens for s in spenders]
+    return ALLOWANCES.seed(w3, triples) if triples else 0
@@ -0,0 +1,271 @@
+# src/bench.py
+"""
+Бенчмарк действий на симуляторе (BACKEND=sim): время и число RPC по методам на одно действие.
+
+    python -m src.bench                              # все действия, по 20 итераций
+    python -m src.bench -n 50 --actions swap,lp      # выборочно
+    python -m src.bench --json bench.json            # сохранить результат
+    python -m src.bench --compare bench.json         # exit 1, если RPC на действие стало больше
+
+RPC считаются в двух корзинах: rpc — вызовы из потока самого действия (их стоимость в чистом виде),
+background — то, что за это время сделали общие поллеры (head / receipts).
+requests — HTTP-запросы: JSON-RPC batch — один запрос на много вызовов.
+"""
+import argparse, hashlib, json, os, platform, statistics, subprocess, sys, threading, time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+# до импорта config: симулятор, без пауз, быстрые поллеры
+_BENCH_ENV = {
+    "BACKEND": "sim",
+    "SLEEP_SCALE": "0",
+    "HEAD_POLL_INTERVAL": "0.01",
+    "RECEIPT_POLL_INTERVAL": "0.01",
+    "POOL_INDEX_PATH": "",
+    "ENABLE_DEPLOY": "0",
+}
+
+def _counting_provider_cls():
+    from web3.providers.base import JSONBaseProvider
+
+    class CountingProvider(JSONBaseProvider):
+        """Обёртка над провайдером: считает JSON-RPC вызовы по методам и по потокам."""
+
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+            self._lock = threading.Lock()
+            self.fg_thread: int | None = None
+            self.reset()
+
+        def reset(self) -> None:
+            with self._lock:
+                self.fg: Counter = Counter()
+                self.bg: Counter = Counter()
+                self.requests = 0
+
+        def _count(self, methods: Sequence[str]) -> None:
+            fg = threading.get_ident() == self.fg_thread
+            with self._lock:
+                (self.fg if fg else self.bg).update(methods)
+                if fg:
+                    self.requests += 1
+
+        def make_request(self, method, params):
+            self._count([method])
+            return self.inner.make_request(method, params)
+
+        def make_batch_request(self, calls):
+            self._count([m for m, _ in calls])
+            return self.inner.make_batch_request(calls)
+
+        def is_connected(self, show_traceback: bool = False) -> bool:
+            return self.inner.is_connected(show_traceback)
+
+    return CountingProvider
+
+def _key(name: str, i: int) -> str:
+    return "0x" + hashlib.sha256(f"og-auto-bench:{name}:{i}".encode()).hexdigest()
+
+# ---- сценарии: (w3, acct, i) -> None, одно «действие» ----
+
+def _pair(i: int) -> Tuple[str, str]:
+    from .config import TOKENS
+    syms = sorted(TOKENS)
+    a = syms[i % len(syms)]
+    b = syms[(i + 1 + i // len(syms)) % len(syms)]
+    if a == b:
+        b = syms[(syms.index(a) + 1) % len(syms)]
+    return a, b
+
+def _amount(i: int) -> int:
+    return 10**9 + 7919 * i
+
+def _sc_approve(w3, acct, i):
+    from .config import ROUTER
+    from .dex import ensure_allowance
+    ensure_allowance(w3, acct, _pair(i)[0], ROUTER, _amount(i))
+
+def _sc_swap(w3, acct, i):
+    from .config import ROUTER, V3_FEE
+    from .dex import ensure_allowance, v3_exactInputSingle
+    a, b = _pair(i)
+    ensure_allowance(w3, acct, a, ROUTER, _amount(i), wait=False)
+    v3_exactInputSingle(w3, acct, a, b, _amount(i), min_amount_out=0, fee=V3_FEE)
+
+def _sc_swap_quoted(w3, acct, i):
+    from .config import V3_FEE
+    from .plan import Swap
+    from .strategy import execute_action
+    # как в плане: котировка (slot0 + liquidity) -> amountOutMinimum -> approve + swap
+    a, b = _pair(i)
+    execute_action(w3, acct, Swap(a, b, _amount(i), V3_FEE), {})
+
+def _sc_erc20_transfer(w3, acct, i):
+    from .dex import erc20_transfer
+    erc20_transfer(w3, acct, _pair(i)[0], acct.address, _amount(i))
+
+def _sc_native_transfer(w3, acct, i):
+    from .dex import native_transfer
+    native_transfer(w3, acct, acct.address, _amount(i))
+
+def _sc_get_pool(w3, acct, i):
+    from .config import V3_FEE
+    from .dex import get_pool
+    a, b = _pair(i)
+    get_pool(w3, a, b, V3_FEE)
+
+def _sc_lp(w3, acct, i):
+    from .config import V3_FEE
+    from .liquidity import ensure_pool_and_add_liquidity
+    a, b = _pair(i)
+    ensure_pool_and_add_liquidity(w3, acct, a, b, V3_FEE, _amount(i), _amount(i + 1))
+
+def _sc_lp_new_pool(w3, acct, i):
+    from .liquidity import ensure_pool_and_add_liquidity
+    # засеяны только пулы V3_FEE — другие тиры создаются по ходу
+    fee = (100, 3000, 10000)[i % 3]
+    a, b = _pair(i // 3)
+    ensure_pool_and_add_liquidity(w3, acct, a, b, fee, _amount(i), _amount(i + 1))
+
+def _sc_run_for_wallet(w3, acct, i):
+    from .config import ROUTER, POS_MANAGER
+    from .plan import plan_for_wallet
+    from .strategy import execute_plan
+    execute_plan(w3, acct, plan_for_wallet(acct.address, f"bench:{i}"),
+                 {"ROUTER": ROUTER, "POS_MANAGER": POS_MANAGER})
+
+SCENARIOS: Dict[str, Callable[[Any, Any, int], None]] = {
+    "approve": _sc_approve,
+    "swap": _sc_swap,
+    "swap_quoted": _sc_swap_quoted,
+    "erc20_transfer": _sc_erc20_transfer,
+    "native_transfer": _sc_native_transfer,
+    "get_pool": _sc_get_pool,
+    "lp": _sc_lp,
+    "lp_new_pool": _sc_lp_new_pool,
+    "run_for_wallet": _sc_run_for_wallet,
+}
+
+def _per(c: Counter, n: int) -> Dict[str, float]:
+    return {m: round(v / n, 3) for m, v in sorted(c.items(), key=lambda kv: (-kv[1], kv[0]))}
+
+def bench_action(w3, name: str, n: int) -> Dict:
+    from .util import make_account
+    prov = w3.provider
+    fn = SCENARIOS[name]
+    walls: List[float] = []
+    # прогрев: разовые на процесс вещи (chainId, проверка Multicall3, первая голова) — не в счёт
+    fn(w3, make_account(_key(name + ":warmup", 0)), n)
+    cpu0 = time.process_time()
+    prov.fg_thread = threading.get_ident()
+    prov.reset()
+    for i in range(n):
+        # свой кошелёк на итерацию: холодный nonce/allowance, как у кошелька в батче
+        acct = make_account(_key(name, i))
+        t0 = time.perf_counter()
+        fn(w3, acct, i)
+        walls.append(time.perf_counter() - t0)
+    cpu = time.process_time() - cpu0
+    fg, bg, reqs = Counter(prov.fg), Counter(prov.bg), prov.requests
+    return {
+        "n": n,
+        "wall_ms": round(statistics.mean(walls) * 1000, 3),
+        "wall_p50_ms": round(statistics.median(walls) * 1000, 3),
+        "wall_max_ms": round(max(walls) * 1000, 3),
+        "cpu_ms": round(cpu / n * 1000, 3),
+        "rpc_total": round(sum(fg.values()) / n, 3),
+        "requests": round(reqs / n, 3),
+        "rpc": _per(fg, n),
+        "background": _per(bg, n),
+    }
+
+def _git_rev() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except Exception:
+        return None
+
+def run(actions: Sequence[str], n: int) -> Dict:
+    for k, v in _BENCH_ENV.items():
+        os.environ.setdefault(k, v)
+    from web3 import Web3
+    from .config import BACKEND
+    from .simchain import SimProvider
+    if BACKEND != "sim":
+        raise SystemExit("bench runs against the simulator only (BACKEND=sim)")
+    w3 = Web3(_counting_provider_cls()(SimProvider()))
+    res: Dict[str, Dict] = {}
+    for name in actions:
+        res[name] = bench_action(w3, name, n)
+    return {
+        "meta": {
+            "rev": _git_rev(),
+            "python": platform.python_version(),
+            "time": int(time.time()),
+            "iterations": n,
+        },
+        "actions": res,
+    }
+
+def formula(r: Dict) -> str:
+    return " + ".join(f"{v:g} {m}" for m, v in r["rpc"].items()) or "0"
+
+def compare(cur: Dict, base: Dict, wall_tolerance: float | None = None,
+            rpc_tolerance: float = 0.1) -> List[str]:
+    """
+    Регрессии относительно base: больше RPC на действие или медленнее (с допуском).
+    Сценарии детерминированы по номеру итерации, так что сравнивать имеет смысл только при том же -n;
+    допуск (5% + rpc_tolerance) — на вызовы, зависящие от тайминга поллеров (feeHistory раз в блок и т.п.).
+    """
+    out: List[str] = []
+    for name, r in cur["actions"].items():
+        b = base.get("actions", {}).get(name)
+        if not b:
+            continue
+        if b.get("n") != r.get("n"):
+            print(f"compare {name}: skipped, n={r.get('n')} vs baseline n={b.get('n')}")
+            continue
+        for m in sorted(set(r["rpc"]) | set(b["rpc"])):
+            now, was = r["rpc"].get(m, 0), b["rpc"].get(m, 0)
+            if now > was * 1.05 + rpc_tolerance:
+                out.append(f"{name}: {m} {was:g} -> {now:g} per action")
+        if wall_tolerance is not None and r["wall_ms"] > b["wall_ms"] * (1 + wall_tolerance):
+            out.append(f"{name}: wall {b['wall_ms']:.1f} -> {r['wall_ms']:.1f} ms")
+    return out
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="per-action wall/CPU time and RPC calls on the sim backend")
+    ap.add_argument("-n", type=int, default=20, help="iterations per action")
+    ap.add_argument("--actions", default=",".join(SCENARIOS))
+    ap.add_argument("--json", dest="json_path")
+    ap.add_argument("--compare", dest="baseline")
+    ap.add_argument("--wall-tolerance", type=float, default=None, help="e.g. 0.25 = fail if 25%% slower")
+    ap.add_argument("--rpc-tolerance", type=float, default=0.1, help="extra calls per action allowed")
+    args = ap.parse_args(argv)
+
+    actions = [a.strip() for a in args.actions.split(",") if a.strip()]
+    unknown = [a for a in actions if a not in SCENARIOS]
+    if unknown:
+        print("unknown actions:", ", ".join(unknown), "| known:", ", ".join(SCENARIOS))
+        return 2
+    rep = run(actions, max(1, args.n))
+    for name, r in rep["actions"].items():
+        print(f"{name:16s} {r['wall_ms']:9.2f} ms wall {r['cpu_ms']:9.2f} ms cpu "
+              f"{r['rpc_total']:6g} rpc / {r['requests']:g} req")
+        print(f"{'':16s} = {formula(r)}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=1)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(rep, json.load(f), args.wall_tolerance, args.rpc_tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
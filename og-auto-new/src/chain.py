@@ -1,9 +1,251 @@
 # src/chain.py
+import json, threading, time
+from typing import Any, List, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
 from web3 import Web3
-from .config import OG_RPC
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .config import (
+    RPC_URLS, RPC_TIMEOUT, RPC_POOL_SIZE, RPC_COOLDOWN, RPC_MAX_HEAD_LAG, RPC_HEAD_CHECK, BACKEND
+)
+from .metrics import METRICS, instrument
+
+# методы, которые нельзя повторять на другом endpoint'е: запрос мог дойти, а ответ потеряться
+_NON_IDEMPOTENT = {"eth_sendRawTransaction", "eth_sendTransaction"}
+
+# JSON-RPC ошибки самой ноды (перегрузка, лимиты, не догнала цепь), а не ответ на запрос
+_SERVER_ERROR_CODES = {-32603, -32005, -32002}
+_SERVER_ERROR_MSGS = ("header not found", "rate limit", "too many requests", "upstream", "unavailable", "timeout")
+
+def _server_error(resp: Any) -> Optional[str]:
+    for r in resp if isinstance(resp, list) else [resp]:
+        err = r.get("error") if isinstance(r, dict) else None
+        if not isinstance(err, dict):
+            continue
+        msg = str(err.get("message", "")).lower()
+        if "revert" in msg:
+            continue
+        if err.get("code") in _SERVER_ERROR_CODES or any(s in msg for s in _SERVER_ERROR_MSGS):
+            return msg or f"code {err.get('code')}"
+    return None
+
+class RPCUnavailable(ConnectionError):
+    """Ни один endpoint не принял запрос (до ноды он не дошёл)."""
+
+class _Endpoint:
+    __slots__ = ("url", "ewma_ms", "fails", "down_until", "calls", "head")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.ewma_ms: Optional[float] = None
+        self.fails = 0
+        self.down_until = 0.0
+        self.calls = 0
+        self.head: Optional[int] = None
+
+    def healthy(self, now: float) -> bool:
+        return self.down_until <= now
+
+    def ok(self, ms: float) -> None:
+        self.calls += 1
+        self.fails = 0
+        self.down_until = 0.0
+        self.ewma_ms = ms if self.ewma_ms is None else 0.8 * self.ewma_ms + 0.2 * ms
+
+    def fail(self, cooldown: float) -> None:
+        self.calls += 1
+        self.fails += 1
+        self.down_until = time.monotonic() + cooldown * (2 ** min(self.fails - 1, 5))
+
+class FailoverHTTPProvider(JSONBaseProvider):
+    """
+    Один долгоживущий провайдер на процесс:
+    общая keep-alive сессия, несколько RPC, запрос идёт в самый быстрый живой,
+    при сетевой ошибке / HTTP 4xx-5xx — на следующий.
+    Чтения уходят на следующий и при серверной JSON-RPC ошибке, и когда head endpoint'а отстаёт
+    от лучшего больше чем на max_head_lag блоков. eth_sendRawTransaction на другой endpoint
+    повторяется только если запрос точно не дошёл (не удалось соединиться / HTTP 429).
+    """
+
+    def __init__(self, urls: Sequence[str], timeout: float = RPC_TIMEOUT,
+                 pool_size: int = RPC_POOL_SIZE, cooldown: float = RPC_COOLDOWN,
+                 max_head_lag: int = RPC_MAX_HEAD_LAG, head_check: float = RPC_HEAD_CHECK):
+        super().__init__()
+        if not urls:
+            raise ValueError("at least one RPC url required")
+        self.endpoints = [_Endpoint(u) for u in urls]
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.max_head_lag = int(max_head_lag)
+        self.head_check = float(head_check)
+        self._best_head = 0
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints), pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+    def __str__(self) -> str:
+        return f"FailoverHTTPProvider({', '.join(e.url for e in self.endpoints)})"
+
+    def _ranked(self) -> List[_Endpoint]:
+        now = time.monotonic()
+        with self._lock:
+            up = [e for e in self.endpoints if e.healthy(now)]
+            down = [e for e in self.endpoints if not e.healthy(now)]
+        # неизмеренные пробуем первыми, чтобы у всех появилась латентность
+        up.sort(key=lambda e: -1.0 if e.ewma_ms is None else e.ewma_ms)
+        # если лежат все — всё равно пробуем, начиная с того, кто раньше «оживёт»
+        down.sort(key=lambda e: e.down_until)
+        return up + down
+
+    def _demote(self, ep: _Endpoint) -> None:
+        with self._lock:
+            ep.fail(self.cooldown)
+        METRICS.inc("rpc_endpoint_errors_total", endpoint=ep.url)
+
+    def _post(self, body: bytes, idempotent: bool = True, method: Optional[str] = None) -> Tuple[Any, _Endpoint]:
+        """POST в лучший живой endpoint -> (разобранный JSON, endpoint)."""
+        last_exc: Optional[Exception] = None
+        last: Optional[Tuple[Any, _Endpoint]] = None
+        for attempt, ep in enumerate(self._ranked()):
+            t0 = time.perf_counter()
+            METRICS.inc("rpc_endpoint_requests_total", endpoint=ep.url)
+            try:
+                r = self.session.post(ep.url, data=body, timeout=self.timeout)
+                r.raise_for_status()
+                resp = json.loads(r.content)
+            except (requests.RequestException, ValueError) as e:
+                self._demote(ep)
+                sent_maybe = not (isinstance(e, requests.ConnectTimeout) or (
+                    isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code == 429))
+                if not idempotent and sent_maybe:
+                    # tx могла уйти в сеть — повтор на другом RPC не нужен, решает вызывающий
+                    raise
+                last_exc = e
+                continue
+            dt = time.perf_counter() - t0
+            if idempotent:
+                bad = _server_error(resp)
+                if bad is None and method == "eth_blockNumber":
+                    bad = self._head_lag(ep, resp)
+                if bad is not None:
+                    self._demote(ep)
+                    last_exc, last = RuntimeError(f"{ep.url}: {bad}"), (resp, ep)
+                    continue
+            with self._lock:
+                ep.ok(dt * 1000.0)
+            METRICS.observe("rpc_endpoint_latency_seconds", dt, endpoint=ep.url)
+            if attempt:
+                METRICS.inc("rpc_retries_total", endpoint=ep.url)
+            return resp, ep
+        if last is not None:
+            # все ответили ошибкой — отдаём её как есть, пусть разбирается web3
+            return last
+        raise RPCUnavailable(f"all RPC endpoints failed: {last_exc}")
+
+    def _head_lag(self, ep: _Endpoint, resp: Any) -> Optional[str]:
+        try:
+            head = int(resp["result"], 16)
+        except (KeyError, TypeError, ValueError):
+            return None
+        with self._lock:
+            ep.head = head
+            self._best_head = max(self._best_head, head)
+            lag = self._best_head - head
+        return f"head {head} lags by {lag} blocks" if lag > self.max_head_lag else None
+
+    def _check_heads(self) -> None:
+        """Раз в head_check сек. спросить head у всех endpoint'ов: отстающие уходят в аут."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self.endpoints) < 2 or now - self._checked < self.head_check:
+                return
+            self._checked = now
+        body = self.encode_rpc_request(RPCEndpoint("eth_blockNumber"), [])
+        heads = []
+        for ep in self.endpoints:
+            try:
+                r = self.session.post(ep.url, data=body, timeout=min(self.timeout, 5.0))
+                r.raise_for_status()
+                heads.append((ep, int(json.loads(r.content)["result"], 16)))
+            except Exception:
+                continue
+        if not heads:
+            return
+        with self._lock:
+            self._best_head = max(self._best_head, max(h for _, h in heads))
+            for ep, h in heads:
+                ep.head = h
+        for ep, h in heads:
+            if self._best_head - h > self.max_head_lag:
+                self._demote(ep)
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if method == "eth_blockNumber":
+            self._check_heads()
+        resp, _ = self._post(self.encode_rpc_request(method, params),
+                             idempotent=method not in _NON_IDEMPOTENT, method=method)
+        return resp
+
+    def make_batch_request(self, calls: Sequence[Tuple[str, Any]]) -> List[RPCResponse]:
+        """JSON-RPC batch: один POST на список (method, params), ответы в исходном порядке."""
+        if not calls:
+            return []
+        reqs = [{"jsonrpc": "2.0", "method": m, "params": p, "id": i} for i, (m, p) in enumerate(calls)]
+        # batch идёт мимо web3 middleware — считаем вызовы здесь
+        for m, _ in calls:
+            METRICS.inc("rpc_requests_total", method=m)
+        idempotent = not any(m in _NON_IDEMPOTENT for m, _ in calls)
+        with METRICS.timer("rpc_latency_seconds", method="batch"):
+            resp, _ = self._post(json.dumps(reqs).encode(), idempotent=idempotent)
+        if isinstance(resp, dict):
+            # нода не умеет batch и вернула одну ошибку на всё
+            return [resp for _ in calls]
+        by_id = {r.get("id"): r for r in resp}
+        return [by_id.get(i, {"error": {"message": "missing in batch response"}}) for i in range(len(calls))]
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        try:
+            resp = self.make_request(RPCEndpoint("web3_clientVersion"), [])
+        except Exception:
+            if show_traceback:
+                raise
+            return False
+        return "error" not in resp
+
+    def stats(self) -> List[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [{
+                "url": e.url,
+                "healthy": e.healthy(now),
+                "ewma_ms": round(e.ewma_ms, 1) if e.ewma_ms is not None else None,
+                "fails": e.fails,
+                "calls": e.calls,
+                "head": e.head,
+            } for e in self.endpoints]
+
+_W3: Optional[Web3] = None
+_W3_LOCK = threading.Lock()
 
 def get_w3() -> Web3:
-    assert OG_RPC, "OG_RPC required (.env)"
-    w3 = Web3(Web3.HTTPProvider(OG_RPC, request_kwargs={"timeout": 30}))
-    assert w3.is_connected(), f"RPC not connected: {OG_RPC}"
-    return w3
\ No newline at end of file
+    """Общий Web3 на процесс (провайдер и пул соединений создаются один раз)."""
+    global _W3
+    with _W3_LOCK:
+        if _W3 is None and BACKEND == "sim":
+            from .simchain import SimProvider
+            _W3 = Web3(SimProvider())
+            instrument(_W3)
+        if _W3 is None:
+            assert RPC_URLS, "OG_RPC or RPC_URLS required (.env)"
+            w3 = Web3(FailoverHTTPProvider(RPC_URLS))
+            assert w3.is_connected(), f"RPC not connected: {', '.join(RPC_URLS)}"
+            instrument(w3)
+            _W3 = w3
+        return _W3
@@ -1,5 +1,5 @@
 # src/config.py
-import os
+import hashlib, os
 from dataclasses import dataclass
 from typing import Dict, List, Tuple
 from dotenv import load_dotenv
@@ -31,14 +31,62 @@ def _env_csv(name: str) -> List[str]:
     return [p for p in parts if p]
 
 OG_RPC = _env("OG_RPC")
+# несколько RPC через запятую; если не задано — один OG_RPC
+RPC_URLS: List[str] = _env_csv("RPC_URLS") or ([OG_RPC] if OG_RPC else [])
+RPC_TIMEOUT   = _env_float("RPC_TIMEOUT", 30)
+RPC_POOL_SIZE = _env_int("RPC_POOL_SIZE", 32)   # keep-alive соединений на endpoint
+RPC_COOLDOWN  = _env_float("RPC_COOLDOWN", 15)  # сек. в ауте после ошибки (растёт экспоненциально)
+RPC_MAX_HEAD_LAG = _env_int("RPC_MAX_HEAD_LAG", 3)      # блоков отставания от лучшего endpoint'а до ухода в аут
+RPC_HEAD_CHECK   = _env_float("RPC_HEAD_CHECK", 30)     # сек. между сверками head всех endpoint'ов
+
+# rpc — живая нода; sim — цепь в памяти (src/simchain.py) для CI и замеров
+BACKEND = _env("BACKEND", "rpc").lower()
+SIM_CHAIN_ID       = _env_int("SIM_CHAIN_ID", 16601)
+SIM_BASE_FEE       = _env_int("SIM_BASE_FEE", 1_000_000_000)
+SIM_FAUCET         = _env_int("SIM_FAUCET", 10**27)          # стартовый баланс любого EOA (нативка и токены)
+SIM_POOL_LIQUIDITY = _env_int("SIM_POOL_LIQUIDITY", 10**24)  # в каждом засеянном пуле, на каждую сторону
+SIM_WALLETS        = _env_int("SIM_WALLETS", 20)             # сколько ключей сгенерировать, если PRIVATE_KEYS пуст
 
 PRIVATE_KEYS: List[str] = _env_csv("PRIVATE_KEYS")
+if BACKEND == "sim" and not PRIVATE_KEYS:
+    # детерминированные ключи только для симулятора — в сети им делать нечего
+    PRIVATE_KEYS = ["0x" + hashlib.sha256(f"og-auto-sim:{i}".encode()).hexdigest() for i in range(SIM_WALLETS)]
 
 # Uniswap V3 addresses на Jaine (как мы уже использовали в логах)
 ROUTER = _env("ROUTER", "0xb95B5953FF8ee5D5d9818CdbEfE363ff2191318c")
 POS_MANAGER = _env("POS_MANAGER", "0x44f24B66b3BAa3A784dBeee9bFE602f15A2Cc5d9")
 V3_FACTORY = _env("V3_FACTORY", "0x7453582657F056ce5CfcEeE9E31E4BC390fa2b3c")
 V3_FEE = _env_int("V3_FEE", 500)  # 0.05%
+# QuoterV2 — запасной путь котировки, когда своп может выйти за текущий диапазон тиков; пусто = только локально
+QUOTER_V2 = _env("QUOTER_V2", "")
+
+# Котировка свопов перед отправкой: amountOutMinimum = ожидаемое * (1 - SWAP_SLIPPAGE_BPS/10000);
+# пул пустой / нет пула / цена сдвинется больше SWAP_MAX_IMPACT_BPS — своп пропускается
+SWAP_QUOTE          = _env_bool("SWAP_QUOTE", True)
+SWAP_SLIPPAGE_BPS   = _env_int("SWAP_SLIPPAGE_BPS", 50)
+SWAP_MAX_IMPACT_BPS = _env_int("SWAP_MAX_IMPACT_BPS", 300)
+# своп выходит из текущей ячейки тиков, а QUOTER_V2 не задан: локальная котировка там не точна.
+# false — amountOutMinimum по той части входа, что гарантированно исполнится в текущей ячейке; true — пропустить
+SWAP_SKIP_CROSSING  = _env_bool("SWAP_SKIP_CROSSING", False)
+
+# Multicall3 (одинаковый адрес почти во всех EVM); пусто — JSON-RPC batch вместо него
+MULTICALL3      = _env("MULTICALL3", "0xcA11bde05977b3631167028862bE2a173976CA11")
+MULTICALL_CHUNK = _env_int("MULTICALL_CHUNK", 200)
+
+# Индекс пулов: ненулевые адреса навсегда (на диске), «пула нет» — на TTL
+# у симулятора свои адреса пулов — на диск их не пишем
+POOL_INDEX_PATH = _env("POOL_INDEX_PATH", "" if BACKEND == "sim" else ".cache/pools.json")
+POOL_ZERO_TTL   = _env_float("POOL_ZERO_TTL", 60)
+
+# State store (SQLite, WAL): allowance / газ / деплои / история tx между запусками,
+# файл на каждую сеть (state.sqlite -> state.<chainId>.sqlite)
+# пусто = выключено; у симулятора цепь каждый раз новая — по умолчанию не пишем
+STATE_DB_PATH        = _env("STATE_DB_PATH", "" if BACKEND == "sim" else ".cache/state.sqlite")
+STATE_FLUSH_INTERVAL = _env_float("STATE_FLUSH_INTERVAL", 1.0)    # фоновый сброс, секунды
+STATE_ALLOWANCE_TTL  = _env_float("STATE_ALLOWANCE_TTL", 86400)  # старше — перечитать из цепи
+# Журнал батча (в той же базе): raw tx до отправки, после падения — сверка и продолжение батча
+JOURNAL_ENABLED         = _env_bool("JOURNAL_ENABLED", True)
+JOURNAL_RECOVER_TIMEOUT = _env_float("JOURNAL_RECOVER_TIMEOUT", 180)  # ждать receipt переотправленных
 
 # Токены (стандартные из твоих логов) — можно переопределить через .env, но и так ок
 TOKENS: Dict[str,str] = {
@@ -112,6 +160,8 @@ SYMBOL_TO_DECIMALS = {sym: int(meta["decimals"]) for sym, meta in TOKENS.items()
 # Параметры батча / логики
 MAX_WALLETS_PER_BATCH = _env_int("MAX_WALLETS_PER_BATCH", 5)
 RANDOM_SKIP_PROB      = _env_float("RANDOM_SKIP_PROB", 0.0)
+WALLET_CONCURRENCY    = _env_int("WALLET_CONCURRENCY", 1)  # 1 = по очереди, как раньше
+PLAN_SEED             = _env("PLAN_SEED")  # зафиксировать, чтобы воспроизвести батч
 
 SWAPS_MIN = _env_int("SWAPS_MIN", 2)
 SWAPS_MAX = _env_int("SWAPS_MAX", 4)
@@ -120,6 +170,10 @@ TRANSFERS_MIN = _env_int("TRANSFERS_MIN", 1)
 TRANSFERS_MAX = _env_int("TRANSFERS_MAX", 3)
 
 LP_PROBABILITY      = _env_float("LP_PROBABILITY", 0.6)
+# диапазон LP-позиции: ±LP_TICK_WIDTH тиков от текущей цены (выравнивается по spacing тира), 0 = full range
+LP_TICK_WIDTH       = _env_int("LP_TICK_WIDTH", 0)
+# amount0Min/amount1Min = посчитанное локально * (1 - bps/10000)
+LP_SLIPPAGE_BPS     = _env_int("LP_SLIPPAGE_BPS", 100)
 DEPLOY_PROBABILITY  = _env_float("DEPLOY_PROBABILITY", 0.4)
 
 # Сна/джиттер
@@ -132,8 +186,50 @@ SLEEP_BETWEEN: Tuple[int,int] = (
 ACTION_SLEEP_BASE: int = int(os.getenv("ACTION_SLEEP_BASE", "40"))
 ACTION_SLEEP_JITTER: int = int(os.getenv("ACTION_SLEEP_JITTER", "80"))
 
+# множитель всех пауз (0.01 — прогон на тестнете/симуляторе без ожиданий)
+SLEEP_SCALE = _env_float("SLEEP_SCALE", 1.0)
+# паузы как события в планировщике: кошельки батча идут вперемешку на SCHEDULER_WORKERS потоках
+SCHEDULED         = _env_bool("SCHEDULED", False)
+SCHEDULER_WORKERS = _env_int("SCHEDULER_WORKERS", 8)
+
+# approve сразу на MAX_UINT256 (один раз на пару token/spender) вместо точной суммы
+APPROVE_MAX = _env_bool("APPROVE_MAX", False)
+
 # Газ
-GAS_LIMIT_DEFAULT = _env_int("GAS_LIMIT_DEFAULT", 400_000)
+GAS_LIMIT_DEFAULT = _env_int("GAS_LIMIT_DEFAULT", 400_000)   # запасной, если модель и estimate молчат
+# Модель газа: лимит = перцентиль gasUsed по форме tx * (1 + margin); новая форма — eth_estimateGas
+GAS_MODEL_WINDOW      = _env_int("GAS_MODEL_WINDOW", 64)        # сколько последних receipt'ов на форму
+GAS_MODEL_PERCENTILE  = _env_float("GAS_MODEL_PERCENTILE", 95)
+GAS_MODEL_MARGIN      = _env_float("GAS_MODEL_MARGIN", 0.25)
+GAS_MODEL_MIN_SAMPLES = _env_int("GAS_MODEL_MIN_SAMPLES", 1)
+
+# Комиссии: раз в блок на весь процесс
+FEE_MODE                = _env("FEE_MODE", "auto").lower()  # auto / legacy / eip1559
+FEE_PRIORITY_PERCENTILE = _env_float("FEE_PRIORITY_PERCENTILE", 50)
+FEE_HISTORY_BLOCKS      = _env_int("FEE_HISTORY_BLOCKS", 10)
+FEE_BASE_MULTIPLIER     = _env_float("FEE_BASE_MULTIPLIER", 2.0)  # maxFee = baseFee*mult + tip
+
+# Подпись tx в пуле процессов (0 = в текущем процессе); ключи грузятся в воркер один раз
+SIGNER_WORKERS = _env_int("SIGNER_WORKERS", 0)
+SIGNER_CHUNK   = _env_int("SIGNER_CHUNK", 64)   # tx в одной посылке воркеру
+# approve на все свапы/LP батча одной пачкой до первого действия (подпись — пулом, отправка — batch)
+PREAPPROVE     = _env_bool("PREAPPROVE", False)
+
+# Метрики: RPC / действия / фазы; наружу — Prometheus на METRICS_PORT и/или JSON-дамп
+METRICS_ENABLED       = _env_bool("METRICS_ENABLED", True)
+METRICS_PORT          = _env_int("METRICS_PORT", 0)          # 0 = без HTTP
+METRICS_HOST          = _env("METRICS_HOST", "127.0.0.1")    # 0.0.0.0 — отдавать метрики наружу
+METRICS_DUMP_PATH     = _env("METRICS_DUMP_PATH")            # пусто = без дампа
+METRICS_DUMP_INTERVAL = _env_float("METRICS_DUMP_INTERVAL", 30)
+METRICS_SPANS_KEEP    = _env_int("METRICS_SPANS_KEEP", 200)  # последние span'ы с кошельком — в JSON
+
+# Голова цепи: один поллер на процесс для receipts / fees / deadline
+HEAD_POLL_INTERVAL      = _env_float("HEAD_POLL_INTERVAL", 1.0)
+
+# Receipts: один общий поллер вместо wait_for_transaction_receipt на каждую tx
+RECEIPT_POLL_INTERVAL   = _env_float("RECEIPT_POLL_INTERVAL", 1.0)
+RECEIPT_TIMEOUT         = _env_float("RECEIPT_TIMEOUT", 180)
+RECEIPT_BLOCK_SCAN_MAX  = _env_int("RECEIPT_BLOCK_SCAN_MAX", 16)  # больше блоков за раз — поштучно
 
 # LLM (Nous + OpenRouter)
 NOUS_API_KEY   = _env("NOUS_API_KEY")
@@ -145,12 +241,15 @@ OPENROUTER_BASE_URL = _env("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1"
 OPENROUTER_MODEL    = _env("OPENROUTER_MODEL", "nousresearch/hermes-3-llama-70b")
 
 LLM_TIMEOUT = _env_int("LLM_TIMEOUT", 30)
+LLM_SPEC_QUEUE       = _env_int("LLM_SPEC_QUEUE", 4)          # сколько готовых спек держать впрок
+LLM_SPEC_POP_TIMEOUT = _env_float("LLM_SPEC_POP_TIMEOUT", 0.0)  # 0 = не ждать, сразу local fallback
+LLM_SPEC_CACHE_PATH  = _env("LLM_SPEC_CACHE_PATH", ".cache/specs.json")
 
 # Вкл/выкл деплой (по умолчанию выключен, чтобы не городить солц/байткод)
 ENABLE_DEPLOY = _env_bool("ENABLE_DEPLOY", False)
+# ENABLE_DEPLOY только выбирает спеку токена; реально деплоить контракт в сеть — отдельный флаг
+DEPLOY_ONCHAIN = _env_bool("DEPLOY_ONCHAIN", False)
 
-# sanity лог
-print(f"[config] PRIVATE_KEYS loaded: {len(PRIVATE_KEYS)} шт.")
 # ---- Logging flags ----
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()  # DEBUG/INFO/WARN/ERROR
 LOG_COLOR = os.getenv("LOG_COLOR", "1") not in ("0","false","False")
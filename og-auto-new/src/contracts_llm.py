@@ -2,10 +2,15 @@ import os
 import re
 import json
 import time
+import hashlib
 import random
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any, Dict, Tuple
+from urllib.parse import urlsplit
 from .util import get_logger, short
+from .gas import shape
+from .state import get_state
 log = get_logger()
 
 # --- Config from ENV with sane defaults ---
@@ -18,6 +23,7 @@ OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/ap
 OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "nousresearch/hermes-3-llama-3.1-70b")
 
 LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "30"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "4"))
 
 ALLOWED_TYPES = {"erc20_fixed", "erc20_mintable", "erc20_capped_burnable"}
 
@@ -28,11 +34,39 @@ SYSTEM_PROMPT = (
     "\"initial_supply\": str, \"cap\": str (opt)}}"
 )
 
+BATCH_SYSTEM_PROMPT = (
+    "You generate compact JSON token specs. Output STRICT JSON only: an array of objects, "
+    "each {\"kind\": one of ['erc20_fixed','erc20_mintable','erc20_capped_burnable'], "
+    "\"params\": {\"name\": str, \"symbol\": str, \"decimals\": int, "
+    "\"initial_supply\": str, \"cap\": str (opt)}}. All names and symbols must be distinct."
+)
+LLM_SPEC_BATCH = int(os.getenv("LLM_SPEC_BATCH", "8"))
+
 # -------------------- LLM helpers --------------------
+_sessions: Dict[str, Any] = {}
+_sessions_lock = threading.Lock()
+_hedge_pool: ThreadPoolExecutor | None = None
+
+def _session(url: str):
+    """Одна keep-alive сессия на хост провайдера вместо голого requests.post."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    host = urlsplit(url).netloc
+    with _sessions_lock:
+        s = _sessions.get(host)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=LLM_POOL_SIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _sessions[host] = s
+        return s
+
 def _safe_post(url: str, headers: dict, payload: dict, timeout: int, retries: int = 3, backoff: float = 0.8):
+    import requests
     for i in range(retries):
         try:
-            r = requests.post(url, headers=headers, json=payload, timeout=timeout)
+            r = _session(url).post(url, headers=headers, json=payload, timeout=timeout)
             if r.status_code >= 400:
                 try:
                     body = r.json()
@@ -57,23 +91,23 @@ def _safe_post(url: str, headers: dict, payload: dict, timeout: int, retries: in
         except Exception:
             raise
 
-def _call_nous(user: str) -> Dict[str, Any]:
+def _call_nous(user: str, system: str = SYSTEM_PROMPT, max_tokens: int = 256) -> Dict[str, Any]:
     if not NOUS_API_KEY:
         raise RuntimeError("NOUS_API_KEY not set")
     url = f"{NOUS_BASE_URL}/chat/completions"
     payload = {
         "model": NOUS_MODEL,
         "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
         "temperature": 0.6,
-        "max_tokens": 256,
+        "max_tokens": max_tokens,
     }
     headers = {"Authorization": f"Bearer {NOUS_API_KEY}"}
     return _safe_post(url, headers, payload, LLM_TIMEOUT)
 
-def _call_openrouter(user: str) -> Dict[str, Any]:
+def _call_openrouter(user: str, system: str = SYSTEM_PROMPT, max_tokens: int = 256) -> Dict[str, Any]:
     if not OPENROUTER_API_KEY:
         raise RuntimeError("OPENROUTER_API_KEY not set")
     url = f"{OPENROUTER_BASE_URL}/chat/completions"
@@ -81,11 +115,11 @@ def _call_openrouter(user: str) -> Dict[str, Any]:
     payload = {
         "model": model,
         "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": system},
             {"role": "user", "content": user},
         ],
         "temperature": 0.6,
-        "max_tokens": 256,
+        "max_tokens": max_tokens,
     }
     headers = {
         "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -95,37 +129,105 @@ def _call_openrouter(user: str) -> Dict[str, Any]:
     }
     return _safe_post(url, headers, payload, LLM_TIMEOUT)
 
-def _local_fallback(owner_addr: str) -> Dict[str, Any]:
+def _fallback_spec(n: int, sym: int) -> Dict[str, Any]:
     return {
         "kind": "erc20_capped_burnable",
         "params": {
-            "name": f"Farm{random.randint(100,999)}",
-            "symbol": f"F{random.randint(10,99)}",
+            "name": f"Farm{n}",
+            "symbol": f"F{sym}",
             "decimals": 18,
             "initial_supply": "1000000000000000000000",
             "cap": "100000000000000000000000",
         }
     }
 
+def _local_fallback(owner_addr: str) -> Dict[str, Any]:
+    # сначала — готовые спеки из кэша, случайные имена только если он пуст
+    cache = None
+    try:
+        from .specs import get_spec_cache
+        cache = get_spec_cache()
+        cached = cache.take()
+        if cached:
+            return cached
+    except Exception as e:
+        print("[LLM] spec cache unavailable:", e)
+    for _ in range(20):
+        sel = _fallback_spec(random.randint(100, 999), random.randint(10, 99))
+        # случайные имена тоже не повторяем — ни между собой, ни с уже выданными из кэша
+        if cache is None or cache.mark_seen(sel):
+            return sel
+    # F10..F99 — всего 90 символов, и выданные копятся в кэше между запусками:
+    # когда они кончились, берём первый свободный номер от 1000 (вне случайных диапазонов)
+    n = 1000
+    while True:
+        sel = _fallback_spec(n, n)
+        if cache.mark_seen(sel):
+            return sel
+        n += 1
+
+_PROVIDERS = (("nous", _call_nous), ("openrouter", _call_openrouter))
+
+def _content_json(data: Dict[str, Any]) -> Any:
+    content = data["choices"][0]["message"]["content"].strip()
+    if content.startswith("```"):
+        # ```json ... ``` — частый ответ даже при "STRICT JSON"
+        content = content.split("\n", 1)[1] if "\n" in content else content[3:]
+        content = content.rsplit("```", 1)[0]
+    return json.loads(content)
+
+def _parse_spec(data: Dict[str, Any]) -> Dict[str, Any]:
+    sel = _content_json(data)
+    if not isinstance(sel, dict):
+        raise ValueError(f"spec is not an object: {short(str(sel), 20)}")
+    return sel
+
+def _parse_specs(data: Dict[str, Any]) -> list:
+    out = _content_json(data)
+    if isinstance(out, dict):
+        out = out.get("specs") or out.get("tokens") or [out]
+    specs = [x for x in out if isinstance(x, dict)] if isinstance(out, list) else []
+    if not specs:
+        raise ValueError("no specs in batch response")
+    return specs
+
+def _hedged(prompt: str, parse=_parse_spec, **kw) -> Tuple[str, Any]:
+    """Nous и OpenRouter параллельно, берём первый валидный ответ."""
+    global _hedge_pool
+    with _sessions_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="llm")
+    futs = {_hedge_pool.submit(lambda fn=fn: parse(fn(prompt, **kw))): name for name, fn in _PROVIDERS}
+    errors = []
+    try:
+        for f in as_completed(futs, timeout=LLM_TIMEOUT * 2):
+            try:
+                return futs[f], f.result()
+            except Exception as e:
+                errors.append(f"{futs[f]}: {e}")
+    except Exception as e:
+        errors.append(f"timeout: {e}")
+    raise RuntimeError("; ".join(errors))
+
 def selection_from_llm(owner_addr: str) -> Dict[str, Any]:
     prompt = f"Owner: {owner_addr}. Generate ERC20 spec JSON only."
-    sel = None
     try:
-        data = _call_nous(prompt)
-        content = data["choices"][0]["message"]["content"]
-        sel = json.loads(content)
-        print("[LLM] provider=nous ok")
+        provider, sel = _hedged(prompt)
+        print(f"[LLM] provider={provider} ok")
     except Exception as e:
-        print("[LLM] nous failed, fallback to openrouter:", e)
-        try:
-            data = _call_openrouter(prompt)
-            content = data["choices"][0]["message"]["content"]
-            sel = json.loads(content)
-            print("[LLM] provider=openrouter ok")
-        except Exception as e2:
-            print("[LLM] openrouter failed, using local defaults:", e2)
-            sel = _local_fallback(owner_addr)
+        print("[LLM] providers failed, using local defaults:", e)
+        sel = _local_fallback(owner_addr)
+    return _sanitize(sel)
+
+def selection_batch_from_llm(n: int = LLM_SPEC_BATCH) -> list:
+    """N спек одним completion; каждая проходит ту же санитизацию, что и одиночная."""
+    n = max(1, int(n))
+    prompt = f"Generate {n} distinct ERC20 specs as a JSON array only."
+    provider, specs = _hedged(prompt, parse=_parse_specs, system=BATCH_SYSTEM_PROMPT, max_tokens=96 * n + 64)
+    print(f"[LLM] provider={provider} batch={len(specs)}")
+    return [_sanitize(x) for x in specs[:n]]
 
+def _sanitize(sel: Dict[str, Any]) -> Dict[str, Any]:
     # sanitize & defaults
     kind = sel.get("kind", "")
     if kind not in ALLOWED_TYPES:
@@ -159,6 +261,11 @@ def _to_contract_identifier(s: str) -> str:
         camel = "X" + camel
     return camel
 
+def _append_to_contract(source: str, ext: str) -> str:
+    """Вставить ext перед закрывающей скобкой контракта (последней '}' в файле)."""
+    i = source.rstrip().rfind("}")
+    return source[:i] + ext + "}\n"
+
 def _build_source(sel: Dict[str, Any]) -> Tuple[str, str, int, str]:
     p = sel.get("params", {})
     token_name_str = _esc(p.get("name", "FarmToken"))
@@ -223,7 +330,7 @@ function mint(address to, uint256 amount) public returns (bool) {
     return true;
 }
 """
-        source = base.replace("}\n}", ext + "}")
+        source = _append_to_contract(base, ext)
     elif kind == "erc20_capped_burnable":
         cap = int(p.get("cap", str(10**23)))
         ext = f"""
@@ -242,45 +349,206 @@ function burn(uint256 amount) public returns (bool) {{
     return true;
 }}
 """
-        source = base.replace("}\n}", ext + "}")
+        source = _append_to_contract(base, ext)
     else:
         source = base
 
     return source, contract_name, initial, token_name_str
 
+# -------------------- Templates (constructor-parametrized) --------------------
+# Один байткод на kind: name/symbol/decimals/cap уходят в конструктор, solc не нужен на каждый токен.
+DEPLOY_TEMPLATES = os.getenv("DEPLOY_TEMPLATES", "1") not in ("0", "false", "False")
+
+_TEMPLATE_NAMES = {
+    "erc20_fixed": "FarmFixedToken",
+    "erc20_mintable": "FarmMintableToken",
+    "erc20_capped_burnable": "FarmCappedToken",
+}
+
+def _template_source(kind: str) -> Tuple[str, str]:
+    contract_name = _TEMPLATE_NAMES.get(kind, _TEMPLATE_NAMES["erc20_fixed"])
+    capped = kind == "erc20_capped_burnable"
+    cap_arg = ", uint256 cap_" if capped else ""
+    cap_init = "\n        require(initialSupply <= cap_, \"cap exceeded\");\n        cap = cap_;" if capped else ""
+    source = f"""// SPDX-License-Identifier: MIT
+pragma solidity {SOLC_VERSION};
+
+contract {contract_name} {{
+    string public name;
+    string public symbol;
+    uint8  public decimals;
+    uint256 public totalSupply;
+    mapping(address => uint256) public balanceOf;
+    mapping(address => mapping(address => uint256)) public allowance;
+    event Transfer(address indexed from, address indexed to, uint256 value);
+    event Approval(address indexed owner, address indexed spender, uint256 value);
+
+    constructor(string memory name_, string memory symbol_, uint8 decimals_, uint256 initialSupply{cap_arg}) {{{cap_init}
+        name = name_;
+        symbol = symbol_;
+        decimals = decimals_;
+        totalSupply = initialSupply;
+        balanceOf[msg.sender] = initialSupply;
+        emit Transfer(address(0), msg.sender, initialSupply);
+    }}
+
+    function transfer(address to, uint256 value) public returns (bool) {{
+        require(balanceOf[msg.sender] >= value, "insufficient");
+        unchecked {{ balanceOf[msg.sender] -= value; }}
+        balanceOf[to] += value;
+        emit Transfer(msg.sender, to, value);
+        return true;
+    }}
+
+    function approve(address spender, uint256 value) public returns (bool) {{
+        allowance[msg.sender][spender] = value;
+        emit Approval(msg.sender, spender, value);
+        return true;
+    }}
+
+    function transferFrom(address from, address to, uint256 value) public returns (bool) {{
+        require(balanceOf[from] >= value, "insufficient");
+        require(allowance[from][msg.sender] >= value, "allowance");
+        unchecked {{ allowance[from][msg.sender] -= value; balanceOf[from] -= value; }}
+        balanceOf[to] += value;
+        emit Transfer(from, to, value);
+        return true;
+    }}
+}}
+"""
+    if kind == "erc20_mintable":
+        ext = """
+function mint(address to, uint256 amount) public returns (bool) {
+    totalSupply += amount;
+    balanceOf[to] += amount;
+    emit Transfer(address(0), to, amount);
+    return true;
+}
+"""
+        source = _append_to_contract(source, ext)
+    elif capped:
+        ext = """
+uint256 public cap;
+function mint(address to, uint256 amount) public returns (bool) {
+    require(totalSupply + amount <= cap, "cap exceeded");
+    totalSupply += amount;
+    balanceOf[to] += amount;
+    emit Transfer(address(0), to, amount);
+    return true;
+}
+function burn(uint256 amount) public returns (bool) {
+    require(balanceOf[msg.sender] >= amount, "insufficient");
+    unchecked { balanceOf[msg.sender] -= amount; totalSupply -= amount; }
+    emit Transfer(msg.sender, address(0), amount);
+    return true;
+}
+"""
+        source = _append_to_contract(source, ext)
+    return source, contract_name
+
+def _template_args(sel: Dict[str, Any]) -> Tuple[list, list]:
+    p = sel.get("params", {})
+    kind = sel.get("kind", "erc20_fixed")
+    types = ["string", "string", "uint8", "uint256"]
+    args = [
+        str(p.get("name", "FarmToken")),
+        str(p.get("symbol", "FARM")),
+        max(0, min(18, int(p.get("decimals", 18)))),
+        int(p.get("initial_supply", str(10**18))),
+    ]
+    if kind == "erc20_capped_burnable":
+        types.append("uint256")
+        args.append(int(p.get("cap", str(10**23))))
+    return types, args
+
 # -------------------- Compile & deploy --------------------
 from web3 import Web3
-from solcx import compile_standard, set_solc_version, install_solc
+from eth_abi import encode as abi_encode
 
-try:
-    set_solc_version(SOLC_VERSION)
-except Exception:
-    install_solc(SOLC_VERSION)
-    set_solc_version(SOLC_VERSION)
+SOLC_CACHE_DIR = os.getenv("SOLC_CACHE_DIR", ".cache/solc")
 
-def deploy_token_from_selection(w3: Web3, acct, sel: Dict[str, Any]) -> Dict[str, Any]:
-    source, contract_name, initial, display_name = _build_source(sel)
+_solc_lock = threading.Lock()
+_solc_ready = False
+_artifacts: Dict[str, Tuple[list, str]] = {}
+
+def _ensure_solc() -> None:
+    """solcx и сам компилятор — только когда реально надо компилировать."""
+    global _solc_ready
+    with _solc_lock:
+        if _solc_ready:
+            return
+        from solcx import set_solc_version, install_solc
+        try:
+            set_solc_version(SOLC_VERSION)
+        except Exception:
+            install_solc(SOLC_VERSION)
+            set_solc_version(SOLC_VERSION)
+        _solc_ready = True
+
+def _compile(std: Dict[str, Any]) -> Dict[str, Any]:
+    """compile_standard с on-disk кэшем по sha256(версия + standard-json input)."""
+    digest = hashlib.sha256(json.dumps({"solc": SOLC_VERSION, "input": std}, sort_keys=True).encode()).hexdigest()
+    path = os.path.join(SOLC_CACHE_DIR, f"{digest}.json") if SOLC_CACHE_DIR else None
+    if path and os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            log.warning(f"solc cache unreadable {short(digest)}: {e}")
+    _ensure_solc()
+    from solcx import compile_standard
+    out = compile_standard(std, solc_version=SOLC_VERSION)
+    if path:
+        os.makedirs(SOLC_CACHE_DIR, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(out, f)
+        os.replace(tmp, path)
+    return out
+
+def _artifact(source: str, contract_name: str) -> Tuple[list, str]:
+    key = hashlib.sha256(source.encode()).hexdigest()
+    hit = _artifacts.get(key)
+    if hit:
+        return hit
     std = {
         "language": "Solidity",
         "sources": {f"{contract_name}.sol": {"content": source}},
         "settings": {"outputSelection": {"*": {"*": ["abi","evm.bytecode.object"]}}}
     }
-    out = compile_standard(std, solc_version=SOLC_VERSION)
-    key = list(out["contracts"][f"{contract_name}.sol"].keys())[0]
-    abi = out["contracts"][f"{contract_name}.sol"][key]["abi"]
-    bytecode = out["contracts"][f"{contract_name}.sol"][key]["evm"]["bytecode"]["object"]
-
-    Contract = w3.eth.contract(abi=abi, bytecode=bytecode)
-    nonce = w3.eth.get_transaction_count(acct.address)
-    tx = Contract.constructor(initial).build_transaction({
-        "from": acct.address,
-        "nonce": nonce,
-        "gas": int(os.getenv("DEPLOY_GAS_LIMIT", "800000")),
-        "gasPrice": w3.eth.gas_price
-    })
-    signed = acct.sign_transaction(tx)
-    txh = w3.eth.send_raw_transaction(signed.rawTransaction)
-    rec = w3.eth.wait_for_transaction_receipt(txh, timeout=int(os.getenv("DEPLOY_TIMEOUT", "180")))
+    out = _compile(std)
+    key_c = list(out["contracts"][f"{contract_name}.sol"].keys())[0]
+    abi = out["contracts"][f"{contract_name}.sol"][key_c]["abi"]
+    bytecode = out["contracts"][f"{contract_name}.sol"][key_c]["evm"]["bytecode"]["object"]
+    _artifacts[key] = (abi, bytecode)
+    return abi, bytecode
+
+def deploy_token_from_selection(w3: Web3, acct, sel: Dict[str, Any]) -> Dict[str, Any]:
+    source, contract_name, initial, display_name = _build_source(sel)
+    if DEPLOY_TEMPLATES:
+        # байткод шаблона компилируется один раз на kind + SOLC_VERSION, дальше только ABI-encode аргументов
+        tpl_source, tpl_name = _template_source(sel.get("kind", "erc20_fixed"))
+        abi, bytecode = _artifact(tpl_source, tpl_name)
+        types, args = _template_args(sel)
+    else:
+        abi, bytecode = _artifact(source, contract_name)
+        types, args = ["uint256"], [initial]
+
+    from .dex import _build_call, _send
+    data = "0x" + bytecode.removeprefix("0x") + abi_encode(types, args).hex()
+    # газ деплоя зависит от kind и режима (шаблон / свой байткод), не от имени токена
+    key = shape("deploy", sel.get("kind", "erc20_fixed"), "tpl" if DEPLOY_TEMPLATES else "src")
+    # nonce, газ, журнал, история tx и их откат при ошибках — как у остальных tx (dex._send/_track)
+    tx = _build_call(w3, acct, None, data, int(os.getenv("DEPLOY_GAS_LIMIT", "800000")), key)
+
+    def _record(rec):
+        st = get_state(w3)
+        if st is not None and rec.get("contractAddress"):
+            st.put_deployment(rec["contractAddress"], acct.address, rec["transactionHash"].hex(), display_name,
+                              (sel.get("params") or {}).get("symbol"), sel.get("kind"), abi)
+
+    txh, rec = _send(w3, acct, tx, kind="deploy", on_ok=_record,
+                     timeout=int(os.getenv("DEPLOY_TIMEOUT", "180")))
     addr = rec.contractAddress
-    log.info(f"deploy {contract_name} address={address} tx={short(txh.hex())}")
-    return {"address": addr, "tx": txh.hex(), "abi": abi, "name": contract_name, "display_name": display_name}
\ No newline at end of file
+    log.info(f"deploy {contract_name} address={addr} tx={short(txh.hex())}")
+    return {"address": addr, "tx": txh.hex(), "abi": abi, "name": contract_name, "display_name": display_name}
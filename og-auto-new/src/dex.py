@@ -2,11 +2,19 @@
 from typing import Any, Tuple
 from web3 import Web3
 from web3.types import TxParams
-from .config import ROUTER, V3_FACTORY, POS_MANAGER, GAS_LIMIT_DEFAULT, TOKENS, V3_FEE
-from .util import (
-    to_checksum, erc20_min_abi, swap_router_v3_abi, v3_factory_abi,
-    position_manager_abi, build_tx_base
-)
+from .config import ROUTER, V3_FACTORY, POS_MANAGER, GAS_LIMIT_DEFAULT, TOKENS, V3_FEE, APPROVE_MAX
+from .util import build_tx_base, sign_and_send, sign_and_send_many
+from .abi import calldata, checksum, contract
+from .nonce import NONCES
+from .receipts import get_tracker
+from .head import get_head
+from .allowances import ALLOWANCES, MAX_UINT256
+from .pools import POOLS
+from .metrics import pair_label, phase, span
+from .state import get_state
+from .journal import get_journal
+from .gas import GAS, shape
+from . import multicall, v3math
 import time
 
 def _sym_addr(sym: str) -> str | None:
@@ -27,7 +35,7 @@ def addr_of(token_like: Any, *, w3: Web3 | None = None) -> str:
         token_like = a or token_like
     if not isinstance(token_like, str) or not token_like.startswith('0x'):
         raise ValueError(f'Bad token value for address: {token_like!r}')
-    return Web3.to_checksum_address(token_like) if w3 is None else to_checksum(w3, token_like)
+    return checksum(token_like)
 
 def decimals_of(token_like: Any) -> int:
     if isinstance(token_like, dict):
@@ -53,92 +61,220 @@ def decimals_of(token_like: Any) -> int:
                     return 18
     return 18
 
+def _build_call(w3: Web3, acct, to: str | None, data: str, gas_limit: int, gas_key: str | None = None) -> TxParams:
+    """
+    Calldata уже закодирована (abi.calldata) — web3 build_transaction не нужен.
+    gas_key — форма tx для модели газа (gas.py); gas_limit тогда только запасной вариант.
+    to=None — деплой контракта (data = байткод + аргументы конструктора).
+    """
+    tx: TxParams = build_tx_base(w3, acct.address, gas_limit)
+    if to is not None:
+        tx["to"] = to
+    tx["data"] = data
+    tx["value"] = 0
+    if gas_key is not None:
+        try:
+            GAS.apply(w3, gas_key, tx, gas_limit)
+        except Exception:
+            NONCES.release(acct.address, tx["nonce"])
+            raise
+    return tx
+
+def _send(w3: Web3, acct, tx_data: TxParams, wait: bool = True, on_fail=None, kind: str | None = None,
+          on_ok=None, timeout: float | None = None):
+    """
+    Отправить tx и отдать receipt трекеру.
+    wait=False — вернуться сразу: следующая tx кошелька всё равно встанет за ней по nonce,
+    а receipt можно дождаться позже через get_tracker(w3).wait(txh).
+    on_fail() вызывается, если tx ревертнулась или receipt не дождались, on_ok(receipt) — при status=1.
+    kind — метка для истории tx в state store; timeout — своё ожидание receipt вместо трекерного.
+    """
+    seen = get_head(w3).peek()
+    txh = sign_and_send(w3, acct, tx_data, kind)
+    fut = _track(w3, acct, txh, tx_data, on_fail, kind, seen, on_ok, timeout)
+    if not wait:
+        return txh, None
+    with phase("receipt_wait"):
+        return txh, fut.result()
+
+def _track(w3: Web3, acct, txh, tx_data: TxParams, on_fail=None, kind: str | None = None,
+           since: int | None = None, on_ok=None, timeout: float | None = None):
+    addr, nonce = acct.address, tx_data["nonce"]
+    st, j = get_state(w3), get_journal(w3)
+    if st is not None:
+        st.record_tx(txh.hex(), addr, nonce, kind, tx_data.get("to"))
+    fut = get_tracker(w3).track(txh, timeout, since=since)
+
+    def _done(f):
+        NONCES.confirm(addr, nonce)
+        if f.exception() is not None:
+            GAS.forget(addr, nonce)
+        else:
+            GAS.settle(addr, nonce, f.result())
+        if st is not None:
+            if f.exception() is not None:
+                st.tx_result(txh.hex(), None)
+            else:
+                rec = f.result()
+                st.tx_result(txh.hex(), rec.get("status"), rec.get("blockNumber"), rec.get("gasUsed"))
+                if j is not None:
+                    j.mined(txh.hex(), rec.get("status"))
+        ok = f.exception() is None and f.result().get("status") != 0
+        if ok and on_ok is not None:
+            on_ok(f.result())
+        elif not ok and on_fail is not None:
+            on_fail()
+
+    fut.add_done_callback(_done)
+    return fut
+
 def erc20(w3: Web3, token_like: Any):
-    address = addr_of(token_like, w3=w3)
-    return w3.eth.contract(address=address, abi=erc20_min_abi())
+    return contract(w3, addr_of(token_like, w3=w3), "erc20")
 
-def ensure_allowance(w3: Web3, acct, token_like: Any, spender_like: Any, amount: int) -> str | None:
-    try:
-        token_addr = addr_of(token_like, w3=w3)
-        spender_addr = addr_of(spender_like, w3=w3)
-        c = erc20(w3, token_addr)
-        current = c.functions.allowance(acct.address, spender_addr).call()
-        if current >= amount:
+def ensure_allowance(w3: Web3, acct, token_like: Any, spender_like: Any, amount: int, wait: bool = True) -> str | None:
+    token_addr = spender_addr = None
+    with span("approve", acct.address, pair_label(str(token_like), str(spender_like))) as sp:
+        try:
+            token_addr = addr_of(token_like, w3=w3)
+            spender_addr = addr_of(spender_like, w3=w3)
+            current = ALLOWANCES.get(w3, acct.address, token_addr, spender_addr)
+            if current >= amount:
+                sp["status"] = "skip"
+                return None
+            value = MAX_UINT256 if APPROVE_MAX else int(amount)
+            # 0 -> x пишет новый слот и дороже, чем x -> y
+            key = shape("approve", token_addr, "fresh" if current == 0 else "update")
+            tx_data = _build_call(w3, acct, token_addr, calldata("erc20", "approve", spender_addr, value), max(GAS_LIMIT_DEFAULT // 5, 60000), key)
+            # оптимистично: следующая tx по nonce всё равно выполнится после approve
+            ALLOWANCES.set(acct.address, token_addr, spender_addr, value)
+            forget = lambda: ALLOWANCES.forget(acct.address, token_addr, spender_addr)
+            confirm = lambda _rec: ALLOWANCES.confirm_approve(acct.address, token_addr, spender_addr, value)
+            txh, _ = _send(w3, acct, tx_data, wait, on_fail=forget, kind="approve", on_ok=confirm)
+            print(f'approve {token_addr} -> {spender_addr} {value} | {txh.hex()}')
+            return txh.hex()
+        except Exception as e:
+            if token_addr and spender_addr:
+                ALLOWANCES.forget(acct.address, token_addr, spender_addr)
+            sp["status"] = "error"
+            print('approve failed:', e)
             return None
-        tx: TxParams = build_tx_base(w3, acct.address, GAS_LIMIT_DEFAULT)
-        tx['gas'] = max(GAS_LIMIT_DEFAULT // 5, 60000)
-        tx_data = c.functions.approve(spender_addr, int(amount)).build_transaction(tx)
-        signed = acct.sign_transaction(tx_data)
-        txh = w3.eth.send_raw_transaction(signed.rawTransaction)
-        w3.eth.wait_for_transaction_receipt(txh)
-        print(f'approve {token_addr} -> {spender_addr} {amount} | {txh.hex()}')
-        return txh.hex()
-    except Exception as e:
-        print('approve failed:', e)
-        return None
 
-def erc20_transfer(w3: Web3, acct, token_like: Any, to_like: Any, amount: int) -> str:
+def ensure_allowances(w3: Web3, items) -> int:
+    """
+    Пачка [(acct, token, spender, amount)]: approve только там, где не хватает,
+    подпись всех разом (пул процессов, если включён) и одна JSON-RPC batch-отправка.
+    Receipt'ы не ждём — следующие tx кошельков встанут за approve по nonce. Возвращает число отправленных.
+    """
+    # сначала всё, что может упасть без побочных эффектов: адреса и текущие allowance
+    need, planned = [], {}
+    for acct, token_like, spender_like, amount in items:
+        token_addr, spender_addr = addr_of(token_like, w3=w3), addr_of(spender_like, w3=w3)
+        current = ALLOWANCES.get(w3, acct.address, token_addr, spender_addr)
+        k = (acct.address.lower(), token_addr.lower(), spender_addr.lower())
+        if max(current, planned.get(k, 0)) >= amount:
+            continue
+        value = MAX_UINT256 if APPROVE_MAX else int(amount)
+        planned[k] = value
+        need.append((acct, token_addr, spender_addr, value, current))
+    if not need:
+        return 0
+    todo = []
     try:
-        token_addr = addr_of(token_like, w3=w3)
-        to_addr = addr_of(to_like, w3=w3)
-        c = erc20(w3, token_addr)
-        tx: TxParams = build_tx_base(w3, acct.address, GAS_LIMIT_DEFAULT)
-        tx['gas'] = max(GAS_LIMIT_DEFAULT // 5, 60000)
-        tx_data = c.functions.transfer(to_addr, int(amount)).build_transaction(tx)
-        signed = acct.sign_transaction(tx_data)
-        txh = w3.eth.send_raw_transaction(signed.rawTransaction)
-        w3.eth.wait_for_transaction_receipt(txh)
-        print(f'transfer erc20 {amount} -> {to_addr} ({token_addr}) | {txh.hex()}')
-        return txh.hex()
-    except Exception as e:
-        print('transfer erc20 failed:', e)
+        for acct, token_addr, spender_addr, value, current in need:
+            tx = _build_call(w3, acct, token_addr, calldata("erc20", "approve", spender_addr, value), max(GAS_LIMIT_DEFAULT // 5, 60000))
+            key = shape("approve", token_addr, "fresh" if current == 0 else "update")
+            todo.append((acct, tx, token_addr, spender_addr, key, value))
+        # неизвестные формы — одним batch eth_estimateGas на всю пачку
+        GAS.apply_many(w3, [(key, tx, tx["gas"]) for _, tx, _, _, key, _ in todo])
+    except Exception:
+        # выданные nonce вернуть, иначе у кошельков дырка в последовательности
+        for acct, tx, *_ in reversed(todo):
+            NONCES.release(acct.address, tx["nonce"])
         raise
-
-def native_transfer(w3: Web3, acct, to_like: Any, amount_wei: int) -> str:
+    for acct, _, token_addr, spender_addr, _, value in todo:
+        ALLOWANCES.set(acct.address, token_addr, spender_addr, value)
+    sent = 0
+    seen = get_head(w3).peek()
     try:
-        to_addr = addr_of(to_like, w3=w3)
-        tx: TxParams = build_tx_base(w3, acct.address, GAS_LIMIT_DEFAULT // 10)
-        tx['to'] = to_addr
-        tx['value'] = int(amount_wei)
-        signed = acct.sign_transaction(tx)
-        txh = w3.eth.send_raw_transaction(signed.rawTransaction)
-        w3.eth.wait_for_transaction_receipt(txh)
-        print(f'transfer native {amount_wei} wei -> {to_addr} | {txh.hex()}')
-        return txh.hex()
-    except Exception as e:
-        print('transfer native failed:', e)
+        # nonce неотправленных sign_and_send_many возвращает сама
+        res = sign_and_send_many(w3, [(a, tx) for a, tx, *_ in todo], kind="approve")
+    except Exception:
+        for acct, _, token_addr, spender_addr, _, _ in todo:
+            ALLOWANCES.forget(acct.address, token_addr, spender_addr)
         raise
+    for (acct, tx, token_addr, spender_addr, _, value), r in zip(todo, res):
+        forget = (lambda a=acct.address, t=token_addr, s=spender_addr: ALLOWANCES.forget(a, t, s))
+        confirm = (lambda _rec, a=acct.address, t=token_addr, s=spender_addr, v=value:
+                   ALLOWANCES.confirm_approve(a, t, s, v))
+        if isinstance(r, Exception):
+            forget()
+            print(f'approve {token_addr} -> {spender_addr} failed:', r)
+            continue
+        _track(w3, acct, r, tx, on_fail=forget, kind="approve", since=seen, on_ok=confirm)
+        sent += 1
+    print(f'bulk approve: {sent}/{len(todo)} sent')
+    return sent
+
+def erc20_transfer(w3: Web3, acct, token_like: Any, to_like: Any, amount: int, wait: bool = True) -> str:
+    with span("transfer", acct.address, pair_label(str(token_like))):
+        try:
+            token_addr = addr_of(token_like, w3=w3)
+            to_addr = addr_of(to_like, w3=w3)
+            tx_data = _build_call(w3, acct, token_addr, calldata("erc20", "transfer", to_addr, int(amount)),
+                                  max(GAS_LIMIT_DEFAULT // 5, 60000), shape("transfer", token_addr))
+            txh, _ = _send(w3, acct, tx_data, wait, kind="transfer")
+            print(f'transfer erc20 {amount} -> {to_addr} ({token_addr}) | {txh.hex()}')
+            return txh.hex()
+        except Exception as e:
+            print('transfer erc20 failed:', e)
+            raise
+
+def native_transfer(w3: Web3, acct, to_like: Any, amount_wei: int, wait: bool = True) -> str:
+    with span("transfer", acct.address, "native"):
+        try:
+            to_addr = addr_of(to_like, w3=w3)
+            tx: TxParams = build_tx_base(w3, acct.address, GAS_LIMIT_DEFAULT // 10)
+            tx['to'] = to_addr
+            tx['value'] = int(amount_wei)
+            GAS.apply(w3, shape("native"), tx, GAS_LIMIT_DEFAULT // 10)
+            txh, _ = _send(w3, acct, tx, wait, kind="transfer")
+            print(f'transfer native {amount_wei} wei -> {to_addr} | {txh.hex()}')
+            return txh.hex()
+        except Exception as e:
+            print('transfer native failed:', e)
+            raise
 
 def v3_exactInputSingle(
     w3: Web3, acct, token_in_like: Any, token_out_like: Any,
     amount_in: int, min_amount_out: int = 0, fee: int = None,
-    recipient: str | None = None, deadline_sec: int = 600
+    recipient: str | None = None, deadline_sec: int = 600, wait: bool = True
 ) -> str:
-    try:
-        token_in = addr_of(token_in_like, w3=w3)
-        token_out = addr_of(token_out_like, w3=w3)
-        fee = int(fee or V3_FEE)
-        params = {
-            "tokenIn": token_in,
-            "tokenOut": token_out,
-            "fee": fee,
-            "recipient": recipient or acct.address,
-            "deadline": int(w3.eth.get_block("latest")["timestamp"]) + int(deadline_sec),
-            "amountIn": int(amount_in),
-            "amountOutMinimum": int(min_amount_out),
-            "sqrtPriceLimitX96": 0,
-        }
-        router = w3.eth.contract(address=to_checksum(w3, ROUTER), abi=swap_router_v3_abi())
-        tx: TxParams = build_tx_base(w3, acct.address, GAS_LIMIT_DEFAULT)
-        tx_data = router.functions.exactInputSingle(params).build_transaction(tx)
-        signed = acct.sign_transaction(tx_data)
-        txh = w3.eth.send_raw_transaction(signed.rawTransaction)
-        w3.eth.wait_for_transaction_receipt(txh)
-        print(f'v3 exactInputSingle {token_in}->{token_out} in={amount_in} minOut={min_amount_out} fee={fee} | {txh.hex()}')
-        return txh.hex()
-    except Exception as e:
-        print('swap v3 failed:', e)
-        raise
+    with span("swap", acct.address, pair_label(str(token_in_like), str(token_out_like))):
+        try:
+            token_in = addr_of(token_in_like, w3=w3)
+            token_out = addr_of(token_out_like, w3=w3)
+            fee = int(fee or V3_FEE)
+            params = {
+                "tokenIn": token_in,
+                "tokenOut": token_out,
+                "fee": fee,
+                "recipient": recipient or acct.address,
+                "deadline": get_head(w3).timestamp_now() + int(deadline_sec),
+                "amountIn": int(amount_in),
+                "amountOutMinimum": int(min_amount_out),
+                "sqrtPriceLimitX96": 0,
+            }
+            tx_data = _build_call(w3, acct, checksum(ROUTER), calldata("router_v3", "exactInputSingle", params),
+                                  GAS_LIMIT_DEFAULT, shape("swap", token_in, token_out, fee))
+            forget = lambda: ALLOWANCES.forget(acct.address, token_in, ROUTER)
+            confirm = lambda _rec: ALLOWANCES.confirm_spend(acct.address, token_in, ROUTER, amount_in)
+            txh, _ = _send(w3, acct, tx_data, wait, on_fail=forget, kind="swap", on_ok=confirm)
+            ALLOWANCES.spend(acct.address, token_in, ROUTER, amount_in)
+            print(f'v3 exactInputSingle {token_in}->{token_out} in={amount_in} minOut={min_amount_out} fee={fee} | {txh.hex()}')
+            return txh.hex()
+        except Exception as e:
+            print('swap v3 failed:', e)
+            raise
 
 # ---- Uniswap V3 factory / position manager helpers ----
 
@@ -146,73 +282,95 @@ def get_pool(w3: Web3, tokenA_like: Any, tokenB_like: Any, fee: int) -> str:
     try:
         tokenA = addr_of(tokenA_like, w3=w3)
         tokenB = addr_of(tokenB_like, w3=w3)
-        factory = w3.eth.contract(address=to_checksum(w3, V3_FACTORY), abi=v3_factory_abi())
-        pool = factory.functions.getPool(tokenA, tokenB, int(fee)).call()
-        return Web3.to_checksum_address(pool) if int(pool, 16) != 0 else "0x0000000000000000000000000000000000000000"
+        return POOLS.get(w3, V3_FACTORY, tokenA, tokenB, int(fee))
     except Exception as e:
         print('get_pool failed:', e)
         return "0x0000000000000000000000000000000000000000"
 
+def get_pools(w3: Web3, triples) -> list[str]:
+    """[(tokenA, tokenB, fee)] -> [pool], одним multicall вместо getPool на каждую пару."""
+    items = [(addr_of(a, w3=w3), addr_of(b, w3=w3), int(fee)) for a, b, fee in triples]
+    return POOLS.get_many(w3, V3_FACTORY, items)
+
 def _sort_tokens(a: str, b: str) -> tuple[str, str, bool]:
     a_l, b_l = a.lower(), b.lower()
     if a_l < b_l:
         return a, b, False
     return b, a, True
 
+def initial_sqrt_price(token0_like: Any, token1_like: Any) -> int:
+    """Стартовая цена нового пула: 1 token1 за 1 token0 в человеческих единицах (с учётом decimals)."""
+    return v3math.price_to_sqrt_x96(1, decimals_of(token0_like), decimals_of(token1_like))
+
+def pool_slot0(w3: Web3, pool: str) -> Tuple[int, int] | None:
+    """(sqrtPriceX96, tick) пула или None, если не прочиталось."""
+    (res,) = multicall.slot0s(w3, [pool])
+    return res
+
 def pm_create_pool_if_needed(w3: Web3, acct, tokenA_like: Any, tokenB_like: Any, fee: int, sqrt_price_x96: int | None = None):
-    try:
-        tokenA = addr_of(tokenA_like, w3=w3)
-        tokenB = addr_of(tokenB_like, w3=w3)
-        pool = get_pool(w3, tokenA, tokenB, fee)
-        if pool != "0x0000000000000000000000000000000000000000":
-            return None, pool
-        token0, token1, _ = _sort_tokens(tokenA, tokenB)
-        sqrt_price = sqrt_price_x96 or (1 << 96)
-        pm = w3.eth.contract(address=to_checksum(w3, POS_MANAGER), abi=position_manager_abi())
-        tx = build_tx_base(w3, acct.address, GAS_LIMIT_DEFAULT)
-        tx_data = pm.functions.createAndInitializePoolIfNecessary(token0, token1, int(fee), int(sqrt_price)).build_transaction(tx)
-        signed = acct.sign_transaction(tx_data)
-        txh = w3.eth.send_raw_transaction(signed.rawTransaction)
-        w3.eth.wait_for_transaction_receipt(txh)
-        print(f'pool ensure {token0}/{token1} fee={fee} | {txh.hex()}')
-        pool2 = get_pool(w3, token0, token1, fee)
-        return txh.hex(), pool2
-    except Exception as e:
-        print('pm_create_pool_if_needed failed:', e)
-        raise
+    with span("pool_create", acct.address, pair_label(str(tokenA_like), str(tokenB_like))):
+        try:
+            tokenA = addr_of(tokenA_like, w3=w3)
+            tokenB = addr_of(tokenB_like, w3=w3)
+            pool = get_pool(w3, tokenA, tokenB, fee)
+            if pool != "0x0000000000000000000000000000000000000000":
+                return None, pool
+            token0, token1, _ = _sort_tokens(tokenA, tokenB)
+            sqrt_price = sqrt_price_x96 or initial_sqrt_price(token0, token1)
+            data = calldata("position_manager", "createAndInitializePoolIfNecessary", token0, token1, int(fee), int(sqrt_price))
+            tx_data = _build_call(w3, acct, checksum(POS_MANAGER), data, GAS_LIMIT_DEFAULT,
+                                  shape("pool_create", token0, token1, fee))
+            txh, _ = _send(w3, acct, tx_data, kind="pool_create")
+            print(f'pool ensure {token0}/{token1} fee={fee} | {txh.hex()}')
+            POOLS.invalidate(w3, V3_FACTORY, token0, token1, fee)
+            pool2 = get_pool(w3, token0, token1, fee)
+            return txh.hex(), pool2
+        except Exception as e:
+            print('pm_create_pool_if_needed failed:', e)
+            raise
 
 def pm_mint(
     w3: Web3, acct, tokenA_like: Any, tokenB_like: Any,
     amountA: int, amountB: int, fee: int, tickLower: int, tickUpper: int,
-    amount0Min: int = 0, amount1Min: int = 0, recipient: str | None = None
+    amount0Min: int = 0, amount1Min: int = 0, recipient: str | None = None, wait: bool = True
 ) -> Tuple[str, Any]:
-    try:
-        tokenA = addr_of(tokenA_like, w3=w3)
-        tokenB = addr_of(tokenB_like, w3=w3)
-        token0, token1, flipped = _sort_tokens(tokenA, tokenB)
-        amt0 = int(amountB if flipped else amountA)
-        amt1 = int(amountA if flipped else amountB)
-        pm = w3.eth.contract(address=to_checksum(w3, POS_MANAGER), abi=position_manager_abi())
-        params = {
-            "token0": token0,
-            "token1": token1,
-            "fee": int(fee),
-            "tickLower": int(tickLower),
-            "tickUpper": int(tickUpper),
-            "amount0Desired": int(amt0),
-            "amount1Desired": int(amt1),
-            "amount0Min": int(amount0Min),
-            "amount1Min": int(amount1Min),
-            "recipient": recipient or acct.address,
-            "deadline": int(w3.eth.get_block("latest")["timestamp"]) + 600,
-        }
-        tx = build_tx_base(w3, acct.address, GAS_LIMIT_DEFAULT)
-        tx_data = pm.functions.mint(params).build_transaction(tx)
-        signed = acct.sign_transaction(tx_data)
-        txh = w3.eth.send_raw_transaction(signed.rawTransaction)
-        w3.eth.wait_for_transaction_receipt(txh)
-        print(f'lp mint {token0}/{token1} fee={fee} | {txh.hex()}')
-        return txh.hex(), rec
-    except Exception as e:
-        print('pm_mint failed:', e)
-        raise
\ No newline at end of file
+    with span("lp_mint", acct.address, pair_label(str(tokenA_like), str(tokenB_like))):
+        try:
+            tokenA = addr_of(tokenA_like, w3=w3)
+            tokenB = addr_of(tokenB_like, w3=w3)
+            token0, token1, flipped = _sort_tokens(tokenA, tokenB)
+            amt0 = int(amountB if flipped else amountA)
+            amt1 = int(amountA if flipped else amountB)
+            params = {
+                "token0": token0,
+                "token1": token1,
+                "fee": int(fee),
+                "tickLower": int(tickLower),
+                "tickUpper": int(tickUpper),
+                "amount0Desired": int(amt0),
+                "amount1Desired": int(amt1),
+                "amount0Min": int(amount0Min),
+                "amount1Min": int(amount1Min),
+                "recipient": recipient or acct.address,
+                "deadline": get_head(w3).timestamp_now() + 600,
+            }
+            tx_data = _build_call(w3, acct, checksum(POS_MANAGER), calldata("position_manager", "mint", params),
+                                  GAS_LIMIT_DEFAULT, shape("lp_mint", token0, token1, fee))
+
+            def forget():
+                ALLOWANCES.forget(acct.address, token0, POS_MANAGER)
+                ALLOWANCES.forget(acct.address, token1, POS_MANAGER)
+
+            def confirm(_rec):
+                ALLOWANCES.confirm_spend(acct.address, token0, POS_MANAGER, amt0)
+                ALLOWANCES.confirm_spend(acct.address, token1, POS_MANAGER, amt1)
+
+            txh, rec = _send(w3, acct, tx_data, wait, on_fail=forget, kind="lp_mint", on_ok=confirm)
+            # mint забирает не больше desired — списываем по верхней границе
+            ALLOWANCES.spend(acct.address, token0, POS_MANAGER, amt0)
+            ALLOWANCES.spend(acct.address, token1, POS_MANAGER, amt1)
+            print(f'lp mint {token0}/{token1} fee={fee} | {txh.hex()}')
+            return txh.hex(), rec
+        except Exception as e:
+            print('pm_mint failed:', e)
+            raise
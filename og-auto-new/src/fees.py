@@ -0,0 +1,66 @@
+# src/fees.py
+import statistics, threading
+from typing import Dict, Optional
+
+from web3 import Web3
+
+from .config import (
+    FEE_MODE, FEE_PRIORITY_PERCENTILE, FEE_HISTORY_BLOCKS,
+    FEE_BASE_MULTIPLIER,
+)
+from .head import get_head
+
+class FeeOracle:
+    """
+    Газ-цены раз в блок, из памяти для всех кошельков.
+    mode: legacy (gasPrice) | eip1559 (eth_feeHistory) | auto (1559, если нода отдаёт baseFee).
+    """
+
+    def __init__(self, w3: Web3, mode: str = FEE_MODE, percentile: float = FEE_PRIORITY_PERCENTILE,
+                 history_blocks: int = FEE_HISTORY_BLOCKS, base_multiplier: float = FEE_BASE_MULTIPLIER):
+        self.w3 = w3
+        self.mode = (mode or "auto").lower()
+        self.percentile = float(percentile)
+        self.history_blocks = max(1, int(history_blocks))
+        self.base_multiplier = float(base_multiplier)
+        self._lock = threading.Lock()
+        self._block: Optional[int] = None
+        self._fees: Dict[str, int] = {}
+
+    def fees(self) -> Dict[str, int]:
+        """{'gasPrice': ..} или {'maxFeePerGas': .., 'maxPriorityFeePerGas': ..} — готово для tx."""
+        head = get_head(self.w3).number
+        with self._lock:
+            if head != self._block or not self._fees:
+                self._fees = self._compute()
+                self._block = head
+            return dict(self._fees)
+
+    def _compute(self) -> Dict[str, int]:
+        if self.mode != "legacy":
+            try:
+                fh = self.w3.eth.fee_history(self.history_blocks, "latest", [self.percentile])
+                base_next = int(fh["baseFeePerGas"][-1])
+                if base_next > 0 or self.mode == "eip1559":
+                    rewards = [int(r[0]) for r in (fh.get("reward") or []) if r]
+                    tip = int(statistics.median(rewards)) if rewards else 0
+                    return {
+                        "maxFeePerGas": int(base_next * self.base_multiplier) + tip,
+                        "maxPriorityFeePerGas": tip,
+                    }
+            except Exception as e:
+                if self.mode == "eip1559":
+                    raise
+                print("fee_history unavailable, using gasPrice:", e)
+                self.mode = "legacy"
+        return {"gasPrice": int(self.w3.eth.gas_price)}
+
+_ORACLES: Dict[int, FeeOracle] = {}
+_ORACLES_LOCK = threading.Lock()
+
+def get_fee_oracle(w3: Web3) -> FeeOracle:
+    with _ORACLES_LOCK:
+        o = _ORACLES.get(id(w3))
+        if o is None or o.w3 is not w3:
+            o = _ORACLES[id(w3)] = FeeOracle(w3)
+        return o
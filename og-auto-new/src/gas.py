@@ -0,0 +1,161 @@
+# src/gas.py
+"""
+Газ-лимит по фактическому gasUsed вместо констант.
+
+Форма tx (shape) — действие + то, от чего зависит газ: токен, пара/пул, «свежий» ли approve.
+По каждой форме держим последние GAS_MODEL_WINDOW значений gasUsed из receipt'ов;
+лимит = перцентиль GAS_MODEL_PERCENTILE * (1 + GAS_MODEL_MARGIN).
+Форма ещё не встречалась — eth_estimateGas (пачкой, если tx несколько) с тем же запасом;
+не получилось оценить — старая константа.
+Tx формы упала, истратив весь лимит (out of gas), — у формы появляется нижняя граница
+(сожжённый лимит с запасом), ниже которой лимит больше не опускается: одиночный выброс
+перцентиль по длинному окну иначе просто не заметил бы.
+"""
+import math, threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config import GAS_MODEL_WINDOW, GAS_MODEL_PERCENTILE, GAS_MODEL_MARGIN, GAS_MODEL_MIN_SAMPLES
+from .metrics import METRICS
+
+METRICS.describe("gas_limit_source_total", "where the gas limit came from: model / estimate / default")
+METRICS.describe("gas_out_of_gas_total", "reverted txs that burned (almost) the whole limit")
+
+def shape(action: str, *parts: Any) -> str:
+    return ":".join([action] + [str(p).lower() for p in parts])
+
+class GasModel:
+    def __init__(self, window: int = GAS_MODEL_WINDOW, percentile: float = GAS_MODEL_PERCENTILE,
+                 margin: float = GAS_MODEL_MARGIN, min_samples: int = GAS_MODEL_MIN_SAMPLES):
+        self.window = max(1, int(window))
+        self.percentile = min(100.0, max(0.0, float(percentile)))
+        self.margin = max(0.0, float(margin))
+        self.min_samples = max(1, int(min_samples))
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[int]] = {}
+        # eth_estimateGas по формам без receipt'ов — до первого настоящего gasUsed
+        self._estimates: Dict[str, int] = {}
+        # shape -> лимит не ниже этого (поднимается на out of gas)
+        self._floors: Dict[str, int] = {}
+        # (from, nonce) -> (shape, limit): tx отправлена, ждём receipt
+        self._inflight: Dict[Tuple[str, int], Tuple[str, int]] = {}
+        # sink(shape, samples) — дублировать в state store
+        self.sink: Optional[Callable[[str, List[int]], None]] = None
+
+    # ---- выборки ----
+    def observe(self, key: str, gas_used: int) -> None:
+        with self._lock:
+            q = self._samples.get(key)
+            if q is None:
+                q = self._samples[key] = deque(maxlen=self.window)
+            q.append(int(gas_used))
+            snap = list(q)
+        if self.sink is not None:
+            self.sink(key, snap)
+
+    def load(self, samples: Dict[str, Iterable[int]]) -> None:
+        with self._lock:
+            for k, vals in samples.items():
+                if k not in self._samples:
+                    self._samples[k] = deque((int(v) for v in vals), maxlen=self.window)
+
+    def _padded(self, gas: int) -> int:
+        return int(math.ceil(gas * (1 + self.margin)))
+
+    def predict(self, key: str) -> Optional[int]:
+        with self._lock:
+            floor = self._floors.get(key)
+            q = self._samples.get(key)
+            if q is None or len(q) < self.min_samples:
+                est = self._estimates.get(key)
+                got = self._padded(est) if est is not None else None
+                return got if floor is None else max(got or 0, floor)
+            vals = sorted(q)
+        i = max(0, math.ceil(self.percentile / 100 * len(vals)) - 1)
+        return max(self._padded(vals[i]), floor or 0)
+
+    # ---- лимиты для tx ----
+    def apply(self, w3, key: str, tx: dict, fallback: int) -> int:
+        return self.apply_many(w3, [(key, tx, fallback)])[0]
+
+    def apply_many(self, w3, items: Sequence[Tuple[str, dict, int]]) -> List[int]:
+        """Проставить tx["gas"]; неизвестные формы — одним batch eth_estimateGas."""
+        out: List[Optional[int]] = [self.predict(k) for k, _, _ in items]
+        unseen = [i for i, v in enumerate(out) if v is None]
+        ests = estimate_many(w3, [items[i][1] for i in unseen]) if unseen else []
+        for i, est in zip(unseen, ests):
+            if est is not None:
+                with self._lock:
+                    self._estimates[items[i][0]] = est
+                out[i] = self._padded(est)
+                METRICS.inc("gas_limit_source_total", source="estimate")
+            else:
+                out[i] = int(items[i][2])
+                METRICS.inc("gas_limit_source_total", source="default")
+        with self._lock:
+            for (key, tx, _), limit in zip(items, out):
+                tx["gas"] = int(limit)
+                self._inflight[(str(tx["from"]).lower(), int(tx["nonce"]))] = (key, int(limit))
+        if len(items) > len(unseen):
+            METRICS.inc("gas_limit_source_total", len(items) - len(unseen), source="model")
+        return [int(v) for v in out]
+
+    def warm(self, w3, calls: Iterable[Tuple[str, dict]]) -> int:
+        """[(shape, call)] — оценить одним batch все формы, про которые ещё ничего не известно."""
+        todo: Dict[str, dict] = {}
+        for key, call in calls:
+            if key not in todo and self.predict(key) is None:
+                todo[key] = call
+        if not todo:
+            return 0
+        n = 0
+        for key, est in zip(todo, estimate_many(w3, list(todo.values()))):
+            if est is not None:
+                with self._lock:
+                    self._estimates[key] = est
+                n += 1
+        return n
+
+    def settle(self, address: str, nonce: int, rec) -> None:
+        """Receipt пришёл: успешный gasUsed — в выборку; сжёг весь лимит — следующий лимит выше."""
+        with self._lock:
+            got = self._inflight.pop((address.lower(), int(nonce)), None)
+        if got is None or rec is None:
+            return
+        key, limit = got
+        used = int(rec.get("gasUsed") or 0)
+        if rec.get("status") == 1:
+            self.observe(key, used)
+        elif used >= limit * 0.95:
+            METRICS.inc("gas_out_of_gas_total", shape=key.split(":", 1)[0])
+            print(f"gas: {key} reverted at {used}/{limit}, raising the limit")
+            with self._lock:
+                self._floors[key] = max(self._floors.get(key, 0), self._padded(limit))
+
+    def forget(self, address: str, nonce: int) -> None:
+        with self._lock:
+            self._inflight.pop((address.lower(), int(nonce)), None)
+
+def estimate_many(w3, txs: Sequence[dict]) -> List[Optional[int]]:
+    """eth_estimateGas по каждой tx одним JSON-RPC batch (если провайдер умеет); None — ревертится/ошибка."""
+    calls = []
+    for tx in txs:
+        call = {"from": tx["from"], "data": tx.get("data") or "0x", "value": hex(int(tx.get("value") or 0))}
+        if tx.get("to"):
+            call["to"] = tx["to"]
+        calls.append(("eth_estimateGas", [call]))
+    batch = getattr(w3.provider, "make_batch_request", None)
+    try:
+        resps = batch(calls) if batch is not None and len(calls) > 1 else \
+            [w3.provider.make_request(m, p) for m, p in calls]
+    except Exception as e:
+        print("eth_estimateGas failed:", e)
+        return [None] * len(txs)
+    out: List[Optional[int]] = []
+    for r in resps:
+        res = r.get("result") if isinstance(r, dict) else None
+        out.append(int(res, 16) if isinstance(res, str) else None)
+    return out
+
+# общий на процесс
+GAS = GasModel()
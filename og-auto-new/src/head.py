@@ -0,0 +1,119 @@
+# src/head.py
+import threading, time
+from typing import Callable, Dict, List, Optional
+
+from web3 import Web3
+
+from .config import HEAD_POLL_INTERVAL
+
+class HeadTracker:
+    """
+    Голова цепи в памяти: номер и timestamp последнего блока.
+    Один поллер на процесс (eth_blockNumber раз в HEAD_POLL_INTERVAL, get_block только на новом блоке);
+    receipts, fees и deadline читают отсюда, а не ходят в ноду каждый сам.
+    """
+
+    def __init__(self, w3: Web3, poll_interval: float = HEAD_POLL_INTERVAL):
+        self.w3 = w3
+        self.poll_interval = float(poll_interval)
+        self._cond = threading.Condition()
+        self._number: Optional[int] = None
+        self._timestamp = 0
+        self._seen_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[int, int], None]] = []
+
+    # ---- public ----
+    @property
+    def number(self) -> int:
+        return self.latest()[0]
+
+    @property
+    def timestamp(self) -> int:
+        return self.latest()[1]
+
+    def latest(self) -> tuple[int, int]:
+        self._ensure_thread()
+        if self._number is None:
+            self._refresh()
+        with self._cond:
+            return self._number, self._timestamp
+
+    def peek(self) -> Optional[int]:
+        """Последний известный номер без похода в ноду (None — ещё не видели)."""
+        with self._cond:
+            return self._number
+
+    def timestamp_now(self) -> int:
+        """Timestamp головы + сколько прошло с момента, как мы её увидели."""
+        _, ts = self.latest()
+        with self._cond:
+            return int(ts + (time.monotonic() - self._seen_at))
+
+    def wait_for_new(self, after: Optional[int], timeout: float) -> Optional[int]:
+        """Ждать блок новее after (не дольше timeout). Возвращает текущий номер или None."""
+        self._ensure_thread()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._number is None or (after is not None and self._number <= after):
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                self._cond.wait(left)
+            return self._number
+
+    def subscribe(self, cb: Callable[[int, int], None]) -> None:
+        """cb(number, timestamp) на каждый новый блок (из потока поллера)."""
+        with self._cond:
+            self._listeners.append(cb)
+        self._ensure_thread()
+
+    # ---- internals ----
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            with self._cond:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="head", daemon=True)
+                    self._thread.start()
+
+    def _refresh(self) -> bool:
+        """RPC вне лока, под локом только запись. True, если голова сдвинулась."""
+        bn = int(self.w3.eth.block_number)
+        with self._cond:
+            if self._number is not None and bn <= self._number:
+                return False
+        blk = self.w3.eth.get_block(bn)
+        with self._cond:
+            if self._number is not None and int(blk["number"]) <= self._number:
+                return False
+            self._number = int(blk["number"])
+            self._timestamp = int(blk["timestamp"])
+            self._seen_at = time.monotonic()
+            self._cond.notify_all()
+            return True
+
+    def _run(self) -> None:
+        while True:
+            try:
+                moved = self._refresh()
+                with self._cond:
+                    number, ts, listeners = self._number, self._timestamp, list(self._listeners)
+                if moved:
+                    for cb in listeners:
+                        try:
+                            cb(number, ts)
+                        except Exception as e:
+                            print("head listener failed:", e)
+            except Exception as e:
+                print("head poll failed:", e)
+            time.sleep(self.poll_interval)
+
+_HEADS: Dict[int, HeadTracker] = {}
+_HEADS_LOCK = threading.Lock()
+
+def get_head(w3: Web3) -> HeadTracker:
+    with _HEADS_LOCK:
+        h = _HEADS.get(id(w3))
+        if h is None or h.w3 is not w3:
+            h = _HEADS[id(w3)] = HeadTracker(w3)
+        return h
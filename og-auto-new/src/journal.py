@@ -0,0 +1,252 @@
+# src/journal.py
+"""
+Журнал батча (write-ahead) поверх state store: падение посреди батча не теряет отправленное.
+
+- begin(): батч (seed) и планы кошельков — до первой tx
+- action(): какое действие кошелька сейчас идёт, и что оно завершилось
+- signed(): подписанный raw + хэш — синхронно, ДО eth_sendRawTransaction
+- recover(): при старте — receipt'ы «висящих» хэшей одним batch-запросом,
+  неотправленные raw переотправляются, батч продолжается с места падения
+
+Записи синхронные (commit на каждую): в отличие от истории tx, их нельзя потерять в очереди.
+"""
+import json, threading, time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .config import JOURNAL_ENABLED, JOURNAL_RECOVER_TIMEOUT
+from .state import StateStore, get_state
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY, seed TEXT, started REAL, finished REAL
+);
+CREATE TABLE IF NOT EXISTS journal_plans (
+    batch TEXT, wallet TEXT, plan TEXT, next_idx INTEGER,
+    PRIMARY KEY (batch, wallet)
+);
+CREATE TABLE IF NOT EXISTS journal (
+    hash TEXT PRIMARY KEY, batch TEXT, wallet TEXT, idx INTEGER, nonce INTEGER, kind TEXT,
+    raw TEXT, state TEXT, status INTEGER, updated REAL
+);
+CREATE INDEX IF NOT EXISTS journal_batch ON journal (batch, state);
+"""
+
+# какой tx действие считается выполненным (approve / create pool перед ним — не в счёт)
+TERMINAL_KIND = {
+    "swap": "swap",
+    "native_transfer": "transfer",
+    "erc20_transfer": "transfer",
+    "lp_mint": "lp_mint",
+    "deploy": "deploy",
+}
+
+class Journal:
+    def __init__(self, store: StateStore):
+        self.store = store
+        self.batch: Optional[str] = None
+        self._lock = threading.Lock()
+        self._current: Dict[str, int] = {}
+        store._conn().executescript(_SCHEMA)
+
+    def _exec(self, sql: str, args: Iterable[Any] = ()) -> None:
+        c = self.store._conn()
+        with c:
+            c.execute(sql, tuple(args))
+
+    def _exec_many(self, sql: str, rows: List[Tuple]) -> None:
+        c = self.store._conn()
+        with c:
+            c.executemany(sql, rows)
+
+    # ---- батч ----
+    def begin(self, seed: str, plans, batch_id: str | None = None) -> str:
+        """Новый батч или (batch_id задан) продолжение старого — планы уже в базе."""
+        with self._lock:
+            self._current.clear()
+            self.batch = batch_id or f"{int(time.time())}-{seed}"
+        if batch_id is None:
+            c = self.store._conn()
+            with c:
+                c.execute("INSERT INTO batches (id, seed, started) VALUES (?, ?, ?)",
+                          (self.batch, str(seed), time.time()))
+                c.executemany("INSERT INTO journal_plans (batch, wallet, plan, next_idx) VALUES (?, ?, ?, 0)",
+                              [(self.batch, p.owner.lower(), json.dumps(p.to_dict())) for p in plans])
+        return self.batch
+
+    def finish(self) -> None:
+        """Батч доиграл: журнал больше не нужен (история остаётся в txs)."""
+        if self.batch is None:
+            return
+        c = self.store._conn()
+        with c:
+            c.execute("UPDATE batches SET finished = ? WHERE id = ?", (time.time(), self.batch))
+            c.execute("DELETE FROM journal_plans WHERE batch = ?", (self.batch,))
+            c.execute("DELETE FROM journal WHERE batch = ?", (self.batch,))
+        self.batch = None
+
+    # ---- действия ----
+    @contextmanager
+    def action(self, wallet: str, idx: int) -> Iterator[None]:
+        key = wallet.lower()
+        with self._lock:
+            self._current[key] = idx
+        yield
+        # только при успехе: упавшее действие при восстановлении решается по журналу tx
+        self._exec("UPDATE journal_plans SET next_idx = ? WHERE batch = ? AND wallet = ?",
+                   (idx + 1, self.batch, key))
+
+    # ---- tx ----
+    def signed(self, items: List[Tuple[str, int, bytes, str | None]]) -> None:
+        """[(wallet, nonce, raw, kind)] — до отправки."""
+        if self.batch is None or not items:
+            return
+        from eth_utils import keccak
+        now = time.time()
+        rows = []
+        with self._lock:
+            for wallet, nonce, raw, kind in items:
+                key = wallet.lower()
+                rows.append(("0x" + keccak(bytes(raw)).hex(), self.batch, key, self._current.get(key),
+                             int(nonce), kind, "0x" + bytes(raw).hex(), "signed", None, now))
+        self._exec_many("INSERT OR REPLACE INTO journal (hash, batch, wallet, idx, nonce, kind, raw, state, "
+                        "status, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def sent(self, raws: Iterable[bytes], ok: Iterable[Optional[bool]]) -> None:
+        """После отправки: ушедшие — sent, отвергнутые нодой — из журнала вон, None — неизвестно, остаётся signed."""
+        if self.batch is None:
+            return
+        from eth_utils import keccak
+        good, bad = [], []
+        for raw, o in zip(raws, ok):
+            if o is None:
+                continue
+            h = "0x" + keccak(bytes(raw)).hex()
+            (good if o else bad).append((h,))
+        now = time.time()
+        c = self.store._conn()
+        with c:
+            if good:
+                c.executemany("UPDATE journal SET state = 'sent', updated = ? WHERE hash = ?", [(now, h) for h, in good])
+            if bad:
+                c.executemany("DELETE FROM journal WHERE hash = ?", bad)
+
+    def mined(self, txh: str, status: Optional[int]) -> None:
+        if self.batch is None:
+            return
+        self._exec("UPDATE journal SET state = 'done', status = ?, updated = ? WHERE hash = ?",
+                   (status, time.time(), txh.lower()))
+
+    # ---- восстановление ----
+    def unfinished(self) -> Optional[Dict[str, Any]]:
+        rows = self.store.rows("SELECT id, seed FROM batches WHERE finished IS NULL ORDER BY started DESC LIMIT 1")
+        if not rows:
+            return None
+        return {"id": rows[0]["id"], "seed": rows[0]["seed"]}
+
+    def recover(self, w3) -> Optional[Tuple[str, str, List[Tuple[Any, int]]]]:
+        """
+        Незавершённый батч -> (batch_id, seed, [(plan, start_idx)]) или None.
+        Висящие tx: receipt есть — записываем исход; нет — переотправляем сохранённый raw
+        (тот же nonce и подпись, дубль невозможен) и ждём receipt до JOURNAL_RECOVER_TIMEOUT.
+        """
+        from .plan import WalletPlan
+        b = self.unfinished()
+        if b is None:
+            return None
+        bid = b["id"]
+        # более старые незавершённые — уже не продолжить, просто закрываем
+        self._exec("UPDATE batches SET finished = ? WHERE finished IS NULL AND id != ?", (time.time(), bid))
+        inflight = self.store.rows("SELECT hash, raw, wallet, nonce, kind FROM journal"
+                                   " WHERE batch = ? AND state != 'done'", (bid,))
+        print(f"journal: batch {bid} unfinished, {len(inflight)} tx in flight")
+        self.batch = bid
+        if inflight:
+            for r in inflight:
+                # в историю tx они могли не попасть: процесс упал до _track
+                self.store.record_tx(r["hash"], r["wallet"], r["nonce"], r["kind"], None)
+            self._reconcile(w3, [(r["hash"], r["raw"]) for r in inflight])
+
+        out: List[Tuple[Any, int]] = []
+        for r in self.store.rows("SELECT wallet, plan, next_idx FROM journal_plans WHERE batch = ?", (bid,)):
+            plan = WalletPlan.from_dict(json.loads(r["plan"]))
+            start = int(r["next_idx"])
+            if start < len(plan.actions):
+                # действие, на котором упали: если его tx уже ушла — не повторяем
+                want = TERMINAL_KIND.get(plan.actions[start].kind)
+                if want and self.store.rows(
+                        "SELECT 1 FROM journal WHERE batch = ? AND wallet = ? AND idx = ? AND kind = ?"
+                        " AND state != 'dropped' LIMIT 1", (bid, r["wallet"], start, want)):
+                    start += 1
+            if any(a.kind != "sleep" for a in plan.actions[start:]):
+                out.append((plan, start))
+        return bid, b["seed"], out
+
+    def _reconcile(self, w3, items: List[Tuple[str, str]]) -> None:
+        from .head import get_head
+        from .receipts import get_tracker
+        batch = getattr(w3.provider, "make_batch_request", None)
+
+        def call_all(method: str, params: List[List[Any]]) -> List[Any]:
+            if batch is not None:
+                return batch([(method, p) for p in params])
+            return [w3.provider.make_request(method, p) for p in params]
+
+        resps = call_all("eth_getTransactionReceipt", [[h] for h, _ in items])
+        done, missing = [], []
+        for (h, raw), r in zip(items, resps):
+            rec = r.get("result") if isinstance(r, dict) else None
+            if rec:
+                done.append((int(rec.get("status", "0x1"), 16), h))
+            else:
+                missing.append((h, raw))
+        resent: List[str] = []
+        dropped: List[str] = []
+        seen = get_head(w3).peek()
+        if missing:
+            for (h, _), r in zip(missing, call_all("eth_sendRawTransaction", [[raw] for _, raw in missing])):
+                err = r.get("error") if isinstance(r, dict) else {"message": "no response"}
+                msg = str((err or {}).get("message", err)).lower()
+                if not err or "already known" in msg:
+                    resent.append(h)
+                else:
+                    # nonce занят другой tx / неверный — эта уже не пройдёт
+                    dropped.append(h)
+        for status, h in done:
+            self.store.tx_result(h, status)
+        c = self.store._conn()
+        with c:
+            c.executemany("UPDATE journal SET state = 'done', status = ? WHERE hash = ?", done)
+            c.executemany("UPDATE journal SET state = 'dropped' WHERE hash = ?", [(h,) for h in dropped])
+        print(f"journal: {len(done)} mined, {len(resent)} re-sent, {len(dropped)} dropped")
+        if resent:
+            tr = get_tracker(w3)
+            for h in resent:
+                try:
+                    rec = tr.track(h, JOURNAL_RECOVER_TIMEOUT, since=seen).result()
+                    self.mined(h, rec.get("status"))
+                    self.store.tx_result(h, rec.get("status"), rec.get("blockNumber"), rec.get("gasUsed"))
+                except Exception as e:
+                    print(f"journal: {h[:12]}… still pending:", e)
+
+_JOURNALS: Dict[str, Journal] = {}
+_JOURNAL_LOCK = threading.Lock()
+
+def get_journal(w3=None) -> Optional[Journal]:
+    """Журнал на state store (= на chain id сети w3); None без store или при JOURNAL_ENABLED=0."""
+    if not JOURNAL_ENABLED:
+        return None
+    st = get_state(w3)
+    if st is None:
+        return None
+    with _JOURNAL_LOCK:
+        j = _JOURNALS.get(st.path)
+        if j is None:
+            j = _JOURNALS[st.path] = Journal(st)
+        return j
+
+def journal_action(w3, wallet: str, idx: int):
+    j = get_journal(w3)
+    if j is None or j.batch is None:
+        return nullcontext()
+    return j.action(wallet, idx)
@@ -1,30 +1,60 @@
 # src/liquidity.py
 from web3 import Web3
 from .dex import (
-    get_pool, pm_create_pool_if_needed, pm_mint,
+    pm_create_pool_if_needed, pm_mint, pool_slot0, initial_sqrt_price,
     ensure_allowance, erc20, addr_of
 )
-from .config import POS_MANAGER, ADDRESS_TO_SYMBOL
+from .config import POS_MANAGER, ADDRESS_TO_SYMBOL, LP_TICK_WIDTH, LP_SLIPPAGE_BPS
 from .util import get_logger, short, symbol_by_address
+from . import v3math
 log = get_logger()
 
+def mint_params(sqrt_p: int, fee: int, amt0: int, amt1: int, width: int = LP_TICK_WIDTH,
+                slippage_bps: int = LP_SLIPPAGE_BPS):
+    """
+    Тики и минимумы для mint (amt0/amt1 — уже в порядке token0/token1) при цене sqrt_p:
+    (tickLower, tickUpper, liquidity, amount0Min, amount1Min). Считается локально, без пробных tx.
+    """
+    tick = v3math.tick_at_sqrt_ratio(sqrt_p)
+    lo, hi = v3math.range_around(tick, fee, width)
+    liq, need0, need1 = v3math.position(sqrt_p, lo, hi, amt0, amt1)
+    return lo, hi, liq, v3math.with_slippage(need0, slippage_bps), v3math.with_slippage(need1, slippage_bps)
+
 def ensure_pool_and_add_liquidity(w3: Web3, acct, token0, token1, fee: int, amt0: int, amt1: int):
-    pool = get_pool(w3, token0, token1, fee)
-    if pool == "0x0000000000000000000000000000000000000000":
-        log.info("lp ensure: creating pool (create+init)")
-        txh, pool_addr = pm_create_pool_if_needed(w3, acct, token0, token1, fee)
-        if txh:
-            log.info(f"lp ensure: pool created tx={short(txh)} addr={short(pool_addr)}")
+    t0 = addr_of(token0, w3=w3)
+    t1 = addr_of(token1, w3=w3)
+    flipped = t0.lower() > t1.lower()
+    lo_tok, hi_tok = (t1, t0) if flipped else (t0, t1)
+    init = initial_sqrt_price(lo_tok, hi_tok)
 
-    # approvals
-    ensure_allowance(w3, acct, token0, POS_MANAGER, amt0)
-    ensure_allowance(w3, acct, token1, POS_MANAGER, amt1)
+    # pm_create_pool_if_needed сам проверяет getPool — отдельный get_pool здесь был лишним eth_call
+    txh, pool_addr = pm_create_pool_if_needed(w3, acct, token0, token1, fee, init)
+    if txh:
+        log.info(f"lp ensure: pool created tx={short(txh)} addr={short(pool_addr)}")
+        sqrt_p = init
+    else:
+        s0 = pool_slot0(w3, pool_addr)
+        sqrt_p = s0[0] if s0 else None
 
-    # mint
-    txh, _ = pm_mint(w3, acct, token0, token1, amt0, amt1, fee, tickLower=-70000, tickUpper=70000)
+    # approvals (receipt'ы не ждём — mint идёт следующим nonce и ждётся сам)
+    ensure_allowance(w3, acct, token0, POS_MANAGER, amt0, wait=False)
+    ensure_allowance(w3, acct, token1, POS_MANAGER, amt1, wait=False)
+
+    # mint: тики по spacing тира вокруг текущей цены, минимумы — из локального расчёта
+    a0, a1 = (amt1, amt0) if flipped else (amt0, amt1)
+    if sqrt_p:
+        lo, hi, liq, min0, min1 = mint_params(sqrt_p, fee, a0, a1)
+    else:
+        # slot0 не прочитался: full range без минимумов — цена не известна
+        log.info(f"lp: slot0 of {short(pool_addr)} unavailable, minting full range without min amounts")
+        (lo, hi), liq, min0, min1 = v3math.range_around(0, fee), None, 0, 0
+    if liq == 0:
+        log.info(f"lp: amounts {amt0}/{amt1} give zero liquidity in [{lo}, {hi}], skipping mint")
+        return
+    min_a, min_b = (min1, min0) if flipped else (min0, min1)
+    txh, _ = pm_mint(w3, acct, token0, token1, amt0, amt1, fee, tickLower=lo, tickUpper=hi,
+                     amount0Min=min0, amount1Min=min1)
 
     # ВАЖНО: для логов приводим к адресам, иначе мог прилететь dict
-    t0 = addr_of(token0, w3=w3)
-    t1 = addr_of(token1, w3=w3)
     pair = f"{symbol_by_address(t0, ADDRESS_TO_SYMBOL)}/{symbol_by_address(t1, ADDRESS_TO_SYMBOL)}"
-    log.info(f"lp mint {pair} fee={fee} tx={short(txh)}")
\ No newline at end of file
+    log.info(f"lp mint {pair} fee={fee} ticks=[{lo}, {hi}] min={min_a}/{min_b} tx={short(txh)}")
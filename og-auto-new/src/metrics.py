@@ -0,0 +1,274 @@
+# src/metrics.py
+"""
+Метрики процесса: счётчики и гистограммы латентности в памяти.
+
+- RPC: web3 middleware (метод, латентность, ошибки) + провайдер (эндпоинт, ошибки, ретраи)
+- действия: span("swap", wallet=..., pair=...) — approve / swap / transfer / lp_mint / deploy
+- фазы: sign / send / receipt_wait / sleep — видно, куда ушло время батча
+
+Наружу: Prometheus-текст (METRICS_PORT -> http://METRICS_HOST:port/metrics, /metrics.json)
+и/или JSON-дамп раз в METRICS_DUMP_INTERVAL секунд в METRICS_DUMP_PATH.
+"""
+import json, os, threading, time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .config import (
+    METRICS_ENABLED, METRICS_PORT, METRICS_HOST, METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL,
+    METRICS_SPANS_KEEP, ADDRESS_TO_SYMBOL,
+)
+
+# секунды; от быстрого eth_call до ожидания receipt / паузы между действиями
+BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(d: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in d.items() if v is not None))
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        i = 0
+        while i < len(BUCKETS) and v > BUCKETS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum += v
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Верхняя граница бакета, в который попал q-квантиль (как histogram_quantile, грубо)."""
+        if not self.count:
+            return None
+        need, acc = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= need:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+class Registry:
+    def __init__(self, enabled: bool = METRICS_ENABLED, spans_keep: int = METRICS_SPANS_KEEP):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._hists: Dict[str, Dict[Labels, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self.spans: Deque[Dict] = deque(maxlen=max(0, spans_keep))
+        self.started = time.time()
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def inc(self, name: str, v: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + v
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = _labels(labels)
+        with self._lock:
+            h = self._hists.setdefault(name, {}).get(key)
+            if h is None:
+                h = self._hists[name][key] = Histogram()
+            h.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._hists.clear()
+            self.spans.clear()
+
+    # ---- export ----
+    def snapshot(self) -> Dict:
+        with self._lock:
+            counters = {n: [{"labels": dict(k), "value": v} for k, v in s.items()]
+                        for n, s in self._counters.items()}
+            hists = {n: [{
+                "labels": dict(k), "count": h.count, "sum": round(h.sum, 6),
+                "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts)),
+            } for k, h in s.items()] for n, s in self._hists.items()}
+            spans = list(self.spans)
+        return {"time": int(time.time()), "uptime_s": round(time.time() - self.started, 1),
+                "counters": counters, "histograms": hists, "recent_spans": spans}
+
+    def prometheus(self) -> str:
+        def fmt(lbl: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            items = lbl + extra
+            if not items:
+                return ""
+            esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+        out: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    out.append(f"# HELP {name} {self._help[name]}")
+                out.append(f"# TYPE {name} counter")
+                for k, v in series.items():
+                    out.append(f"{name}{fmt(k)} {v:g}")
+            for name, series in sorted(self._hists.items()):
+                if name in self._help:
+                    out.append(f"# HELP {name} {self._help[name]}")
+                out.append(f"# TYPE {name} histogram")
+                for k, h in series.items():
+                    acc = 0
+                    for b, c in zip(list(BUCKETS) + ["+Inf"], h.counts):
+                        acc += c
+                        out.append(f"{name}_bucket{fmt(k, (('le', str(b)),))} {acc}")
+                    out.append(f"{name}_sum{fmt(k)} {h.sum:.6f}")
+                    out.append(f"{name}_count{fmt(k)} {h.count}")
+        return "\n".join(out) + "\n"
+
+METRICS = Registry()
+METRICS.describe("rpc_requests_total", "JSON-RPC calls by method")
+METRICS.describe("rpc_errors_total", "JSON-RPC calls that returned an error or raised")
+METRICS.describe("rpc_latency_seconds", "JSON-RPC call latency by method")
+METRICS.describe("rpc_endpoint_requests_total", "HTTP posts by endpoint")
+METRICS.describe("rpc_endpoint_errors_total", "failed HTTP posts by endpoint")
+METRICS.describe("rpc_endpoint_latency_seconds", "HTTP post latency by endpoint")
+METRICS.describe("rpc_retries_total", "requests that succeeded only on a fallback endpoint")
+METRICS.describe("action_seconds", "high-level action duration (approve/swap/transfer/lp_mint/deploy)")
+METRICS.describe("phase_seconds", "time spent in sign / send / receipt_wait / sleep")
+
+# ---- web3 middleware ----
+
+def rpc_metrics_middleware(make_request: Callable, w3) -> Callable:
+    def middleware(method, params):
+        t0 = time.perf_counter()
+        try:
+            resp = make_request(method, params)
+        except Exception:
+            METRICS.inc("rpc_errors_total", method=method)
+            raise
+        finally:
+            METRICS.inc("rpc_requests_total", method=method)
+            METRICS.observe("rpc_latency_seconds", time.perf_counter() - t0, method=method)
+        if isinstance(resp, dict) and "error" in resp:
+            METRICS.inc("rpc_errors_total", method=method)
+        return resp
+    return middleware
+
+def instrument(w3) -> None:
+    """Повесить RPC-middleware на w3 (один раз)."""
+    if METRICS.enabled and "metrics" not in w3.middleware_onion:
+        w3.middleware_onion.add(rpc_metrics_middleware, "metrics")
+
+# ---- spans ----
+
+def pair_label(*tokens: str) -> str:
+    return "/".join(ADDRESS_TO_SYMBOL.get((t or "").lower(), (t or "")[:8]) for t in tokens)
+
+@contextmanager
+def span(action: str, wallet: str | None = None, pair: str | None = None) -> Iterator[Dict]:
+    """
+    Длительность действия: в гистограмму — по action/pair/status (кошелёк в метку не кладём,
+    у Prometheus взорвётся кардинальность), в recent_spans — всё вместе с кошельком.
+    Внутри можно выставить rec["status"] = "error", если ошибка проглочена.
+    """
+    rec: Dict[str, Any] = {"action": action, "wallet": wallet, "pair": pair, "status": "ok"}
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    except BaseException:
+        rec["status"] = "error"
+        raise
+    finally:
+        dt = time.perf_counter() - t0
+        METRICS.observe("action_seconds", dt, action=action, pair=pair, status=rec["status"])
+        if METRICS.enabled:
+            rec.update(seconds=round(dt, 4), at=int(time.time()))
+            with METRICS._lock:
+                METRICS.spans.append(rec)
+
+def phase(name: str):
+    return METRICS.timer("phase_seconds", phase=name)
+
+# ---- exporters ----
+
+_EXPORT_LOCK = threading.Lock()
+_EXPORTERS: Dict[str, Any] = {}
+
+def dump_json(path: str = METRICS_DUMP_PATH) -> None:
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(METRICS.snapshot(), f, indent=1)
+    os.replace(tmp, path)
+
+def _dump_loop(path: str, interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            dump_json(path)
+        except Exception as e:
+            print("metrics dump failed:", e)
+
+def _serve(port: int, host: str = METRICS_HOST):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, ctype = json.dumps(METRICS.snapshot()).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, ctype = METRICS.prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer((host or "127.0.0.1", port), Handler)
+    threading.Thread(target=srv.serve_forever, name="metrics-http", daemon=True).start()
+    return srv
+
+def start_exporters(port: int = METRICS_PORT, dump_path: str = METRICS_DUMP_PATH,
+                    dump_interval: float = METRICS_DUMP_INTERVAL, host: str = METRICS_HOST) -> None:
+    """Идемпотентно: HTTP /metrics (если port) и периодический JSON-дамп (если path)."""
+    if not METRICS.enabled:
+        return
+    with _EXPORT_LOCK:
+        if port and "http" not in _EXPORTERS:
+            try:
+                _EXPORTERS["http"] = _serve(int(port), host)
+                print(f"metrics: http://{host or '127.0.0.1'}:{port}/metrics")
+            except OSError as e:
+                print("metrics endpoint failed:", e)
+        if dump_path and "dump" not in _EXPORTERS:
+            t = threading.Thread(target=_dump_loop, args=(dump_path, max(1.0, dump_interval)),
+                                 name="metrics-dump", daemon=True)
+            t.start()
+            _EXPORTERS["dump"] = t
@@ -0,0 +1,145 @@
+# src/multicall.py
+import threading
+from functools import lru_cache
+from typing import Any, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from eth_abi import decode, encode
+from eth_utils import function_signature_to_4byte_selector
+from web3 import Web3
+
+from .config import MULTICALL3, MULTICALL_CHUNK
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+class Call(NamedTuple):
+    target: str
+    sig: str                      # "allowance(address,address)"
+    args: Tuple[Any, ...]
+    out: Tuple[str, ...]          # ("uint256",)
+
+@lru_cache(maxsize=None)
+def _selector(sig: str) -> bytes:
+    return function_signature_to_4byte_selector(sig)
+
+@lru_cache(maxsize=None)
+def _in_types(sig: str) -> Tuple[str, ...]:
+    # запятые внутри struct "(a,b)" — не разделители аргументов
+    inner = sig[sig.index("(") + 1:-1]
+    out, depth, cur = [], 0, ""
+    for ch in inner:
+        if ch == "," and depth == 0:
+            out.append(cur)
+            cur = ""
+            continue
+        depth += (ch == "(") - (ch == ")")
+        cur += ch
+    out.append(cur)
+    return tuple(t for t in out if t)
+
+def _calldata(c: Call) -> bytes:
+    return _selector(c.sig) + encode(list(_in_types(c.sig)), list(c.args))
+
+def _decode_out(c: Call, data: bytes) -> Any:
+    vals = decode(list(c.out), bytes(data))
+    return vals[0] if len(vals) == 1 else vals
+
+_HAS_MC: dict = {}
+_HAS_MC_LOCK = threading.Lock()
+
+def _multicall_available(w3: Web3) -> bool:
+    if not MULTICALL3:
+        return False
+    with _HAS_MC_LOCK:
+        ok = _HAS_MC.get(id(w3))
+        if ok is None:
+            try:
+                ok = len(w3.eth.get_code(Web3.to_checksum_address(MULTICALL3))) > 0
+            except Exception:
+                # сетевой сбой — не ответ: в этот раз по одному, в следующий спросим снова
+                return False
+            _HAS_MC[id(w3)] = ok
+        return ok
+
+def _via_multicall(w3: Web3, calls: Sequence[Call]) -> List[Optional[Any]]:
+    out: List[Optional[Any]] = []
+    mc = Web3.to_checksum_address(MULTICALL3)
+    for i in range(0, len(calls), MULTICALL_CHUNK):
+        chunk = calls[i:i + MULTICALL_CHUNK]
+        payload = [(Web3.to_checksum_address(c.target), True, _calldata(c)) for c in chunk]
+        data = _selector("aggregate3((address,bool,bytes)[])") + encode(["(address,bool,bytes)[]"], [payload])
+        raw = w3.eth.call({"to": mc, "data": data})
+        (results,) = decode(["(bool,bytes)[]"], bytes(raw))
+        for c, (ok, ret) in zip(chunk, results):
+            try:
+                out.append(_decode_out(c, ret) if ok and ret else None)
+            except Exception:
+                out.append(None)
+    return out
+
+def _via_batch(w3: Web3, calls: Sequence[Call]) -> List[Optional[Any]]:
+    reqs = [("eth_call", [{"to": Web3.to_checksum_address(c.target), "data": "0x" + _calldata(c).hex()}, "latest"])
+            for c in calls]
+    batch = getattr(w3.provider, "make_batch_request", None)
+    if batch is not None:
+        resps = batch(reqs)
+    else:
+        resps = [w3.provider.make_request(m, p) for m, p in reqs]
+    out: List[Optional[Any]] = []
+    for c, r in zip(calls, resps):
+        res = r.get("result") if isinstance(r, dict) else None
+        try:
+            out.append(_decode_out(c, bytes.fromhex(res[2:])) if res and res != "0x" else None)
+        except Exception:
+            out.append(None)
+    return out
+
+def aggregate(w3: Web3, calls: Sequence[Call]) -> List[Optional[Any]]:
+    """
+    Пачка view-вызовов за один eth_call через Multicall3 (или JSON-RPC batch, если его нет).
+    Результаты в порядке calls; упавший вызов -> None.
+    """
+    calls = list(calls)
+    if not calls:
+        return []
+    if _multicall_available(w3):
+        try:
+            return _via_multicall(w3, calls)
+        except Exception as e:
+            print("multicall failed, falling back to batch:", e)
+    return _via_batch(w3, calls)
+
+# ---- bulk helpers ----
+
+def allowances(w3: Web3, triples: Iterable[Tuple[str, str, str]]) -> List[Optional[int]]:
+    """[(owner, token, spender)] -> [allowance]"""
+    return aggregate(w3, [
+        Call(t, "allowance(address,address)", (Web3.to_checksum_address(o), Web3.to_checksum_address(s)), ("uint256",))
+        for o, t, s in triples
+    ])
+
+def balances(w3: Web3, pairs: Iterable[Tuple[str, str]]) -> List[Optional[int]]:
+    """[(owner, token)] -> [balanceOf]"""
+    return aggregate(w3, [
+        Call(t, "balanceOf(address)", (Web3.to_checksum_address(o),), ("uint256",))
+        for o, t in pairs
+    ])
+
+def decimals(w3: Web3, tokens: Iterable[str]) -> List[Optional[int]]:
+    return aggregate(w3, [Call(t, "decimals()", (), ("uint8",)) for t in tokens])
+
+def pools(w3: Web3, factory: str, triples: Iterable[Tuple[str, str, int]]) -> List[Optional[str]]:
+    """[(tokenA, tokenB, fee)] -> [pool address | ZERO_ADDRESS | None при ошибке]"""
+    res = aggregate(w3, [
+        Call(factory, "getPool(address,address,uint24)",
+             (Web3.to_checksum_address(a), Web3.to_checksum_address(b), int(fee)), ("address",))
+        for a, b, fee in triples
+    ])
+    return [None if p is None else (Web3.to_checksum_address(p) if int(p, 16) else ZERO_ADDRESS) for p in res]
+
+def slot0s(w3: Web3, pools: Iterable[str]) -> List[Optional[Tuple[int, int]]]:
+    """[pool] -> [(sqrtPriceX96, tick) | None]"""
+    res = aggregate(w3, [
+        Call(p, "slot0()", (), ("uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool"))
+        for p in pools
+    ])
+    return [None if r is None else (int(r[0]), int(r[1])) for r in res]
@@ -0,0 +1,126 @@
+# src/nonce.py
+import threading
+from typing import Dict, List, Optional, Set
+
+# подстроки ошибок ноды, после которых локальный счётчик надо сверить с цепью
+_NONCE_ERRORS = (
+    "nonce too low",
+    "nonce has already been used",   # то же 'nonce too low' в формулировке других нод
+    "replacement transaction underpriced",
+)
+
+def is_nonce_error(exc: Exception) -> bool:
+    msg = str(exc).lower()
+    return any(s in msg for s in _NONCE_ERRORS)
+
+def is_already_known(exc) -> bool:
+    """Нода уже держит ровно эту tx в mempool (повторная отправка того же raw) — это успех."""
+    return "already known" in str(exc).lower()
+
+class NonceManager:
+    """
+    Локальная выдача nonce по адресу.
+    Цепь читается один раз (pending count), дальше nonce раздаются из памяти,
+    так что approve и swap одного кошелька можно слать подряд, не дожидаясь receipt.
+    Между запусками не сохраняется: после падения tx из mempool могли пропасть,
+    и сохранённый счётчик дал бы дырку — при старте всегда pending count из цепи.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: Dict[str, threading.Lock] = {}
+        self._next: Dict[str, int] = {}
+        self._pending: Dict[str, Set[int]] = {}
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._guard:
+            lk = self._locks.get(key)
+            if lk is None:
+                lk = self._locks[key] = threading.Lock()
+            return lk
+
+    def _read_chain(self, w3, address: str) -> int:
+        return int(w3.eth.get_transaction_count(address, "pending"))
+
+    def next(self, w3, address: str) -> int:
+        key = address.lower()
+        with self._lock_for(key):
+            if key not in self._next:
+                self._next[key] = self._read_chain(w3, address)
+                self._pending[key] = set()
+            n = self._next[key]
+            self._next[key] = n + 1
+            self._pending[key].add(n)
+        return n
+
+    def _peek(self, key: str) -> Optional[int]:
+        # счётчик читается под локом адреса: next/release меняют его из потоков кошельков
+        with self._lock_for(key):
+            return self._next.get(key)
+
+    def prime(self, w3, addresses) -> int:
+        """Pending-счётчики для многих адресов разом (JSON-RPC batch, если провайдер умеет)."""
+        todo = [a for a in addresses if self._peek(a.lower()) is None]
+        if not todo:
+            return 0
+        batch = getattr(w3.provider, "make_batch_request", None)
+        if batch is None:
+            for a in todo:
+                self.release(a, self.next(w3, a))
+            return len(todo)
+        resps = batch([("eth_getTransactionCount", [a, "pending"]) for a in todo])
+        n = 0
+        for a, r in zip(todo, resps):
+            res = r.get("result") if isinstance(r, dict) else None
+            if not res:
+                continue
+            key = a.lower()
+            with self._lock_for(key):
+                if key not in self._next:
+                    self._next[key] = int(res, 16)
+                    self._pending[key] = set()
+                    n += 1
+        return n
+
+    def confirm(self, address: str, nonce: int) -> None:
+        """Tx с этим nonce замайнена — больше не pending."""
+        key = address.lower()
+        with self._lock_for(key):
+            self._pending.get(key, set()).discard(int(nonce))
+
+    def release(self, address: str, nonce: int) -> None:
+        """Nonce выдан, но tx так и не ушла в сеть."""
+        key = address.lower()
+        with self._lock_for(key):
+            self._pending.get(key, set()).discard(int(nonce))
+            if self._next.get(key) == int(nonce) + 1:
+                self._next[key] = int(nonce)
+            else:
+                # дырка в последовательности: пусть следующий next() перечитает цепь
+                self._next.pop(key, None)
+
+    def resync(self, w3, address: str) -> int:
+        """Сверка с цепью после 'nonce too low' / 'replacement underpriced'."""
+        key = address.lower()
+        with self._lock_for(key):
+            chain = self._read_chain(w3, address)
+            self._next[key] = chain
+            self._pending[key] = {n for n in self._pending.get(key, set()) if n >= chain}
+            return chain
+
+    def pending(self, address: str) -> List[int]:
+        key = address.lower()
+        with self._lock_for(key):
+            return sorted(self._pending.get(key, set()))
+
+    def reset(self, address: str | None = None) -> None:
+        with self._guard:
+            if address is None:
+                self._next.clear()
+                self._pending.clear()
+            else:
+                self._next.pop(address.lower(), None)
+                self._pending.pop(address.lower(), None)
+
+# общий на процесс
+NONCES = NonceManager()
@@ -1,13 +1,18 @@
 # src/orchestrator.py
 import random, time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict
-from eth_account import Account
 from .config import (
-    PRIVATE_KEYS, MAX_WALLETS_PER_BATCH, RANDOM_SKIP_PROB,
-    ROUTER, POS_MANAGER
+    PRIVATE_KEYS, MAX_WALLETS_PER_BATCH, RANDOM_SKIP_PROB, WALLET_CONCURRENCY,
+    ROUTER, POS_MANAGER, SYMBOL_TO_ADDRESS, V3_FACTORY, V3_FEE, ENABLE_DEPLOY,
+    SCHEDULED, SCHEDULER_WORKERS, SLEEP_SCALE, PREAPPROVE,
 )
-from .chain import get_w3
-from .strategy import run_for_wallet
+
+# web3 / eth_account / strategy импортируются при первом прогоне, не при старте процесса
+
+def _short_addr(pk: str) -> str:
+    from eth_account import Account
+    return Account.from_key(pk).address[:10] + "…"
 
 def _pick_wallets() -> List[str]:
     if not PRIVATE_KEYS:
@@ -16,18 +21,171 @@ def _pick_wallets() -> List[str]:
     random.shuffle(pks)
     return pks[:MAX_WALLETS_PER_BATCH]
 
-def run_batch_once():
-    wallets = _pick_wallets()
-    print("batch wallets:", ", ".join([Account.from_key(pk).address[:10] + "…" for pk in wallets]))
-    for pk in wallets:
-        if random.random() < RANDOM_SKIP_PROB:
-            continue
+def warm_pools() -> None:
+    """Все пары из TOKENS с V3_FEE — один multicall на старте, дальше из индекса."""
+    from .chain import get_w3
+    from .pools import POOLS
+    try:
+        addrs = list(SYMBOL_TO_ADDRESS.values())
+        pairs = [(a, b, V3_FEE) for i, a in enumerate(addrs) for b in addrs[i + 1:]]
+        n = POOLS.warm(get_w3(), V3_FACTORY, pairs)
+        print(f"pool index: {len(pairs)} pairs, {n} fetched")
+    except Exception as e:
+        print("pool warmup failed:", e)
+
+def _prefetch(plans) -> None:
+    """Всё, что нужно планам батча (allowance, пулы, nonce), — пачками до первой tx."""
+    from .chain import get_w3
+    from .strategy import prefetch_for_plans
+    try:
+        st = prefetch_for_plans(get_w3(), plans, {"ROUTER": ROUTER})
+        print(f"prefetch: {st['allowances']} allowances, {st['pools']} pools, {st['nonces']} nonces, "
+              f"{st['gas']} gas estimates, {st['quotes']} pool states")
+    except Exception as e:
+        print("prefetch failed:", e)
+
+def _preapprove(wallets: List[str], plans) -> None:
+    from .chain import get_w3
+    from .strategy import preapprove_for_plans
+    from .util import make_account
+    try:
+        accounts = {a.address: a for a in map(make_account, wallets)}
+        preapprove_for_plans(get_w3(), accounts, plans, {"ROUTER": ROUTER})
+    except Exception as e:
+        print("preapprove failed:", e)
+
+def _run_one(pk: str, plan=None, start: int = 0) -> bool:
+    """Действия одного кошелька строго по порядку; ошибка не выходит за пределы кошелька."""
+    from .chain import get_w3
+    from .strategy import run_for_wallet
+    try:
+        w3 = get_w3()
+        cfg: Dict = {"ROUTER": ROUTER, "POS_MANAGER": POS_MANAGER}
+        run_for_wallet(w3, pk, cfg, plan, start)
+        return True
+    except KeyboardInterrupt:
+        raise
+    except Exception as e:
+        print(f"wallet {_short_addr(pk)} failed:", e)
+        time.sleep(5)
+        return False
+
+def _run_scheduled(wallets: List[str], plans, workers: int, starts: List[int]) -> None:
+    """Все кошельки батча на одном Scheduler: пока кто-то «спит», потоки заняты другими."""
+    from .chain import get_w3
+    from .plan import Sleep
+    from .scheduler import Scheduler
+    from .strategy import schedule_plan
+    from .util import make_account
+    w3 = get_w3()
+    cfg: Dict = {"ROUTER": ROUTER, "POS_MANAGER": POS_MANAGER}
+    sched = Scheduler(workers)
+    delay = 0.0
+    for pk, plan, start in zip(wallets, plans, starts):
+        schedule_plan(sched, w3, make_account(pk), plan, cfg, start_delay=delay, start=start)
+        # старты разносим паузами «между кошельками», как при последовательном прогоне:
+        # следующий кошелёк — через хвостовую паузу этого, накопленно
+        tail = plan.actions[-1] if plan.actions else None
+        if isinstance(tail, Sleep):
+            delay += tail.seconds * SLEEP_SCALE
+    sched.run()
+
+def _restore_state() -> None:
+    """Allowance и газ из state store — до warm/prefetch, чтобы те не читали цепь зря."""
+    from .chain import get_w3
+    from .state import attach_state
+    try:
+        st = attach_state(get_w3())
+        if st:
+            print(f"state: restored {st['allowances']} allowances, {st['gas']} gas shapes")
+    except Exception as e:
+        print("state restore failed:", e)
+
+def _resume(concurrency: int | None, scheduled: bool | None) -> bool:
+    """Батч, прерванный падением процесса: сверить висящие tx и доиграть с места остановки."""
+    from eth_account import Account
+    from .chain import get_w3
+    from .journal import get_journal
+    w3 = get_w3()
+    j = get_journal(w3)
+    if j is None:
+        return False
+    try:
+        found = j.recover(w3)
+    except Exception as e:
+        print("journal recovery failed:", e)
+        return False
+    if found is None:
+        return False
+    bid, seed, todo = found
+    keys = {Account.from_key(pk).address.lower(): pk for pk in PRIVATE_KEYS}
+    todo = [(p, start) for p, start in todo if p.owner.lower() in keys]
+    print(f"resuming batch {bid} (seed {seed}): {len(todo)} wallets left")
+    j.begin(seed, [p for p, _ in todo], batch_id=bid)
+    plans = [p for p, _ in todo]
+    if plans:
+        _prefetch(plans)
+        _execute([keys[p.owner.lower()] for p in plans], plans, [s for _, s in todo], concurrency, scheduled)
+    j.finish()
+    return True
+
+def run_batch_once(concurrency: int | None = None, scheduled: bool | None = None):
+    from .metrics import start_exporters, dump_json
+    from .chain import get_w3
+    from .state import get_state
+    start_exporters()
+    _restore_state()
+    try:
+        if not _resume(concurrency, scheduled):
+            _run_batch(concurrency, scheduled)
+    finally:
+        try:
+            dump_json()
+        except Exception as e:
+            print("metrics dump failed:", e)
         try:
-            w3 = get_w3()
-            cfg: Dict = {"ROUTER": ROUTER, "POS_MANAGER": POS_MANAGER}
-            run_for_wallet(w3, pk, cfg)
-        except KeyboardInterrupt:
-            raise
+            st = get_state(get_w3())
+            if st is not None:
+                st.flush()
         except Exception as e:
-            print("wallet failed:", e)
-            time.sleep(5)
\ No newline at end of file
+            print("state flush failed:", e)
+
+def _run_batch(concurrency: int | None, scheduled: bool | None) -> None:
+    wallets = _pick_wallets()
+    print("batch wallets:", ", ".join([_short_addr(pk) for pk in wallets]))
+    wallets = [pk for pk in wallets if random.random() >= RANDOM_SKIP_PROB]
+    if ENABLE_DEPLOY:
+        # LLM-спеки начинают готовиться параллельно с первыми свапами
+        from .specs import get_spec_producer
+        get_spec_producer()
+    from eth_account import Account
+    from .plan import plan_batch, batch_seed
+    seed = batch_seed()
+    plans = plan_batch([Account.from_key(pk).address for pk in wallets], seed)
+    print(f"batch plan seed: {seed}  (PLAN_SEED={seed} to replay)")
+    from .chain import get_w3
+    from .journal import get_journal
+    j = get_journal(get_w3())
+    if j is not None:
+        # до первой tx: после падения батч продолжится отсюда, а не начнётся заново
+        j.begin(seed, plans)
+    warm_pools()
+    _prefetch(plans)
+    if PREAPPROVE:
+        _preapprove(wallets, plans)
+    _execute(wallets, plans, [0] * len(plans), concurrency, scheduled)
+    if j is not None:
+        j.finish()
+
+def _execute(wallets: List[str], plans, starts: List[int], concurrency: int | None,
+             scheduled: bool | None) -> None:
+    if SCHEDULED if scheduled is None else scheduled:
+        _run_scheduled(wallets, plans, max(1, int(concurrency or SCHEDULER_WORKERS)), starts)
+        return
+    workers = max(1, int(concurrency or WALLET_CONCURRENCY))
+    if workers == 1 or len(wallets) <= 1:
+        for pk, plan, start in zip(wallets, plans, starts):
+            _run_one(pk, plan, start)
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(wallets)), thread_name_prefix="wallet") as ex:
+        list(ex.map(_run_one, wallets, plans, starts))
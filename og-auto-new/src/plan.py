@@ -0,0 +1,163 @@
+# src/plan.py
+"""
+Чистый планировщик: конфиг + seed -> явный список действий кошелька, без I/O.
+План батча известен заранее: можно разом префетчить allowance/пулы/nonce,
+прогнать план «всухую» и воспроизвести падение по seed:
+
+    python -m src.plan --seed 1234                # планы для PRIVATE_KEYS
+    python -m src.plan --seed 1234 --owners 0xA,0xB
+"""
+import json, random
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Union
+
+from .config import (
+    TOKENS, V3_FEE, LP_PROBABILITY, DEPLOY_PROBABILITY,
+    TRANSFERS_MIN, TRANSFERS_MAX, SWAPS_MIN, SWAPS_MAX,
+    SLEEP_BETWEEN, ENABLE_DEPLOY, ACTION_SLEEP_BASE, ACTION_SLEEP_JITTER,
+    PLAN_SEED,
+)
+
+@dataclass(frozen=True)
+class Swap:
+    token_in: str
+    token_out: str
+    amount_in: int
+    fee: int
+    kind: str = "swap"
+
+@dataclass(frozen=True)
+class NativeTransfer:
+    to: str
+    amount_wei: int
+    kind: str = "native_transfer"
+
+@dataclass(frozen=True)
+class Erc20Transfer:
+    token: str
+    to: str
+    amount: int
+    kind: str = "erc20_transfer"
+
+@dataclass(frozen=True)
+class AddLiquidity:
+    token0: str
+    token1: str
+    fee: int
+    amount0: int
+    amount1: int
+    kind: str = "lp_mint"
+
+@dataclass(frozen=True)
+class Deploy:
+    kind: str = "deploy"
+
+@dataclass(frozen=True)
+class Sleep:
+    seconds: int
+    reason: str = ""
+    kind: str = "sleep"
+
+Action = Union[Swap, NativeTransfer, Erc20Transfer, AddLiquidity, Deploy, Sleep]
+
+_KINDS = {c.kind: c for c in (Swap, NativeTransfer, Erc20Transfer, AddLiquidity, Deploy, Sleep)}
+
+@dataclass
+class WalletPlan:
+    owner: str
+    seed: str
+    actions: List[Action] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {"owner": self.owner, "seed": self.seed, "actions": [asdict(a) for a in self.actions]}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "WalletPlan":
+        acts = []
+        for a in d.get("actions", []):
+            a = dict(a)
+            acts.append(_KINDS[a.pop("kind")](**a))
+        return cls(owner=d["owner"], seed=str(d.get("seed", "")), actions=acts)
+
+def _symbols_universe() -> List[str]:
+    # только строки-символы, никаких dict!
+    return [sym for sym in TOKENS.keys()]
+
+def _rand_two(rng: random.Random, tokens: List[str]) -> tuple[str, str]:
+    if len(tokens) < 2:
+        raise RuntimeError("Need at least 2 tokens in TOKENS")
+    a, b = rng.sample(tokens, 2)
+    return a, b
+
+def _random_amount_wei(rng: random.Random) -> int:
+    return rng.randint(10**8, 10**10)
+
+def _random_amount_erc20(rng: random.Random) -> int:
+    return rng.randint(10**9, 10**12)
+
+def _after_action(rng: random.Random, extra_min: int = 1, extra_max: int = 3) -> Sleep:
+    t = ACTION_SLEEP_BASE + rng.randint(0, max(ACTION_SLEEP_JITTER, 0)) + rng.randint(extra_min, extra_max)
+    return Sleep(t, "after action")
+
+def plan_for_wallet(owner: str, seed: Union[int, str, None] = None) -> WalletPlan:
+    """Тот же порядок и распределения, что были в run_for_wallet: swaps -> transfers -> LP -> deploy."""
+    seed = str(seed if seed is not None else random.getrandbits(64))
+    rng = random.Random(f"{seed}:{owner.lower()}")
+    syms = _symbols_universe()
+    acts: List[Action] = []
+
+    # 1) SWAPS
+    for _ in range(rng.randint(SWAPS_MIN, SWAPS_MAX)):
+        t_in, t_out = _rand_two(rng, syms)
+        acts.append(Swap(t_in, t_out, _random_amount_erc20(rng), V3_FEE))
+        acts.append(_after_action(rng))
+
+    # 2) TRANSFERS
+    for _ in range(rng.randint(TRANSFERS_MIN, TRANSFERS_MAX)):
+        if rng.random() < 0.5:
+            acts.append(NativeTransfer(owner, _random_amount_wei(rng)))
+        else:
+            acts.append(Erc20Transfer(rng.choice(syms), owner, _random_amount_erc20(rng)))
+        acts.append(_after_action(rng))
+
+    # 3) LP (по вероятности)
+    if rng.random() < LP_PROBABILITY:
+        t0, t1 = _rand_two(rng, syms)
+        acts.append(AddLiquidity(t0, t1, V3_FEE, _random_amount_erc20(rng), _random_amount_erc20(rng)))
+        acts.append(_after_action(rng, 3, 10))
+
+    # 4) DEPLOY (опционально)
+    if ENABLE_DEPLOY and rng.random() < DEPLOY_PROBABILITY:
+        acts.append(Deploy())
+        acts.append(_after_action(rng, 0, 0))
+
+    # пауза между кошельками
+    acts.append(Sleep(rng.randint(*SLEEP_BETWEEN), "between wallets"))
+    return WalletPlan(owner, seed, acts)
+
+def batch_seed(seed: Union[int, str, None] = None) -> str:
+    if seed is None or seed == "":
+        seed = PLAN_SEED or random.SystemRandom().getrandbits(32)
+    return str(seed)
+
+def plan_batch(owners: Sequence[str], seed: Union[int, str, None] = None) -> List[WalletPlan]:
+    """Один seed на батч; план каждого кошелька зависит только от (seed, owner)."""
+    seed = batch_seed(seed)
+    return [plan_for_wallet(o, seed) for o in owners]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description="dry-run: print wallet plans as JSON")
+    ap.add_argument("--seed", default=None)
+    ap.add_argument("--owners", default="", help="comma-separated addresses (default: PRIVATE_KEYS)")
+    args = ap.parse_args(argv)
+    owners = [o.strip() for o in args.owners.split(",") if o.strip()]
+    if not owners:
+        from eth_account import Account
+        from .config import PRIVATE_KEYS
+        owners = [Account.from_key(pk).address for pk in PRIVATE_KEYS]
+    print(json.dumps([p.to_dict() for p in plan_batch(owners, args.seed)], indent=1))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
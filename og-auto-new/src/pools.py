@@ -0,0 +1,122 @@
+# src/pools.py
+import json, os, threading, time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from web3 import Web3
+
+from . import multicall
+from .config import POOL_INDEX_PATH, POOL_ZERO_TTL
+
+ZERO_ADDRESS = multicall.ZERO_ADDRESS
+
+def _key(chain: int, factory: str, a: str, b: str, fee: int) -> str:
+    # chain id в ключе: файл индекса общий для всех сетей, а адреса фабрик могут совпадать
+    x, y = sorted((a.lower(), b.lower()))
+    return f"{int(chain)}:{factory.lower()}:{x}:{y}:{int(fee)}"
+
+def _chain(w3: Web3) -> int:
+    from .util import chain_id
+    return chain_id(w3)
+
+class PoolIndex:
+    """
+    Кэш getPool(tokenA, tokenB, fee).
+    Ненулевой адрес пула не меняется никогда — храним навсегда и на диске,
+    «пула нет» — только в памяти и на POOL_ZERO_TTL секунд.
+    """
+
+    def __init__(self, path: str = POOL_INDEX_PATH, zero_ttl: float = POOL_ZERO_TTL):
+        self.path = path
+        self.zero_ttl = float(zero_ttl)
+        self._lock = threading.Lock()
+        self._pools: Optional[Dict[str, str]] = None
+        self._zeros: Dict[str, float] = {}
+
+    def _load(self) -> Dict[str, str]:
+        if self._pools is None:
+            self._pools = {}
+            if self.path and os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        self._pools = dict(json.load(f))
+                except Exception as e:
+                    print("pool index unreadable, starting empty:", e)
+        return self._pools
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._pools, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def lookup(self, w3: Web3, factory: str, a: str, b: str, fee: int) -> Optional[str]:
+        """Адрес / ZERO_ADDRESS из кэша, None — надо спрашивать фабрику."""
+        k = _key(_chain(w3), factory, a, b, fee)
+        with self._lock:
+            addr = self._load().get(k)
+            if addr:
+                return addr
+            exp = self._zeros.get(k)
+            if exp is not None and exp > time.monotonic():
+                return ZERO_ADDRESS
+            return None
+
+    def record(self, w3: Web3, factory: str, a: str, b: str, fee: int, addr: str) -> None:
+        k = _key(_chain(w3), factory, a, b, fee)
+        with self._lock:
+            if addr and int(addr, 16) != 0:
+                self._zeros.pop(k, None)
+                pools = self._load()
+                if pools.get(k) == addr:
+                    return
+                pools[k] = addr
+                self._save()
+            else:
+                self._zeros[k] = time.monotonic() + self.zero_ttl
+
+    def invalidate(self, w3: Web3, factory: str, a: str, b: str, fee: int) -> None:
+        with self._lock:
+            self._zeros.pop(_key(_chain(w3), factory, a, b, fee), None)
+
+    def warm(self, w3: Web3, factory: str, triples: Iterable[Tuple[str, str, int]]) -> int:
+        """Одним multicall подтянуть всё, чего нет в кэше. Возвращает число запрошенных пар."""
+        todo = [(a, b, int(fee)) for a, b, fee in triples if self.lookup(w3, factory, a, b, fee) is None]
+        if not todo:
+            return 0
+        res = multicall.pools(w3, factory, todo)
+        found = 0
+        chain = _chain(w3)
+        with self._lock:
+            pools = self._load()
+            for (a, b, fee), addr in zip(todo, res):
+                if addr is None:
+                    continue
+                k = _key(chain, factory, a, b, fee)
+                if int(addr, 16) != 0:
+                    pools[k] = addr
+                    found += 1
+                else:
+                    self._zeros[k] = time.monotonic() + self.zero_ttl
+            if found:
+                self._save()
+        return len(todo)
+
+    def get(self, w3: Web3, factory: str, a: str, b: str, fee: int) -> str:
+        addr = self.lookup(w3, factory, a, b, fee)
+        if addr is not None:
+            return addr
+        (addr,) = multicall.pools(w3, factory, [(a, b, fee)])
+        if addr is None:
+            raise RuntimeError(f"getPool failed for {a}/{b} fee={fee}")
+        self.record(w3, factory, a, b, fee, addr)
+        return addr
+
+    def get_many(self, w3: Web3, factory: str, triples: Iterable[Tuple[str, str, int]]) -> List[str]:
+        triples = list(triples)
+        self.warm(w3, factory, triples)
+        return [self.lookup(w3, factory, a, b, fee) or ZERO_ADDRESS for a, b, fee in triples]
+
+POOLS = PoolIndex()
@@ -0,0 +1,208 @@
+# src/quoter.py
+"""
+Котировка свопов до отправки: amountOutMinimum вместо 0, и свопы, которые заведомо
+ревертнутся (нет пула / нет ликвидности / абсурдный сдвиг цены), не отправляются вовсе.
+
+Состояние пулов (slot0 + liquidity) всех пар батча читается одним multicall, не чаще раза в блок.
+Выход считается локально (v3math: шаг свопа при текущей ликвидности) — это точно, только пока своп
+не выходит из текущей ячейки тиков (между соседними кратными tickSpacing): за её границей ликвидность
+пула может быть любой, и на concentrated-позициях локальная котировка завышена.
+Такие свопы при заданном QUOTER_V2 котируются через QuoterV2 — пачкой, тем же multicall.
+Без него amountOutMinimum берётся по выходу до границы ячейки (часть входа, которая гарантированно
+исполнится по известной ликвидности — нижняя оценка всего выхода), либо своп пропускается
+(SWAP_SKIP_CROSSING).
+"""
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from web3 import Web3
+
+from .config import QUOTER_V2, V3_FACTORY, SWAP_SLIPPAGE_BPS, SWAP_MAX_IMPACT_BPS, SWAP_SKIP_CROSSING
+from .metrics import METRICS
+from . import multicall, v3math
+
+METRICS.describe("swap_quote_total", "swap quotes by source: local / quoter / skip")
+METRICS.describe("swaps_skipped_total", "swaps not sent because the quote said they would fail")
+
+_SLOT0_OUT = ("uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool")
+
+class Quote(NamedTuple):
+    amount_out: int
+    min_out: int
+    impact_bps: int
+    source: str                   # local / local_bound / quoter
+    skip: Optional[str] = None    # причина не отправлять своп
+
+def _skip(reason: str, impact_bps: int = 0) -> Quote:
+    return Quote(0, 0, impact_bps, "skip", reason)
+
+class SwapQuoter:
+    def __init__(self, w3: Web3, factory: str = V3_FACTORY, quoter: str = QUOTER_V2,
+                 slippage_bps: int = SWAP_SLIPPAGE_BPS, max_impact_bps: int = SWAP_MAX_IMPACT_BPS,
+                 skip_crossing: bool = SWAP_SKIP_CROSSING):
+        self.w3 = w3
+        self.factory = factory
+        self.quoter = quoter
+        self.slippage_bps = int(slippage_bps)
+        self.max_impact_bps = int(max_impact_bps)
+        self.skip_crossing = bool(skip_crossing)
+        self._lock = threading.Lock()
+        self._watched: set = set()
+        # pool -> (sqrtPriceX96, tick, liquidity); None — не прочиталось
+        self._state: Dict[str, Optional[Tuple[int, int, int]]] = {}
+        self._block: Optional[int] = None
+
+    # ---- состояние пулов ----
+    def watch(self, triples: Iterable[Tuple[str, str, int]]) -> int:
+        """Пулы пар [(tokenA, tokenB, fee)] — читать вместе; сразу подтягивает их состояние."""
+        from .pools import POOLS
+        triples = list(triples)
+        pools = POOLS.get_many(self.w3, self.factory, triples) if triples else []
+        with self._lock:
+            self._watched.update(p for p in pools if p and p != multicall.ZERO_ADDRESS)
+        self._refresh(force=True)
+        return len(self._state)
+
+    def _refresh(self, force: bool = False) -> None:
+        from .head import get_head
+        block = get_head(self.w3).peek()
+        with self._lock:
+            pools = sorted(self._watched)
+            if not pools or (not force and block is not None and block == self._block
+                             and all(p in self._state for p in pools)):
+                return
+        calls = []
+        for p in pools:
+            calls.append(multicall.Call(p, "slot0()", (), _SLOT0_OUT))
+            calls.append(multicall.Call(p, "liquidity()", (), ("uint128",)))
+        res = multicall.aggregate(self.w3, calls)
+        state = {}
+        for i, p in enumerate(pools):
+            s0, liq = res[2 * i], res[2 * i + 1]
+            state[p] = None if s0 is None or liq is None else (int(s0[0]), int(s0[1]), int(liq))
+        with self._lock:
+            self._state.update(state)
+            self._block = block
+
+    def pool_state(self, pool: str) -> Optional[Tuple[int, int, int]]:
+        with self._lock:
+            if pool not in self._watched:
+                self._watched.add(pool)
+        self._refresh()
+        with self._lock:
+            return self._state.get(pool)
+
+    # ---- котировки ----
+    def quote(self, token_in: str, token_out: str, fee: int, amount_in: int) -> Quote:
+        return self.quote_many([(token_in, token_out, fee, amount_in)])[0]
+
+    def quote_many(self, items: Sequence[Tuple[str, str, int, int]]) -> List[Quote]:
+        """[(tokenIn, tokenOut, fee, amountIn)] -> [Quote]; адреса токенов уже checksum."""
+        from .pools import POOLS
+        pools = POOLS.get_many(self.w3, self.factory, [(a, b, int(f)) for a, b, f, _ in items])
+        out: List[Optional[Quote]] = [None] * len(items)
+        remote: List[int] = []
+        for i, ((tin, tout, fee, amt), pool) in enumerate(zip(items, pools)):
+            if not pool or pool == multicall.ZERO_ADDRESS:
+                out[i] = _skip("no pool")
+                continue
+            st = self.pool_state(pool)
+            if st is None:
+                if self.quoter:
+                    remote.append(i)
+                else:
+                    out[i] = _skip("pool state unavailable")
+                continue
+            sqrt_p, tick, liq = st
+            if liq <= 0:
+                out[i] = _skip("no liquidity")
+                continue
+            zero_for_one = tin.lower() < tout.lower()
+            try:
+                got, nxt = v3math.swap_exact_input(sqrt_p, liq, int(amt), int(fee), zero_for_one)
+            except ValueError as e:
+                out[i] = _skip(str(e))
+                continue
+            impact = v3math.price_impact_bps(sqrt_p, nxt)
+            if self._crosses(tick, nxt, int(fee)):
+                # за пределами текущей ячейки ликвидность может быть другой
+                if self.quoter:
+                    remote.append(i)
+                elif self.skip_crossing:
+                    out[i] = _skip("crosses tick without quoter", impact)
+                else:
+                    out[i] = self._judge_bound(got, self._cell_output(sqrt_p, tick, liq, int(fee), zero_for_one),
+                                               impact)
+                continue
+            out[i] = self._judge(got, impact, "local")
+        if remote:
+            for i, q in zip(remote, self._quote_remote([items[i] for i in remote], [pools[i] for i in remote])):
+                out[i] = q
+        for q in out:
+            METRICS.inc("swap_quote_total", source=q.source)
+            if q.skip:
+                METRICS.inc("swaps_skipped_total", reason=q.skip)
+        return out
+
+    @staticmethod
+    def _cell(tick: int, fee: int) -> Tuple[int, int]:
+        """sqrt-цены границ ячейки тиков, в которой сейчас цена пула."""
+        s = v3math.TICK_SPACING.get(fee, 1)
+        lo = tick // s * s
+        return (v3math.sqrt_ratio_at_tick(max(lo, v3math.MIN_TICK)),
+                v3math.sqrt_ratio_at_tick(min(lo + s, v3math.MAX_TICK)))
+
+    def _crosses(self, tick: int, sqrt_after: int, fee: int) -> bool:
+        lo, hi = self._cell(tick, fee)
+        return not lo <= sqrt_after < hi
+
+    def _cell_output(self, sqrt_p: int, tick: int, liq: int, fee: int, zero_for_one: bool) -> int:
+        """Выход от сдвига цены до границы текущей ячейки — столько своп отдаст при любой ликвидности дальше."""
+        lo, hi = self._cell(tick, fee)
+        if zero_for_one:
+            return v3math.amount1_delta(lo, sqrt_p, liq)
+        return v3math.amount0_delta(sqrt_p, hi, liq)
+
+    def _judge_bound(self, amount_out: int, bound: int, impact_bps: int) -> Quote:
+        """Своп выходит из ячейки без QuoterV2: минимум — от гарантированной части, не от оценки."""
+        q = self._judge(amount_out, impact_bps, "local_bound")
+        if q.skip:
+            return q
+        return q._replace(min_out=v3math.with_slippage(min(bound, amount_out), self.slippage_bps))
+
+    def _judge(self, amount_out: int, impact_bps: int, source: str) -> Quote:
+        if amount_out <= 0:
+            return _skip("zero output")
+        if impact_bps > self.max_impact_bps:
+            return _skip("price impact", impact_bps)
+        return Quote(amount_out, v3math.with_slippage(amount_out, self.slippage_bps), impact_bps, source)
+
+    def _quote_remote(self, items: Sequence[Tuple[str, str, int, int]], pools: Sequence[str]) -> List[Quote]:
+        """QuoterV2.quoteExactInputSingle пачкой; упавший вызов = своп ревертнется."""
+        calls = [
+            multicall.Call(self.quoter, "quoteExactInputSingle((address,address,uint256,uint24,uint160))",
+                           ((Web3.to_checksum_address(tin), Web3.to_checksum_address(tout), int(amt), int(fee), 0),),
+                           ("uint256", "uint160", "uint32", "uint256"))
+            for tin, tout, fee, amt in items
+        ]
+        out = []
+        for pool, r in zip(pools, multicall.aggregate(self.w3, calls)):
+            if r is None:
+                out.append(_skip("quoter reverted"))
+                continue
+            got, after = int(r[0]), int(r[1])
+            with self._lock:
+                st = self._state.get(pool)
+            impact = v3math.price_impact_bps(st[0], after) if st else 0
+            out.append(self._judge(got, impact, "quoter"))
+        return out
+
+_QUOTERS: Dict[int, SwapQuoter] = {}
+_QUOTERS_LOCK = threading.Lock()
+
+def get_quoter(w3: Web3) -> SwapQuoter:
+    with _QUOTERS_LOCK:
+        q = _QUOTERS.get(id(w3))
+        if q is None or q.w3 is not w3:
+            q = _QUOTERS[id(w3)] = SwapQuoter(w3)
+        return q
@@ -0,0 +1,215 @@
+# src/receipts.py
+import threading, time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional
+
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound
+
+from .config import RECEIPT_POLL_INTERVAL, RECEIPT_TIMEOUT, RECEIPT_BLOCK_SCAN_MAX
+from .head import get_head
+
+_INT_FIELDS = (
+    "blockNumber", "cumulativeGasUsed", "effectiveGasPrice", "gasUsed",
+    "status", "transactionIndex", "type",
+)
+
+def _hkey(txh) -> str:
+    h = txh.hex() if isinstance(txh, (bytes, bytearray)) else str(txh)
+    h = h.lower()
+    return h if h.startswith("0x") else "0x" + h
+
+def _normalize_receipt(raw: dict) -> AttributeDict:
+    """Сырой receipt из eth_getBlockReceipts -> тот же вид, что отдаёт web3."""
+    rec = dict(raw)
+    for k in _INT_FIELDS:
+        v = rec.get(k)
+        if isinstance(v, str):
+            rec[k] = int(v, 16)
+    for k in ("transactionHash", "blockHash"):
+        if isinstance(rec.get(k), str):
+            rec[k] = HexBytes(rec[k])
+    if rec.get("contractAddress"):
+        rec["contractAddress"] = Web3.to_checksum_address(rec["contractAddress"])
+    return AttributeDict(rec)
+
+class _Entry:
+    __slots__ = ("fut", "since", "deadline")
+
+    def __init__(self, fut: Future, since: Optional[int], deadline: float):
+        self.fut = fut
+        self.since = since
+        self.deadline = deadline
+
+class ReceiptTracker:
+    """
+    Один поллер receipt'ов на процесс вместо wait_for_transaction_receipt в каждой функции.
+    track(txh) -> Future; раз в блок все ожидающие хэши разрешаются разом
+    (eth_getBlockReceipts, если нода умеет, иначе eth_getTransactionReceipt по каждому).
+    """
+
+    def __init__(self, w3: Web3, poll_interval: float = RECEIPT_POLL_INTERVAL,
+                 timeout: float = RECEIPT_TIMEOUT, keep_done: int = 1024):
+        self.w3 = w3
+        self.poll_interval = float(poll_interval)
+        self.timeout = float(timeout)
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _Entry] = {}
+        self._done: "OrderedDict[str, Future]" = OrderedDict()
+        self._keep_done = keep_done
+        self._thread: Optional[threading.Thread] = None
+        self._last_block: Optional[int] = None
+        self._block_receipts: Optional[bool] = None  # None = ещё не проверяли
+
+    # ---- public ----
+    def track(self, txh, timeout: float | None = None, since: int | None = None) -> Future:
+        """
+        since — голова, которую видели ДО отправки: tx не может быть в блоке <= since.
+        Без него tx, замайненная в блоке, который поллер как раз досканировал, потерялась бы.
+        """
+        key = _hkey(txh)
+        with self._lock:
+            fut = self._done.get(key)
+            if fut is not None:
+                return fut
+            e = self._pending.get(key)
+            if e is None:
+                deadline = time.monotonic() + float(timeout or self.timeout)
+                start = self._last_block
+                if since is not None and start is not None and since < start:
+                    start = since
+                e = self._pending[key] = _Entry(Future(), start, deadline)
+            self._ensure_thread()
+            return e.fut
+
+    def wait(self, txh, timeout: float | None = None):
+        return self.track(txh, timeout).result()
+
+    def wait_all(self, hashes: Iterable, timeout: float | None = None) -> List:
+        futs = [self.track(h, timeout) for h in hashes]
+        return [f.result() for f in futs]
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    # ---- internals ----
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="receipts", daemon=True)
+            self._thread.start()
+
+    def _resolve(self, key: str, rec=None, exc: Exception | None = None) -> None:
+        with self._lock:
+            e = self._pending.pop(key, None)
+            if e is None:
+                return
+            self._done[key] = e.fut
+            while len(self._done) > self._keep_done:
+                self._done.popitem(last=False)
+        if exc is not None:
+            e.fut.set_exception(exc)
+        else:
+            e.fut.set_result(rec)
+
+    def _run(self) -> None:
+        heads = get_head(self.w3)
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+            try:
+                self._catch_up()
+                # голову ведёт HeadTracker — здесь только ждём следующий блок
+                head = heads.wait_for_new(self._last_block, self.poll_interval)
+                if head is not None and (self._last_block is None or head > self._last_block):
+                    self._poll(head)
+                    with self._lock:
+                        self._last_block = head
+            except Exception as e:
+                print("receipts poll failed:", e)
+                time.sleep(self.poll_interval)
+            self._expire()
+
+    def _catch_up(self) -> None:
+        """Хэши, которые могли попасть в уже просканированные блоки, — поштучно, не дожидаясь нового блока."""
+        with self._lock:
+            last = self._last_block
+            if last is None:
+                return
+            behind = [k for k, e in self._pending.items() if e.since is not None and e.since < last]
+        for k in behind:
+            if self._fetch_one(k):
+                continue
+            with self._lock:
+                if k in self._pending:
+                    self._pending[k].since = last
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            late = [k for k, e in self._pending.items() if e.deadline <= now]
+        for k in late:
+            self._resolve(k, exc=TimeoutError(f"receipt not found in time: {k}"))
+
+    def _poll(self, head: int) -> None:
+        with self._lock:
+            entries = dict(self._pending)
+        if not entries:
+            return
+        first = (self._last_block + 1) if self._last_block is not None else head
+        scan = self._block_receipts is not False and head - first < RECEIPT_BLOCK_SCAN_MAX
+        if scan and self._scan_blocks(first, head, entries):
+            # хэши, отправленные до первого просканированного блока, добираем поштучно
+            stale = [k for k, e in entries.items()
+                     if not e.fut.done() and (e.since is None or e.since + 1 < first)]
+            for k in stale:
+                if self._fetch_one(k):
+                    continue
+                with self._lock:
+                    if k in self._pending:
+                        self._pending[k].since = head
+            return
+        for k in entries:
+            self._fetch_one(k)
+
+    def _scan_blocks(self, first: int, head: int, entries: Dict[str, _Entry]) -> bool:
+        for b in range(first, head + 1):
+            resp = self.w3.provider.make_request("eth_getBlockReceipts", [hex(b)])
+            if "error" in resp or not isinstance(resp.get("result"), list):
+                if self._block_receipts is None:
+                    self._block_receipts = False
+                return False
+            self._block_receipts = True
+            for raw in resp["result"]:
+                k = _hkey(raw.get("transactionHash", ""))
+                if k in entries:
+                    self._resolve(k, _normalize_receipt(raw))
+        return True
+
+    def _fetch_one(self, key: str) -> bool:
+        try:
+            rec = self.w3.eth.get_transaction_receipt(key)
+        except TransactionNotFound:
+            return False
+        except Exception as e:
+            print("receipt fetch failed:", e)
+            return False
+        if rec is None:
+            return False
+        self._resolve(key, rec)
+        return True
+
+_TRACKERS: Dict[int, ReceiptTracker] = {}
+_TRACKERS_LOCK = threading.Lock()
+
+def get_tracker(w3: Web3) -> ReceiptTracker:
+    with _TRACKERS_LOCK:
+        t = _TRACKERS.get(id(w3))
+        if t is None or t.w3 is not w3:
+            t = _TRACKERS[id(w3)] = ReceiptTracker(w3)
+        return t
@@ -0,0 +1,63 @@
+# src/scheduler.py
+import heapq, itertools, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Tuple
+
+class Scheduler:
+    """
+    Таймеры на куче вместо time.sleep: пауза кошелька — это событие в heap, а не спящий поток.
+    Один поток ждёт ближайший дедлайн, готовые события уходят в пул из workers потоков,
+    так что тысячи кошельков между действиями не держат ни одного потока.
+    """
+
+    def __init__(self, workers: int = 4, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, Callable, tuple]] = []
+        self._seq = itertools.count()
+        self._active = 0  # в куче + выполняются
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="sched")
+
+    def call_at(self, due: float, fn: Callable, *args: Any) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (float(due), next(self._seq), fn, args))
+            self._active += 1
+            self._cond.notify_all()
+
+    def call_later(self, delay: float, fn: Callable, *args: Any) -> None:
+        self.call_at(self.clock() + max(0.0, float(delay)), fn, *args)
+
+    def pending(self) -> int:
+        with self._cond:
+            return self._active
+
+    def run(self) -> None:
+        """Крутить события в текущем потоке, пока есть что ждать или выполнять."""
+        try:
+            while True:
+                with self._cond:
+                    while True:
+                        if not self._heap:
+                            if self._active == 0:
+                                return
+                            self._cond.wait()
+                            continue
+                        left = self._heap[0][0] - self.clock()
+                        if left <= 0:
+                            _, _, fn, args = heapq.heappop(self._heap)
+                            break
+                        self._cond.wait(left)
+                self._pool.submit(self._invoke, fn, args)
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def _invoke(self, fn: Callable, args: tuple) -> None:
+        try:
+            fn(*args)
+        except Exception as e:
+            print("scheduled task failed:", e)
+        finally:
+            # новые события задача ставит до выхода — счётчик не падает в 0 раньше времени
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
@@ -0,0 +1,94 @@
+# src/signer.py
+"""
+Подпись tx в пуле процессов: secp256k1 + RLP — чистый CPU под GIL, и при сотнях кошельков
+на блок подпись в одном процессе становится узким местом.
+
+Ключи уходят в каждый воркер один раз (initializer), дальше туда летят только
+неподписанные tx-dict'ы, обратно — только сырые подписанные байты.
+SIGNER_WORKERS=0 — подписывать в текущем процессе, как раньше.
+"""
+import multiprocessing as mp
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .config import PRIVATE_KEYS, SIGNER_WORKERS, SIGNER_CHUNK
+
+# ---- в воркере ----
+
+_ACCOUNTS: Dict[str, object] = {}
+
+def _init_worker(keys: Sequence[str]) -> None:
+    from eth_account import Account
+    for pk in keys:
+        a = Account.from_key(pk)
+        _ACCOUNTS[a.address.lower()] = a
+
+def _sign_batch(txs: List[dict]) -> List[bytes]:
+    out = []
+    for tx in txs:
+        acct = _ACCOUNTS[str(tx["from"]).lower()]
+        out.append(bytes(acct.sign_transaction(tx).rawTransaction))
+    return out
+
+# ---- в основном процессе ----
+
+class SigningPool:
+    def __init__(self, keys: Iterable[str], workers: int = SIGNER_WORKERS, chunk: int = SIGNER_CHUNK):
+        from eth_account import Account
+        self.keys = list(keys)
+        self.addresses = {Account.from_key(pk).address.lower() for pk in self.keys}
+        self.workers = max(1, int(workers))
+        self.chunk = max(1, int(chunk))
+        # spawn, не fork: в родителе уже крутятся поллеры, форкать потоки с локами нельзя
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=mp.get_context("spawn"),
+            initializer=_init_worker, initargs=(self.keys,),
+        )
+
+    def has(self, address: str) -> bool:
+        return address.lower() in self.addresses
+
+    def submit(self, txs: Sequence[dict]) -> Future:
+        return self._pool.submit(_sign_batch, [dict(t) for t in txs])
+
+    def sign(self, tx: dict) -> bytes:
+        return self.submit([tx]).result()[0]
+
+    def sign_many(self, txs: Sequence[dict]) -> List[bytes]:
+        """Порядок сохраняется; пачки по chunk раскидываются по воркерам."""
+        txs = list(txs)
+        size = min(self.chunk, max(1, -(-len(txs) // self.workers)))
+        futs = [self.submit(txs[i:i + size]) for i in range(0, len(txs), size)]
+        out: List[bytes] = []
+        for f in futs:
+            out.extend(f.result())
+        return out
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+
+_SIGNER: Optional[SigningPool] = None
+_SIGNER_LOCK = threading.Lock()
+_DISABLED = False
+
+def get_signer() -> Optional[SigningPool]:
+    """Общий пул на процесс; None, если SIGNER_WORKERS=0, ключей нет или пул сломался."""
+    global _SIGNER
+    if SIGNER_WORKERS <= 0 or not PRIVATE_KEYS or _DISABLED:
+        return None
+    with _SIGNER_LOCK:
+        if _SIGNER is None:
+            _SIGNER = SigningPool(PRIVATE_KEYS)
+        return _SIGNER
+
+def disable(reason: Exception) -> None:
+    """Воркер умер (BrokenProcessPool) — дальше подписываем в текущем процессе."""
+    global _SIGNER, _DISABLED
+    with _SIGNER_LOCK:
+        if not _DISABLED:
+            print("signing pool disabled, signing inline:", reason)
+        _DISABLED = True
+        if _SIGNER is not None:
+            _SIGNER._pool.shutdown(wait=False, cancel_futures=True)
+            _SIGNER = None
@@ -0,0 +1,645 @@
+# src/simchain.py
+"""
+Цепь в памяти вместо живого RPC (BACKEND=sim): прогнать orchestrator/strategy/dex/liquidity
+без 0G, в CI и для замеров. Это не EVM — контракты по адресам из конфига (токены, фабрика,
+роутер, position manager, Multicall3) реализованы на Python ровно настолько, насколько
+их дёргает бот: балансы/allowance, getPool, exactInputSingle (x*y=k с комиссией пула),
+createAndInitializePoolIfNecessary, mint, aggregate3.
+
+Каждая tx майнится в свой блок сразу (automine), nonce/подпись/газ/ревёрты — как у ноды:
+ревёрт -> receipt со status=0, eth_call -> JSON-RPC error "execution reverted".
+"""
+import itertools, threading, time
+from math import isqrt
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import rlp
+from eth_abi import decode, encode
+from eth_abi.grammar import parse
+from eth_utils import function_signature_to_4byte_selector, keccak
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .config import (
+    TOKENS, ROUTER, V3_FACTORY, POS_MANAGER, MULTICALL3, V3_FEE,
+    SIM_CHAIN_ID, SIM_BASE_FEE, SIM_FAUCET, SIM_POOL_LIQUIDITY,
+)
+from . import v3math
+
+_ZERO = "0x" + "00" * 20
+_BLOCK_GAS_LIMIT = 30_000_000
+# «байткод» заглушек: eth_getCode должен быть непустым (multicall проверяет код)
+_STUB_CODE = b"\xfe"
+
+# газ сверх intrinsic — порядок величин как у настоящих контрактов
+_GAS = {
+    "approve": 24_000,
+    "transfer": 30_000,
+    "transferFrom": 35_000,
+    "exactInputSingle": 95_000,
+    "createAndInitializePoolIfNecessary": 280_000,
+    "mint": 300_000,
+}
+
+def _sel(sig: str) -> bytes:
+    return function_signature_to_4byte_selector(sig)
+
+@lru_cache(maxsize=None)
+def _arg_types(sig: str) -> List[str]:
+    # разбор по грамматике ABI: запятые внутри вложенных tuple не режем
+    inner = sig[sig.index("("):]
+    return [c.to_type_str() for c in parse(inner).components] if inner != "()" else []
+
+def _addr(a) -> str:
+    if isinstance(a, (bytes, bytearray)):
+        a = "0x" + bytes(a).hex()
+    return a.lower()
+
+def _hex(n: int) -> str:
+    return hex(int(n))
+
+class Revert(Exception):
+    pass
+
+def _require(cond: bool, msg: str) -> None:
+    if not cond:
+        raise Revert(msg)
+
+class _Ctx:
+    """Окружение одного вызова: кто зовёт, какой блок, сколько газа потрачено."""
+    __slots__ = ("sender", "timestamp", "gas")
+
+    def __init__(self, sender: str, timestamp: int):
+        self.sender = sender
+        self.timestamp = timestamp
+        self.gas = 0
+
+# ---- contracts ----
+
+class _Contract:
+    # sig -> (имя метода, выходные типы); заполняется в подклассах
+    METHODS: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+
+    def __init__(self, chain: "SimChain", address: str):
+        self.chain = chain
+        self.address = address
+        self._dispatch = {
+            _sel(sig): (sig, name, out) for sig, (name, out) in self.METHODS.items()
+        }
+
+    def call(self, ctx: _Ctx, data: bytes) -> bytes:
+        hit = self._dispatch.get(bytes(data[:4]))
+        _require(hit is not None, "unknown selector")
+        sig, name, out = hit
+        args = decode(_arg_types(sig), bytes(data[4:]))
+        ctx.gas += _GAS.get(name, 2_600)
+        res = getattr(self, name)(ctx, *args)
+        if not out:
+            return b""
+        return encode(list(out), list(res) if len(out) > 1 else [res])
+
+class MockERC20(_Contract):
+    METHODS = {
+        "balanceOf(address)": ("balanceOf", ("uint256",)),
+        "decimals()": ("decimals_", ("uint8",)),
+        "symbol()": ("symbol_", ("string",)),
+        "allowance(address,address)": ("allowance", ("uint256",)),
+        "approve(address,uint256)": ("approve", ("bool",)),
+        "transfer(address,uint256)": ("transfer", ("bool",)),
+        "transferFrom(address,address,uint256)": ("transferFrom", ("bool",)),
+    }
+
+    def __init__(self, chain: "SimChain", address: str, symbol: str, decimals: int):
+        super().__init__(chain, address)
+        self.symbol = symbol
+        self.decimals = int(decimals)
+        self.balances: Dict[str, int] = {}
+        self.allowances: Dict[Tuple[str, str], int] = {}
+
+    def bal(self, owner: str) -> int:
+        owner = _addr(owner)
+        if owner not in self.balances:
+            # кран: у любого EOA «с рождения» есть токены; у контрактов/пулов — ноль
+            self.balances[owner] = 0 if owner in self.chain.contracts else SIM_FAUCET
+        return self.balances[owner]
+
+    def move(self, src: str, dst: str, amount: int) -> None:
+        src, dst = _addr(src), _addr(dst)
+        _require(self.bal(src) >= amount, "ERC20: transfer amount exceeds balance")
+        self.balances[src] -= amount
+        self.balances[dst] = self.bal(dst) + amount
+
+    def spend_allowance(self, owner: str, spender: str, amount: int) -> None:
+        k = (_addr(owner), _addr(spender))
+        cur = self.allowances.get(k, 0)
+        _require(cur >= amount, "ERC20: insufficient allowance")
+        if cur != 2**256 - 1:
+            self.allowances[k] = cur - amount
+
+    def balanceOf(self, ctx, owner):
+        return self.bal(owner)
+
+    def decimals_(self, ctx):
+        return self.decimals
+
+    def symbol_(self, ctx):
+        return self.symbol
+
+    def allowance(self, ctx, owner, spender):
+        return self.allowances.get((_addr(owner), _addr(spender)), 0)
+
+    def approve(self, ctx, spender, value):
+        self.allowances[(ctx.sender, _addr(spender))] = int(value)
+        return True
+
+    def transfer(self, ctx, to, value):
+        self.move(ctx.sender, to, int(value))
+        return True
+
+    def transferFrom(self, ctx, src, dst, value):
+        self.spend_allowance(src, ctx.sender, int(value))
+        self.move(src, dst, int(value))
+        return True
+
+class Pool(_Contract):
+    """Пул без тиков: резервы = балансы пула в токенах, цена — x*y=k (до ликвидности — цена инициализации)."""
+    METHODS = {
+        "slot0()": ("slot0", ("uint160", "int24", "uint16", "uint16", "uint16", "uint8", "bool")),
+        "liquidity()": ("liquidity_", ("uint128",)),
+    }
+
+    def __init__(self, chain: "SimChain", address: str, token0: str, token1: str, fee: int, sqrt_price_x96: int):
+        super().__init__(chain, address)
+        self.token0 = token0
+        self.token1 = token1
+        self.fee = int(fee)
+        self.sqrt_price_x96 = int(sqrt_price_x96)
+        self.liquidity = 0
+
+    def price(self) -> int:
+        r0, r1 = self.chain.token(self.token0).bal(self.address), self.chain.token(self.token1).bal(self.address)
+        if r0 > 0 and r1 > 0:
+            p = v3math.encode_price_sqrt(r1, r0)
+            return min(max(p, v3math.MIN_SQRT_RATIO), v3math.MAX_SQRT_RATIO - 1)
+        return self.sqrt_price_x96
+
+    def slot0(self, ctx):
+        p = self.price()
+        return p, v3math.tick_at_sqrt_ratio(p), 0, 1, 1, 0, True
+
+    def liquidity_(self, ctx):
+        # x*y=k на резервах = V3 с одним диапазоном на всю шкалу: L = sqrt(x*y)
+        r0, r1 = self.chain.token(self.token0).bal(self.address), self.chain.token(self.token1).bal(self.address)
+        return isqrt(r0 * r1)
+
+class MockFactory(_Contract):
+    METHODS = {"getPool(address,address,uint24)": ("getPool", ("address",))}
+
+    def getPool(self, ctx, a, b, fee):
+        p = self.chain.pool(a, b, fee)
+        return p.address if p else _ZERO
+
+class MockRouter(_Contract):
+    METHODS = {
+        "exactInputSingle((address,address,uint24,address,uint256,uint256,uint256,uint160))":
+            ("exactInputSingle", ("uint256",)),
+    }
+
+    def exactInputSingle(self, ctx, params):
+        token_in, token_out, fee, recipient, deadline, amount_in, min_out, _limit = params
+        _require(ctx.timestamp <= int(deadline), "Transaction too old")
+        pool = self.chain.pool(token_in, token_out, fee)
+        _require(pool is not None, "pool does not exist")
+        t_in, t_out = self.chain.token(token_in), self.chain.token(token_out)
+        r_in, r_out = t_in.bal(pool.address), t_out.bal(pool.address)
+        _require(r_in > 0 and r_out > 0, "no liquidity")
+        x = int(amount_in) * (1_000_000 - pool.fee) // 1_000_000
+        out = r_out * x // (r_in + x)
+        _require(out > 0, "zero output")
+        _require(out >= int(min_out), "Too little received")
+        t_in.spend_allowance(ctx.sender, self.address, int(amount_in))
+        t_in.move(ctx.sender, pool.address, int(amount_in))
+        t_out.move(pool.address, recipient, out)
+        return out
+
+class MockPositionManager(_Contract):
+    METHODS = {
+        "createAndInitializePoolIfNecessary(address,address,uint24,uint160)":
+            ("createAndInitializePoolIfNecessary", ("address",)),
+        "mint((address,address,uint24,int24,int24,uint256,uint256,uint256,uint256,address,uint256))":
+            ("mint", ("uint256", "uint128", "uint256", "uint256")),
+    }
+
+    def __init__(self, chain: "SimChain", address: str):
+        super().__init__(chain, address)
+        self._ids = itertools.count(1)
+
+    def createAndInitializePoolIfNecessary(self, ctx, token0, token1, fee, sqrt_price_x96):
+        _require(_addr(token0) < _addr(token1), "token order")
+        _require(v3math.MIN_SQRT_RATIO <= int(sqrt_price_x96) < v3math.MAX_SQRT_RATIO, "R")
+        p = self.chain.pool(token0, token1, fee) or self.chain.create_pool(token0, token1, fee, sqrt_price_x96)
+        return p.address
+
+    def mint(self, ctx, params):
+        token0, token1, fee, lo, hi, a0, a1, a0_min, a1_min, recipient, deadline = params
+        _require(ctx.timestamp <= int(deadline), "Transaction too old")
+        lo, hi = int(lo), int(hi)
+        _require(lo < hi, "TLU")
+        _require(lo >= v3math.MIN_TICK, "TLM")
+        _require(hi <= v3math.MAX_TICK, "TUM")
+        pool = self.chain.pool(token0, token1, fee)
+        _require(pool is not None, "pool does not exist")
+        # как TickBitmap.flipTick: тики только кратные spacing тира
+        sp = v3math.TICK_SPACING.get(pool.fee, 1)
+        _require(lo % sp == 0 and hi % sp == 0, "tick spacing")
+        # сколько реально заберёт пул — по V3-формулам при текущей цене
+        liq, a0, a1 = v3math.position(pool.price(), lo, hi, int(a0), int(a1))
+        _require(liq > 0, "zero liquidity")
+        _require(a0 >= int(a0_min) and a1 >= int(a1_min), "Price slippage check")
+        for t, amt in ((token0, a0), (token1, a1)):
+            tok = self.chain.token(t)
+            tok.spend_allowance(ctx.sender, self.address, amt)
+            tok.move(ctx.sender, pool.address, amt)
+        pool.liquidity += liq
+        return next(self._ids), liq, a0, a1
+
+class MockMulticall3(_Contract):
+    METHODS = {"aggregate3((address,bool,bytes)[])": ("aggregate3", ("(bool,bytes)[]",))}
+
+    def aggregate3(self, ctx, calls):
+        out = []
+        for target, allow_failure, data in calls:
+            try:
+                out.append((True, self.chain.exec_call(_addr(target), bytes(data), _Ctx(self.address, ctx.timestamp))))
+            except Revert:
+                _require(allow_failure, "Multicall3: call failed")
+                out.append((False, b""))
+        return out
+
+# ---- chain ----
+
+class SimChain:
+    def __init__(self, chain_id: int = SIM_CHAIN_ID, base_fee: int = SIM_BASE_FEE,
+                 seed_pools: bool = True):
+        self.chain_id = int(chain_id)
+        self.base_fee = int(base_fee)
+        self.lock = threading.RLock()
+        self.contracts: Dict[str, Any] = {}
+        self.code: Dict[str, bytes] = {}
+        self.eth: Dict[str, int] = {}
+        self.nonces: Dict[str, int] = {}
+        self.queued: Dict[str, Dict[int, Tuple[bytes, dict]]] = {}
+        self.pools: Dict[Tuple[str, str, int], Pool] = {}
+        self.blocks: List[dict] = []
+        self.txs: Dict[str, dict] = {}
+        self.receipts: Dict[str, dict] = {}
+
+        for sym, meta in TOKENS.items():
+            a = _addr(meta["address"])
+            self._install(a, MockERC20(self, a, sym, meta.get("decimals", 18)))
+        self._install(_addr(V3_FACTORY), MockFactory(self, _addr(V3_FACTORY)))
+        self._install(_addr(ROUTER), MockRouter(self, _addr(ROUTER)))
+        self._install(_addr(POS_MANAGER), MockPositionManager(self, _addr(POS_MANAGER)))
+        if MULTICALL3:
+            self._install(_addr(MULTICALL3), MockMulticall3(self, _addr(MULTICALL3)))
+        if seed_pools:
+            self._seed_pools()
+        self._seal_block([])
+
+    def _install(self, address: str, c: _Contract) -> None:
+        self.contracts[address] = c
+        self.code[address] = _STUB_CODE
+
+    def _seed_pools(self) -> None:
+        """Пулы V3_FEE для всех пар TOKENS с ликвидностью 1:1 — свапы проходят с первого блока."""
+        addrs = sorted(_addr(m["address"]) for m in TOKENS.values())
+        for i, a in enumerate(addrs):
+            for b in addrs[i + 1:]:
+                p = self.create_pool(a, b, V3_FEE, 1 << 96)
+                for t in (a, b):
+                    tok = self.token(t)
+                    tok.balances[p.address] = tok.bal(p.address) + SIM_POOL_LIQUIDITY
+                p.liquidity = SIM_POOL_LIQUIDITY
+
+    # ---- state helpers ----
+    def token(self, address) -> MockERC20:
+        c = self.contracts.get(_addr(address))
+        _require(isinstance(c, MockERC20), "not a token")
+        return c
+
+    def pool(self, a, b, fee) -> Optional[Pool]:
+        x, y = sorted((_addr(a), _addr(b)))
+        return self.pools.get((x, y, int(fee)))
+
+    def create_pool(self, a, b, fee, sqrt_price_x96) -> Pool:
+        x, y = sorted((_addr(a), _addr(b)))
+        pa = "0x" + keccak(encode(["address", "address", "address", "uint24"],
+                                  [_addr(V3_FACTORY), x, y, int(fee)]))[12:].hex()
+        p = self.pools[(x, y, int(fee))] = Pool(self, pa, x, y, fee, sqrt_price_x96)
+        self.contracts[pa] = p
+        self.code[pa] = _STUB_CODE
+        return p
+
+    def balance(self, address: str) -> int:
+        a = _addr(address)
+        if a not in self.eth:
+            self.eth[a] = 0 if a in self.contracts else SIM_FAUCET
+        return self.eth[a]
+
+    @property
+    def head(self) -> dict:
+        return self.blocks[-1]
+
+    def exec_call(self, to: str, data: bytes, ctx: _Ctx) -> bytes:
+        c = self.contracts.get(to)
+        if not isinstance(c, _Contract):
+            return b""  # EOA / задеплоенный «байткод» — как вызов без кода
+        return c.call(ctx, data)
+
+    # ---- blocks / txs ----
+    def _seal_block(self, txs: List[dict]) -> dict:
+        num = len(self.blocks)
+        parent = self.blocks[-1] if self.blocks else None
+        ts = max(int(time.time()), parent["timestamp"] + 1 if parent else 0)
+        blk = {
+            "number": num,
+            "timestamp": ts,
+            "hash": "0x" + keccak(f"sim-block:{num}:{ts}".encode()).hex(),
+            "parentHash": parent["hash"] if parent else "0x" + "00" * 32,
+            "baseFeePerGas": self.base_fee,
+            "gasUsed": sum(t["gasUsed"] for t in txs),
+            "transactions": [t["hash"] for t in txs],
+        }
+        self.blocks.append(blk)
+        for i, t in enumerate(txs):
+            r = self.receipts[t["hash"]]
+            r.update(blockNumber=num, blockHash=blk["hash"], transactionIndex=i)
+        return blk
+
+    def send_raw(self, raw: bytes) -> str:
+        from eth_account import Account
+        tx = _decode_raw(raw)
+        txh = "0x" + keccak(raw).hex()
+        try:
+            sender = _addr(Account.recover_transaction(raw))
+        except Exception as e:
+            raise ValueError(f"invalid signature: {e}")
+        with self.lock:
+            if txh in self.txs:
+                raise ValueError("already known")
+            if tx["chainId"] is not None and tx["chainId"] != self.chain_id:
+                raise ValueError("invalid chain id")
+            expected = self.nonces.get(sender, 0)
+            if tx["nonce"] < expected:
+                raise ValueError("nonce too low")
+            if tx["maxFeePerGas"] < self.base_fee:
+                raise ValueError("max fee per gas less than block base fee")
+            tx.update(hash=txh, sender=sender)
+            self.txs[txh] = tx
+            # nonce с дыркой ждёт в очереди, как в mempool ноды
+            self.queued.setdefault(sender, {})[tx["nonce"]] = tx
+            self._drain(sender)
+        return txh
+
+    def _drain(self, sender: str) -> None:
+        q = self.queued.get(sender, {})
+        while self.nonces.get(sender, 0) in q:
+            tx = q.pop(self.nonces.get(sender, 0))
+            self._seal_block([self._apply(tx)])
+
+    def _apply(self, tx: dict) -> dict:
+        sender = tx["sender"]
+        self.nonces[sender] = tx["nonce"] + 1
+        price = min(tx["maxFeePerGas"], self.base_fee + tx["maxPriorityFeePerGas"])
+        gas = 21_000 + sum(16 if b else 4 for b in tx["data"])
+        status, created = 1, None
+        snapshot = self._snapshot()
+        try:
+            _require(self.balance(sender) >= tx["gas"] * price + tx["value"], "insufficient funds")
+            ctx = _Ctx(sender, int(time.time()))
+            if tx["to"] is None:
+                gas += 32_000 + 200 * len(tx["data"]) // 10
+                created = "0x" + keccak(rlp.encode([bytes.fromhex(sender[2:]), tx["nonce"]]))[12:].hex()
+                self.code[created] = bytes(tx["data"]) or _STUB_CODE
+            else:
+                if tx["value"]:
+                    self.eth[sender] = self.balance(sender) - tx["value"]
+                    self.eth[tx["to"]] = self.balance(tx["to"]) + tx["value"]
+                if tx["data"]:
+                    self.exec_call(tx["to"], tx["data"], ctx)
+                gas += ctx.gas
+            _require(gas <= tx["gas"], "out of gas")
+        except Revert:
+            self._restore(snapshot)
+            status, created = 0, None
+            gas = tx["gas"] if gas > tx["gas"] else gas
+        self.eth[sender] = self.balance(sender) - gas * price
+        rec = {
+            "transactionHash": tx["hash"],
+            "from": sender,
+            "to": tx["to"],
+            "contractAddress": created,
+            "status": status,
+            "gasUsed": gas,
+            "cumulativeGasUsed": gas,
+            "effectiveGasPrice": price,
+            "type": tx["type"],
+            "logs": [],
+        }
+        self.receipts[tx["hash"]] = rec
+        tx["gasUsed"] = gas
+        return tx
+
+    def _snapshot(self):
+        toks = {a: (dict(c.balances), dict(c.allowances)) for a, c in self.contracts.items() if isinstance(c, MockERC20)}
+        pools = {k: p.liquidity for k, p in self.pools.items()}
+        return dict(self.eth), toks, pools, set(self.pools)
+
+    def _restore(self, snap) -> None:
+        eth, toks, pools, keys = snap
+        self.eth = eth
+        for a, (bal, alw) in toks.items():
+            c = self.contracts[a]
+            c.balances, c.allowances = bal, alw
+        for k in list(self.pools):
+            if k not in keys:
+                p = self.pools.pop(k)
+                self.contracts.pop(p.address, None)
+                self.code.pop(p.address, None)
+        for k, liq in pools.items():
+            self.pools[k].liquidity = liq
+
+    # ---- JSON-RPC ----
+    def _block_at(self, tag) -> Optional[dict]:
+        if tag in ("latest", "pending", "safe", "finalized", None):
+            return self.head
+        if tag == "earliest":
+            return self.blocks[0]
+        n = int(tag, 16) if isinstance(tag, str) else int(tag)
+        return self.blocks[n] if 0 <= n < len(self.blocks) else None
+
+    def _rpc_block(self, b: Optional[dict]) -> Optional[dict]:
+        if b is None:
+            return None
+        return {
+            "number": _hex(b["number"]), "hash": b["hash"], "parentHash": b["parentHash"],
+            "timestamp": _hex(b["timestamp"]), "baseFeePerGas": _hex(b["baseFeePerGas"]),
+            "gasLimit": _hex(_BLOCK_GAS_LIMIT), "gasUsed": _hex(b["gasUsed"]),
+            "miner": _ZERO, "extraData": "0x", "difficulty": "0x0", "size": "0x0",
+            "transactions": list(b["transactions"]), "uncles": [],
+        }
+
+    def _rpc_receipt(self, r: Optional[dict]) -> Optional[dict]:
+        if r is None or "blockNumber" not in r:
+            return None
+        return {
+            "transactionHash": r["transactionHash"], "blockHash": r["blockHash"],
+            "blockNumber": _hex(r["blockNumber"]), "transactionIndex": _hex(r["transactionIndex"]),
+            "from": r["from"], "to": r["to"], "contractAddress": r["contractAddress"],
+            "status": _hex(r["status"]), "gasUsed": _hex(r["gasUsed"]),
+            "cumulativeGasUsed": _hex(r["cumulativeGasUsed"]),
+            "effectiveGasPrice": _hex(r["effectiveGasPrice"]), "type": _hex(r["type"]),
+            "logs": [], "logsBloom": "0x" + "00" * 256,
+        }
+
+    def _call(self, tx: dict) -> bytes:
+        to = tx.get("to")
+        data = bytes.fromhex((tx.get("data") or tx.get("input") or "0x")[2:])
+        sender = _addr(tx.get("from") or _ZERO)
+        snapshot = self._snapshot()
+        try:
+            return self.exec_call(_addr(to), data, _Ctx(sender, self.head["timestamp"])) if to else b""
+        finally:
+            self._restore(snapshot)
+
+    def rpc(self, method: str, params: Sequence[Any]) -> Any:
+        with self.lock:
+            fn: Optional[Callable] = getattr(self, "_m_" + method, None)
+            if fn is None:
+                raise NotImplementedError(f"method {method} not supported by sim backend")
+            return fn(*params)
+
+    def _m_eth_chainId(self):
+        return _hex(self.chain_id)
+
+    def _m_net_version(self):
+        return str(self.chain_id)
+
+    def _m_web3_clientVersion(self):
+        return "og-auto/simchain"
+
+    def _m_eth_blockNumber(self):
+        return _hex(self.head["number"])
+
+    def _m_eth_getBlockByNumber(self, tag, full=False):
+        return self._rpc_block(self._block_at(tag))
+
+    def _m_eth_getTransactionCount(self, address, tag="latest"):
+        a = _addr(address)
+        n = self.nonces.get(a, 0)
+        return _hex(n)
+
+    def _m_eth_getBalance(self, address, tag="latest"):
+        return _hex(self.balance(address))
+
+    def _m_eth_getCode(self, address, tag="latest"):
+        return "0x" + self.code.get(_addr(address), b"").hex()
+
+    def _m_eth_gasPrice(self):
+        return _hex(self.base_fee + self.base_fee // 10)
+
+    def _m_eth_maxPriorityFeePerGas(self):
+        return _hex(self.base_fee // 10)
+
+    def _m_eth_feeHistory(self, count, newest, percentiles=None):
+        n = int(count, 16) if isinstance(count, str) else int(count)
+        last = self._block_at(newest)["number"]
+        first = max(0, last - n + 1)
+        blocks = self.blocks[first:last + 1]
+        return {
+            "oldestBlock": _hex(first),
+            "baseFeePerGas": [_hex(b["baseFeePerGas"]) for b in blocks] + [_hex(self.base_fee)],
+            "gasUsedRatio": [b["gasUsed"] / _BLOCK_GAS_LIMIT for b in blocks],
+            "reward": [[_hex(self.base_fee // 10) for _ in (percentiles or [])] for _ in blocks],
+        }
+
+    def _m_eth_call(self, tx, tag="latest"):
+        return "0x" + self._call(tx).hex()
+
+    def _m_eth_estimateGas(self, tx, tag="latest"):
+        self._call(tx)
+        data = bytes.fromhex((tx.get("data") or tx.get("input") or "0x")[2:])
+        return _hex(21_000 + sum(16 if b else 4 for b in data) + max(_GAS.values()))
+
+    def _m_eth_sendRawTransaction(self, raw):
+        return self.send_raw(bytes.fromhex(raw[2:] if raw.startswith("0x") else raw))
+
+    def _m_eth_getTransactionReceipt(self, txh):
+        return self._rpc_receipt(self.receipts.get(txh.lower()))
+
+    def _m_eth_getBlockReceipts(self, tag):
+        b = self._block_at(tag)
+        if b is None:
+            return None
+        return [self._rpc_receipt(self.receipts[h]) for h in b["transactions"]]
+
+def _decode_raw(raw: bytes) -> dict:
+    """Подписанная tx (legacy / 2930 / 1559) -> поля, нужные симулятору."""
+    def _int(b: bytes) -> int:
+        return int.from_bytes(b, "big") if b else 0
+
+    if raw[0] >= 0xc0:
+        f = rlp.decode(raw)
+        nonce, gas_price, gas, to, value, data, v = f[:7]
+        v = _int(v)
+        cid = (v - 35) // 2 if v >= 35 else None
+        max_fee, tx_type = _int(gas_price), 0
+        # legacy: вся цена сверх baseFee уходит в tip
+        tip = max(0, max_fee - SIM_BASE_FEE)
+    elif raw[0] == 1:
+        f = rlp.decode(raw[1:])
+        cid, nonce, gas_price, gas, to, value, data = f[:7]
+        cid, tip, max_fee, tx_type = _int(cid), _int(gas_price), _int(gas_price), 1
+    elif raw[0] == 2:
+        f = rlp.decode(raw[1:])
+        cid, nonce, tip, max_fee, gas, to, value, data = f[:8]
+        cid, tip, max_fee, tx_type = _int(cid), _int(tip), _int(max_fee), 2
+    else:
+        raise ValueError(f"unsupported tx type {raw[0]}")
+    return {
+        "chainId": cid, "nonce": _int(nonce), "gas": _int(gas), "type": tx_type,
+        "maxFeePerGas": max_fee, "maxPriorityFeePerGas": tip,
+        "to": _addr(to) if to else None, "value": _int(value), "data": bytes(data),
+    }
+
+class SimProvider(JSONBaseProvider):
+    """web3-провайдер поверх SimChain: те же JSON-RPC ответы, что от ноды, без сети."""
+
+    def __init__(self, chain: Optional[SimChain] = None):
+        super().__init__()
+        self.chain = chain or SimChain()
+
+    def __str__(self) -> str:
+        return f"SimProvider(chain_id={self.chain.chain_id})"
+
+    def _respond(self, rid: int, method: str, params: Any) -> RPCResponse:
+        try:
+            return {"jsonrpc": "2.0", "id": rid, "result": self.chain.rpc(method, list(params or []))}
+        except Revert as e:
+            data = "0x08c379a0" + encode(["string"], [str(e)]).hex()
+            return {"jsonrpc": "2.0", "id": rid,
+                    "error": {"code": 3, "message": f"execution reverted: {e}", "data": data}}
+        except NotImplementedError as e:
+            return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32601, "message": str(e)}}
+        except ValueError as e:
+            return {"jsonrpc": "2.0", "id": rid, "error": {"code": -32000, "message": str(e)}}
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self._respond(next(self.request_counter), method, params)
+
+    def make_batch_request(self, calls: Sequence[Tuple[str, Any]]) -> List[RPCResponse]:
+        return [self._respond(i, m, p) for i, (m, p) in enumerate(calls)]
+
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return True
@@ -0,0 +1,187 @@
+# src/specs.py
+import json, os, queue, threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config import LLM_SPEC_QUEUE, LLM_SPEC_POP_TIMEOUT, LLM_SPEC_CACHE_PATH
+
+class SpecCache:
+    """
+    Локальный запас валидных спек из batch-ответов LLM.
+    Имена и символы дедуплицируются (в т.ч. против уже выданных), состояние — на диске.
+    """
+
+    def __init__(self, path: str = LLM_SPEC_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._specs: List[Dict[str, Any]] = []
+        self._names: set = set()
+        self._symbols: set = set()
+        self._loaded = False
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._specs = list(data.get("specs", []))
+            self._names = set(data.get("seen_names", []))
+            self._symbols = set(data.get("seen_symbols", []))
+        except Exception as e:
+            print("spec cache unreadable, starting empty:", e)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "specs": self._specs,
+                "seen_names": sorted(self._names),
+                "seen_symbols": sorted(self._symbols),
+            }, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self.path)
+
+    @staticmethod
+    def _ids(sel: Dict[str, Any]) -> tuple[str, str]:
+        p = sel.get("params", {})
+        return str(p.get("name", "")).strip().lower(), str(p.get("symbol", "")).strip().lower()
+
+    def add_many(self, specs: Iterable[Dict[str, Any]]) -> int:
+        added = 0
+        with self._lock:
+            self._load()
+            for sel in specs:
+                name, sym = self._ids(sel)
+                if not name or not sym or name in self._names or sym in self._symbols:
+                    continue
+                self._names.add(name)
+                self._symbols.add(sym)
+                self._specs.append(sel)
+                added += 1
+            if added:
+                self._save()
+        return added
+
+    def mark_seen(self, sel: Dict[str, Any]) -> bool:
+        """Занять имя/символ спеки не из кэша (local fallback); False — такие уже выдавались."""
+        name, sym = self._ids(sel)
+        with self._lock:
+            self._load()
+            if name in self._names or sym in self._symbols:
+                return False
+            self._names.add(name)
+            self._symbols.add(sym)
+            self._save()
+            return True
+
+    def take(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._load()
+            if not self._specs:
+                return None
+            sel = self._specs.pop(0)
+            self._save()
+            return sel
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._load()
+            return len(self._specs)
+
+_CACHE: Optional[SpecCache] = None
+_CACHE_LOCK = threading.Lock()
+
+def get_spec_cache() -> SpecCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = SpecCache()
+        return _CACHE
+
+class SpecProducer:
+    """
+    Фоновый генератор token-spec: держит очередь готовых (санитизированных) спек,
+    LLM-запросы (hedged nous + openrouter) идут вне on-chain пути кошелька.
+    Деплой только забирает из очереди; пусто — локальный fallback без ожидания.
+    Спеки берутся из SpecCache, а он пополняется batch-запросом (N спек за completion).
+    """
+
+    def __init__(self, size: int = LLM_SPEC_QUEUE, pop_timeout: float = LLM_SPEC_POP_TIMEOUT):
+        self._q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max(1, int(size)))
+        self.pop_timeout = float(pop_timeout)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.produced = 0
+        self.fallbacks = 0
+
+    def start(self) -> "SpecProducer":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="llm-specs", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def qsize(self) -> int:
+        return self._q.qsize()
+
+    def pop(self, owner_addr: str) -> Dict[str, Any]:
+        from .contracts_llm import _local_fallback, _sanitize
+        try:
+            if self.pop_timeout > 0:
+                return self._q.get(timeout=self.pop_timeout)
+            return self._q.get_nowait()
+        except queue.Empty:
+            self.fallbacks += 1
+            print("[LLM] spec queue empty, using local defaults")
+            return _sanitize(_local_fallback(owner_addr))
+
+    def _produce(self) -> Dict[str, Any]:
+        cache = get_spec_cache()
+        sel = cache.take()
+        while sel is None:
+            from .contracts_llm import selection_batch_from_llm
+            added = cache.add_many(selection_batch_from_llm())
+            print(f"[LLM] spec cache +{added}")
+            if not added:
+                raise RuntimeError("batch produced only duplicates")
+            sel = cache.take()
+        return sel
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                sel = self._produce()
+                backoff = 1.0
+            except Exception as e:
+                print(f"[LLM] prefetch failed (retry in {backoff:.0f}s):", e)
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+                continue
+            while not self._stop.is_set():
+                try:
+                    self._q.put(sel, timeout=1.0)
+                    self.produced += 1
+                    break
+                except queue.Full:
+                    continue
+
+_PRODUCER: Optional[SpecProducer] = None
+_PRODUCER_LOCK = threading.Lock()
+
+def get_spec_producer(start: bool = True) -> SpecProducer:
+    global _PRODUCER
+    with _PRODUCER_LOCK:
+        if _PRODUCER is None:
+            _PRODUCER = SpecProducer()
+        if start:
+            _PRODUCER.start()
+        return _PRODUCER
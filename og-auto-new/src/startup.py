@@ -0,0 +1,71 @@
+# src/startup.py
+"""
+Отчёт о стоимости импорта на холодном старте.
+
+    python -m src.startup                      # топ модулей по cumulative
+    python -m src.startup --json startup.json  # сохранить для сравнения
+    python -m src.startup --max-ms 800         # exit 1, если старт дольше (для бенча/CI)
+"""
+import argparse, json, os, subprocess, sys
+from typing import Dict, List
+
+DEFAULT_TARGET = "main_ferma"
+
+def import_report(target: str = DEFAULT_TARGET, cwd: str | None = None) -> Dict:
+    """
+    Запускает `python -X importtime -c "import <target>"` в отдельном процессе
+    (честный холодный старт) и разбирает stderr.
+    """
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    rows: List[Dict] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+            rows.append({
+                "module": name.strip(),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+                "self_ms": int(self_us) / 1000.0,
+                "cumulative_ms": int(cum_us) / 1000.0,
+            })
+        except ValueError:
+            continue
+    top_level = [r for r in rows if r["depth"] == 0]
+    return {
+        "target": target,
+        "ok": proc.returncode == 0,
+        "total_ms": round(sum(r["cumulative_ms"] for r in top_level), 3),
+        "modules": rows,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+    }
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="import-time report for cold start")
+    ap.add_argument("--module", default=DEFAULT_TARGET)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--json", dest="json_path")
+    ap.add_argument("--max-ms", type=float, default=None)
+    args = ap.parse_args(argv)
+
+    rep = import_report(args.module)
+    if not rep["ok"]:
+        print(f"import {args.module} failed: {rep['error']}")
+        return 2
+    print(f"import {rep['target']}: {rep['total_ms']:.1f} ms")
+    for r in sorted(rep["modules"], key=lambda r: -r["cumulative_ms"])[: args.top]:
+        print(f"  {r['cumulative_ms']:9.1f} ms  {r['self_ms']:8.1f} self  {r['module']}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(rep, f, indent=1)
+    if args.max_ms is not None and rep["total_ms"] > args.max_ms:
+        print(f"startup budget exceeded: {rep['total_ms']:.1f} > {args.max_ms} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+# src/state.py
+"""
+Состояние раннера между запусками: SQLite (WAL) в STATE_DB_PATH, своя база на каждый chain id
+(state.sqlite -> state.<chainId>.sqlite), так что сети не смешиваются.
+
+allowances / deployments / txs / gas. Запись не на горячем пути:
+put() только кладёт строку в память (повторные апдейты одного ключа схлопываются),
+фоновый поток сбрасывает всё одной транзакцией раз в STATE_FLUSH_INTERVAL.
+При старте attach() поднимает allowance-леджер и модель газа из базы —
+тёплый рестарт не перечитывает их из цепи. Адреса пулов живут только в индексе пулов
+(POOL_INDEX_PATH), nonce не сохраняются вовсе (см. nonce.py).
+"""
+import atexit, json, os, sqlite3, threading, time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import STATE_DB_PATH, STATE_FLUSH_INTERVAL, STATE_ALLOWANCE_TTL
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS allowances (
+    owner TEXT, token TEXT, spender TEXT, value TEXT, updated REAL,
+    PRIMARY KEY (owner, token, spender)
+);
+CREATE TABLE IF NOT EXISTS deployments (
+    address TEXT PRIMARY KEY, tx TEXT, owner TEXT, name TEXT, symbol TEXT, kind TEXT,
+    abi TEXT, created REAL
+);
+CREATE TABLE IF NOT EXISTS txs (
+    hash TEXT PRIMARY KEY, owner TEXT, nonce INTEGER, kind TEXT, to_addr TEXT,
+    status INTEGER, block INTEGER, gas_used INTEGER, created REAL, updated REAL
+);
+CREATE INDEX IF NOT EXISTS txs_owner ON txs (owner, nonce);
+CREATE TABLE IF NOT EXISTS gas (
+    shape TEXT PRIMARY KEY, samples TEXT, updated REAL
+);
+"""
+
+_PKS: Dict[str, Tuple[str, ...]] = {
+    "allowances": ("owner", "token", "spender"),
+    "deployments": ("address",),
+    "txs": ("hash",),
+    "gas": ("shape",),
+}
+
+class StateStore:
+    def __init__(self, path: str = STATE_DB_PATH, flush_interval: float = STATE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = max(0.05, float(flush_interval))
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        # (table, pk) -> row | None (None = удалить)
+        self._pending: Dict[Tuple[str, Tuple], Optional[Dict[str, Any]]] = {}
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+        atexit.register(self.flush)
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=30)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            c.row_factory = sqlite3.Row
+            self._local.conn = c
+        return c
+
+    # ---- запись ----
+    def put(self, table: str, row: Dict[str, Any]) -> None:
+        pk = tuple(row[k] for k in _PKS[table])
+        with self._cond:
+            old = self._pending.get((table, pk))
+            self._pending[(table, pk)] = {**old, **row} if old else dict(row)
+            self._ensure_thread()
+
+    def delete(self, table: str, **pk) -> None:
+        key = tuple(pk[k] for k in _PKS[table])
+        with self._cond:
+            self._pending[(table, key)] = None
+            self._ensure_thread()
+
+    def flush(self) -> int:
+        with self._cond:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        c = self._conn()
+        with c:
+            for (table, pk), row in batch.items():
+                cols = _PKS[table]
+                if row is None:
+                    c.execute(f"DELETE FROM {table} WHERE " + " AND ".join(f"{k}=?" for k in cols), pk)
+                    continue
+                names = list(row)
+                upd = [n for n in names if n not in cols]
+                sql = (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+                       f" ON CONFLICT ({', '.join(cols)}) DO "
+                       + (f"UPDATE SET {', '.join(f'{n}=excluded.{n}' for n in upd)}" if upd else "NOTHING"))
+                c.execute(sql, [row[n] for n in names])
+        return len(batch)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="state", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print("state flush failed:", e)
+
+    # ---- чтение ----
+    def rows(self, sql: str, args: Iterable[Any] = ()) -> List[sqlite3.Row]:
+        return self._conn().execute(sql, tuple(args)).fetchall()
+
+    # ---- доменные хелперы ----
+    def put_allowance(self, key: Tuple[str, str, str], value: Optional[int]) -> None:
+        o, t, s = key
+        if value is None:
+            self.delete("allowances", owner=o, token=t, spender=s)
+        else:
+            # uint256 не влезает в INTEGER — храним строкой
+            self.put("allowances", {"owner": o, "token": t, "spender": s, "value": str(int(value)),
+                                    "updated": time.time()})
+
+    def put_gas(self, shape: str, samples: List[int]) -> None:
+        self.put("gas", {"shape": shape, "samples": json.dumps(samples), "updated": time.time()})
+
+    def put_deployment(self, address: str, owner: str, tx: str, name: str, symbol: str | None,
+                       kind: str | None, abi: Any) -> None:
+        self.put("deployments", {
+            "address": address.lower(), "tx": tx, "owner": owner.lower(), "name": name,
+            "symbol": symbol, "kind": kind, "abi": json.dumps(abi), "created": time.time(),
+        })
+
+    def record_tx(self, txh: str, owner: str, nonce: int, kind: str | None, to: str | None) -> None:
+        now = time.time()
+        self.put("txs", {"hash": txh.lower(), "owner": owner.lower(), "nonce": int(nonce), "kind": kind,
+                         "to_addr": (to or "").lower() or None, "created": now, "updated": now})
+
+    def tx_result(self, txh: str, status: Optional[int], block: Optional[int] = None,
+                  gas_used: Optional[int] = None) -> None:
+        self.put("txs", {"hash": txh.lower(), "status": status, "block": block, "gas_used": gas_used,
+                         "updated": time.time()})
+
+    # ---- старт ----
+    def attach(self) -> Dict[str, int]:
+        """Поднять леджер allowance и модель газа из базы и подписать их на запись сюда."""
+        from .allowances import ALLOWANCES
+        from .gas import GAS
+        fresh = time.time() - STATE_ALLOWANCE_TTL
+        allow = {(r["owner"], r["token"], r["spender"]): int(r["value"])
+                 for r in self.rows("SELECT * FROM allowances WHERE updated >= ?", (fresh,))}
+        gas = {r["shape"]: json.loads(r["samples"]) for r in self.rows("SELECT shape, samples FROM gas")}
+        ALLOWANCES.load(allow)
+        GAS.load(gas)
+        ALLOWANCES.sink = self.put_allowance
+        GAS.sink = self.put_gas
+        return {"allowances": len(allow), "gas": len(gas)}
+
+_STATES: Dict[int, StateStore] = {}
+_STATE_LOCK = threading.Lock()
+_ATTACHED = False
+
+def _db_path(path: str, cid: int) -> str:
+    """STATE_DB_PATH + chain id: allowance, газ, журнал и tx разных сетей — в разных базах."""
+    base, ext = os.path.splitext(path)
+    return f"{base}.{cid}{ext}"
+
+def get_state(w3=None) -> Optional[StateStore]:
+    """
+    Store сети, в которую ходит w3 (по chain id; без w3 — get_w3()); один на chain id в процессе.
+    None, если STATE_DB_PATH пуст.
+    """
+    if not STATE_DB_PATH:
+        return None
+    from .util import chain_id
+    if w3 is None:
+        from .chain import get_w3
+        w3 = get_w3()
+    cid = chain_id(w3)
+    with _STATE_LOCK:
+        st = _STATES.get(cid)
+        if st is None:
+            st = _STATES[cid] = StateStore(_db_path(STATE_DB_PATH, cid))
+        return st
+
+def attach_state(w3=None) -> Optional[Dict[str, int]]:
+    """
+    Идемпотентно: при первом вызове — восстановление из базы сети w3.
+    Леджер allowance и модель газа общие на процесс, поэтому подключаются к одному store.
+    """
+    global _ATTACHED
+    st = get_state(w3)
+    if st is None:
+        return None
+    with _STATE_LOCK:
+        if _ATTACHED:
+            return None
+        _ATTACHED = True
+    return st.attach()
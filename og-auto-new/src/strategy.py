@@ -1,83 +1,171 @@
-import random, time
-from typing import Dict, List
+from typing import Any, Dict, Iterable
 from web3 import Web3
-from eth_account import Account
 
-from .config import (
-    TOKENS, V3_FEE, LP_PROBABILITY, DEPLOY_PROBABILITY,
-    TRANSFERS_MIN, TRANSFERS_MAX, SWAPS_MIN, SWAPS_MAX,
-    SLEEP_BETWEEN, ENABLE_DEPLOY, ACTION_SLEEP_BASE, ACTION_SLEEP_JITTER,
-    ROUTER, POS_MANAGER
-)
-from .util import make_account, jitter, sleep_with_jitter
+from .config import ENABLE_DEPLOY, DEPLOY_ONCHAIN, ROUTER, POS_MANAGER, V3_FACTORY, SLEEP_SCALE, SWAP_QUOTE
+from .util import make_account, sleep_logged
+from .metrics import METRICS, span
+from .journal import journal_action
 from .dex import (
-    v3_exactInputSingle, ensure_allowance, erc20_transfer, native_transfer, erc20
+    v3_exactInputSingle, ensure_allowance, ensure_allowances, erc20_transfer, native_transfer, addr_of
 )
 from .liquidity import ensure_pool_and_add_liquidity
+from .plan import (
+    Action, WalletPlan, Swap, NativeTransfer, Erc20Transfer, AddLiquidity, Deploy, Sleep,
+    plan_for_wallet,
+)
 
-# optional
-try:
-    from .contracts_llm import selection_from_llm
-except Exception:
-    selection_from_llm = None
-
-def _symbols_universe() -> List[str]:
-    # только строки-символы, никаких dict!
-    return [sym for sym in TOKENS.keys()]
-
-def _rand_two(tokens: List[str]) -> tuple[str, str]:
-    if len(tokens) < 2:
-        raise RuntimeError("Need at least 2 tokens in TOKENS")
-    a, b = random.sample(tokens, 2)
-    return a, b
-
-def _random_amount_wei() -> int:
-    return random.randint(10**8, 10**10)
-
-def _random_amount_erc20() -> int:
-    return random.randint(10**9, 10**12)
+# optional, грузится только если деплой реально включён (solcx/LLM не нужны на старте)
+def _deploy_api():
+    try:
+        from .contracts_llm import deploy_token_from_selection
+        from .specs import get_spec_producer
+        return get_spec_producer().pop, deploy_token_from_selection
+    except Exception as e:
+        print("deploy disabled, contracts_llm unavailable:", e)
+        return None, None
 
-def run_for_wallet(w3: Web3, pk: str, cfg: Dict):
-    acct = make_account(pk)
+def execute_action(w3: Web3, acct, a: Action, cfg: Dict) -> None:
     owner = acct.address
+    if isinstance(a, Swap):
+        min_out = 0
+        if SWAP_QUOTE:
+            # заведомо неудачный своп не отправляем: ни газа, ни ожидания receipt
+            from .quoter import get_quoter
+            q = get_quoter(w3).quote(addr_of(a.token_in), addr_of(a.token_out), a.fee, a.amount_in)
+            if q.skip:
+                why = f"{q.skip} {q.impact_bps} bps" if q.impact_bps else q.skip
+                print(f"swap {a.token_in}->{a.token_out} {a.amount_in} skipped: {why}")
+                return
+            min_out = q.min_out
+        # approve не ждём: swap встанет за ним по nonce, ждём только receipt самого swap
+        ensure_allowance(w3, acct, a.token_in, cfg.get("ROUTER") or ROUTER, a.amount_in, wait=False)
+        v3_exactInputSingle(w3, acct, a.token_in, a.token_out, a.amount_in, min_amount_out=min_out, fee=a.fee)
+    elif isinstance(a, NativeTransfer):
+        native_transfer(w3, acct, a.to or owner, a.amount_wei)
+    elif isinstance(a, Erc20Transfer):
+        erc20_transfer(w3, acct, a.token, a.to or owner, a.amount)
+    elif isinstance(a, AddLiquidity):
+        ensure_pool_and_add_liquidity(w3, acct, a.token0, a.token1, a.fee, a.amount0, a.amount1)
+    elif isinstance(a, Deploy):
+        pop_spec, deploy_token_from_selection = _deploy_api() if ENABLE_DEPLOY else (None, None)
+        if pop_spec:
+            # спека уже готова в очереди — LLM не на критическом пути
+            sel = pop_spec(owner)
+            print("LLM selection:", sel)
+            if deploy_token_from_selection and DEPLOY_ONCHAIN:
+                with span("deploy", owner, sel.get("symbol")):
+                    deploy_token_from_selection(w3, acct, sel)
+    elif isinstance(a, Sleep):
+        sleep_logged(a.seconds, a.reason)
+    else:
+        raise TypeError(f"unknown action: {a!r}")
 
-    # 1) SWAPS
-    swap_n = random.randint(SWAPS_MIN, SWAPS_MAX)
-    syms = _symbols_universe()
+def execute_plan(w3: Web3, acct, plan: WalletPlan, cfg: Dict, start: int = 0) -> None:
+    """start — с какого действия (продолжение батча после падения, см. journal)."""
+    for i in range(start, len(plan.actions)):
+        with journal_action(w3, acct.address, i):
+            execute_action(w3, acct, plan.actions[i], cfg)
 
-    for _ in range(swap_n):
-        t_in, t_out = _rand_two(syms)
-        amt_in = _random_amount_erc20()
-        ensure_allowance(w3, acct, t_in, cfg.get("ROUTER") or ROUTER, amt_in)
-        v3_exactInputSingle(w3, acct, t_in, t_out, amt_in, min_amount_out=0, fee=V3_FEE)
-        sleep_with_jitter(ACTION_SLEEP_BASE, ACTION_SLEEP_JITTER, "after action")
-        time.sleep(random.randint(1,3))
+def schedule_plan(sched, w3: Web3, acct, plan: WalletPlan, cfg: Dict, start_delay: float = 0.0,
+                  start: int = 0) -> None:
+    """
+    Как execute_plan, но Sleep не держит поток: остаток плана ставится таймером в Scheduler.
+    Хвостовая пауза «между кошельками» здесь не нужна — кошельки идут вперемешку.
+    """
+    acts = plan.actions
 
-    # 2) TRANSFERS
-    transfers_n = random.randint(TRANSFERS_MIN, TRANSFERS_MAX)
-    for _ in range(transfers_n):
-        if random.random() < 0.5:
-            native_transfer(w3, acct, owner, _random_amount_wei())
-        else:
-            sym = random.choice(syms)
-            erc20_transfer(w3, acct, sym, owner, _random_amount_erc20())
-        sleep_with_jitter(ACTION_SLEEP_BASE, ACTION_SLEEP_JITTER, "after action")
-        time.sleep(random.randint(1,3))
+    def step(i: int) -> None:
+        try:
+            while i < len(acts):
+                a = acts[i]
+                i += 1
+                if isinstance(a, Sleep):
+                    if i < len(acts):
+                        print(f"sleep {a.seconds}s  ({a.reason})")
+                        # поток не спит, но в разбивке батча пауза должна быть видна
+                        METRICS.observe("phase_seconds", a.seconds * SLEEP_SCALE, phase="sleep")
+                        sched.call_later(a.seconds * SLEEP_SCALE, step, i)
+                    return
+                with journal_action(w3, acct.address, i - 1):
+                    execute_action(w3, acct, a, cfg)
+        except Exception as e:
+            print(f"wallet {acct.address[:10]}… failed:", e)
 
-    # 3) LP (по вероятности)
-    if random.random() < LP_PROBABILITY:
-        t0, t1 = _rand_two(syms)
-        amt0 = _random_amount_erc20()
-        amt1 = _random_amount_erc20()
-        ensure_pool_and_add_liquidity(w3, acct, t0, t1, V3_FEE, amt0, amt1)
-        sleep_with_jitter(ACTION_SLEEP_BASE, ACTION_SLEEP_JITTER, "after action")
-        time.sleep(random.randint(3,10))
+    sched.call_later(start_delay, step, start)
+
+def run_for_wallet(w3: Web3, pk: str, cfg: Dict, plan: WalletPlan | None = None, start: int = 0):
+    acct = make_account(pk)
+    plan = plan or plan_for_wallet(acct.address, cfg.get("PLAN_SEED"))
+    execute_plan(w3, acct, plan, cfg, start)
 
-    # 4) DEPLOY (опционально)
-    if ENABLE_DEPLOY and (random.random() < DEPLOY_PROBABILITY) and selection_from_llm:
-        sel = selection_from_llm(owner)
-        print("LLM selection:", sel)
-        sleep_with_jitter(ACTION_SLEEP_BASE, ACTION_SLEEP_JITTER, "after action")
+def preapprove_for_plans(w3: Web3, accounts: Dict[str, Any], plans: Iterable[WalletPlan],
+                         cfg: Dict | None = None) -> int:
+    """Сумма approve, нужная планам (по owner/token/spender), — одной пачкой на весь батч."""
+    router = (cfg or {}).get("ROUTER") or ROUTER
+    need: Dict[tuple, int] = {}
+    for p in plans:
+        for a in p.actions:
+            if isinstance(a, Swap):
+                k = (p.owner, addr_of(a.token_in), router)
+                need[k] = need.get(k, 0) + a.amount_in
+            elif isinstance(a, AddLiquidity):
+                for t, amt in ((a.token0, a.amount0), (a.token1, a.amount1)):
+                    k = (p.owner, addr_of(t), POS_MANAGER)
+                    need[k] = need.get(k, 0) + amt
+    items = [(accounts[o], t, s, amt) for (o, t, s), amt in need.items() if o in accounts]
+    return ensure_allowances(w3, items)
 
-    # пауза между кошельками
-    jitter(*SLEEP_BETWEEN)
+def prefetch_for_plans(w3: Web3, plans: Iterable[WalletPlan], cfg: Dict | None = None) -> Dict[str, int]:
+    """
+    Всё, что планам понадобится, — заранее и пачками:
+    allowance (multicall), пулы (multicall через индекс), pending nonce (JSON-RPC batch),
+    газ для новых форм approve / transfer (JSON-RPC batch eth_estimateGas),
+    состояние пулов для котировки свопов (multicall slot0 + liquidity).
+    """
+    from .abi import calldata
+    from .allowances import ALLOWANCES
+    from .gas import GAS, shape
+    from .pools import POOLS
+    from .nonce import NONCES
+    router = (cfg or {}).get("ROUTER") or ROUTER
+    plans = list(plans)
+    triples, pairs, swap_pairs = set(), set(), set()
+    for p in plans:
+        for a in p.actions:
+            if isinstance(a, Swap):
+                t_in, t_out = addr_of(a.token_in), addr_of(a.token_out)
+                triples.add((p.owner, t_in, router))
+                pairs.add((t_in, t_out, a.fee))
+                swap_pairs.add((t_in, t_out, a.fee))
+            elif isinstance(a, AddLiquidity):
+                t0, t1 = addr_of(a.token0), addr_of(a.token1)
+                triples.add((p.owner, t0, POS_MANAGER))
+                triples.add((p.owner, t1, POS_MANAGER))
+                pairs.add((t0, t1, a.fee))
+    stats = {"allowances": 0, "pools": 0, "nonces": 0, "gas": 0, "quotes": 0}
+    if triples:
+        stats["allowances"] = ALLOWANCES.seed(w3, sorted(triples))
+    if pairs:
+        stats["pools"] = POOLS.warm(w3, V3_FACTORY, sorted(pairs))
+        if SWAP_QUOTE:
+            from .quoter import get_quoter
+            stats["quotes"] = get_quoter(w3).watch(sorted(swap_pairs))
+    stats["nonces"] = NONCES.prime(w3, [p.owner for p in plans])
+    # swap / mint так не оценить (до approve они ревертятся) — их форма узнаётся при отправке
+    calls = []
+    for o, t, s in sorted(triples):
+        cur = ALLOWANCES.peek(o, t, s)
+        if cur is not None:
+            calls.append((shape("approve", t, "fresh" if cur == 0 else "update"),
+                          {"from": o, "to": t, "data": calldata("erc20", "approve", s, 1)}))
+    for p in plans:
+        for a in p.actions:
+            if isinstance(a, Erc20Transfer):
+                t = addr_of(a.token)
+                calls.append((shape("transfer", t),
+                              {"from": p.owner, "to": t, "data": calldata("erc20", "transfer", a.to or p.owner, a.amount)}))
+            elif isinstance(a, NativeTransfer):
+                calls.append((shape("native"), {"from": p.owner, "to": a.to or p.owner, "value": a.amount_wei}))
+    if calls:
+        stats["gas"] = GAS.warm(w3, calls)
+    return stats
@@ -1,13 +1,19 @@
 # src/util.py
+from __future__ import annotations
 import random, time
-from typing import Dict
-from eth_account import Account
-from web3 import Web3
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
 
 # --- pretty logging utils ---
 import logging, sys, math
 from typing import Optional
-from .config import LOG_LEVEL, LOG_COLOR, LOG_JSON, DEBUG
+from .config import LOG_LEVEL, LOG_COLOR, LOG_JSON, DEBUG, SLEEP_SCALE
+from .nonce import NONCES, is_nonce_error, is_already_known
+from .metrics import phase
+from .journal import get_journal
+
+# web3 / eth_account тяжёлые — грузим при первом использовании, а не при импорте логгера
+if TYPE_CHECKING:
+    from web3 import Web3
 
 RESET = "\x1b[0m"
 COLORS = {
@@ -110,22 +116,196 @@ def on_error(log, msg: str, exc: Exception = None):
         log.error(f"{msg}: {exc}" if exc else msg)
 
 def to_checksum(w3: Web3, addr: str) -> str:
+    from web3 import Web3
     return Web3.to_checksum_address(addr)
 
+def jitter_delay(min_s: int, max_s: int) -> float:
+    """Сколько ждать (с учётом SLEEP_SCALE) — без самого ожидания, для планировщика."""
+    return random.randint(min_s, max_s) * SLEEP_SCALE
+
 def jitter(min_s: int, max_s: int) -> None:
-    t = random.randint(min_s, max_s)
-    time.sleep(t)
+    time.sleep(jitter_delay(min_s, max_s))
 
 def make_account(pk: str):
+    from eth_account import Account
     return Account.from_key(pk)
 
+_CHAIN_IDS: Dict[int, int] = {}
+
+def chain_id(w3: Web3) -> int:
+    cid = _CHAIN_IDS.get(id(w3))
+    if cid is None:
+        cid = _CHAIN_IDS[id(w3)] = int(w3.eth.chain_id)
+    return cid
+
 def build_tx_base(w3: Web3, from_addr: str, gas_limit: int):
-    return {
+    from .fees import get_fee_oracle
+    tx = {
         "from": from_addr,
-        "nonce": w3.eth.get_transaction_count(from_addr),
-        "gasPrice": w3.eth.gas_price,
+        "chainId": chain_id(w3),
         "gas": gas_limit,
+        **get_fee_oracle(w3).fees(),
     }
+    tx["nonce"] = NONCES.next(w3, from_addr)
+    return tx
+
+def _sign(acct, tx: dict) -> bytes:
+    from concurrent.futures.process import BrokenProcessPool
+    from .signer import get_signer, disable
+    s = get_signer()
+    if s is not None and s.has(acct.address):
+        try:
+            return s.sign(tx)
+        except BrokenProcessPool as e:
+            disable(e)
+    return acct.sign_transaction(tx).rawTransaction
+
+def _maybe_sent(exc: Exception) -> bool:
+    """
+    Транспортная ошибка отправки (таймаут, обрыв соединения, 5xx): запрос мог дойти до ноды,
+    и tx могла попасть в mempool. Явный отказ ноды (JSON-RPC error) и «ни один RPC не принял» — нет.
+    """
+    import requests
+    from .chain import RPCUnavailable
+    if isinstance(exc, (RPCUnavailable, requests.ConnectTimeout)):
+        return False
+    if isinstance(exc, requests.HTTPError):
+        return exc.response is None or exc.response.status_code >= 500
+    return isinstance(exc, (requests.RequestException, ConnectionError, TimeoutError))
+
+def sign_and_send_many(w3: Web3, items: List[Tuple[Any, dict]], kind: str | None = None) -> List[Any]:
+    """
+    Пачка (acct, tx) с уже выданными nonce: подпись одним заходом в пул процессов,
+    отправка одним JSON-RPC batch. На каждую позицию — txh или исключение;
+    nonce неотправленных возвращается в NONCES (и все — если упала подпись или сам batch).
+    Транспортная ошибка batch: одна повторная отправка тех же raw; не помогло — tx могли уйти,
+    поэтому nonce не возвращаются, а строки журнала остаются 'signed' (доотправит recover).
+    """
+    from hexbytes import HexBytes
+    from eth_utils import keccak
+    from concurrent.futures.process import BrokenProcessPool
+    from .signer import get_signer, disable
+    def _release_all():
+        for a, tx in reversed(items):
+            NONCES.release(a.address, tx["nonce"])
+
+    s = get_signer()
+    pooled = [i for i, (a, _) in enumerate(items) if s is not None and s.has(a.address)]
+    raws: List[Any] = [None] * len(items)
+    with phase("sign"):
+        if pooled:
+            try:
+                for i, raw in zip(pooled, s.sign_many([items[i][1] for i in pooled])):
+                    raws[i] = raw
+            except BrokenProcessPool as e:
+                disable(e)
+        try:
+            for i, (a, tx) in enumerate(items):
+                if raws[i] is None:
+                    raws[i] = a.sign_transaction(tx).rawTransaction
+        except Exception:
+            _release_all()
+            raise
+    j = get_journal(w3)
+    if j is not None:
+        j.signed([(a.address, tx["nonce"], raw, kind) for (a, tx), raw in zip(items, raws)])
+    calls = [("eth_sendRawTransaction", ["0x" + bytes(r).hex()]) for r in raws]
+    def _post():
+        batch = getattr(w3.provider, "make_batch_request", None)
+        if batch is not None:
+            return batch(calls)
+        return [w3.provider.make_request(m, p) for m, p in calls]
+
+    retried = False
+    with phase("send"):
+        try:
+            try:
+                resps = _post()
+            except Exception as e:
+                if not _maybe_sent(e):
+                    raise
+                # повтор тех же raw безопасен: дошедшие ответят 'already known'
+                retried = True
+                resps = _post()
+        except Exception as e:
+            if not _maybe_sent(e):
+                _release_all()
+                if j is not None:
+                    j.sent(raws, [False] * len(raws))
+            raise
+    out: List[Any] = []
+    state: List[Optional[bool]] = []
+    for (a, tx), raw, r in zip(items, raws, resps):
+        err = r.get("error") if isinstance(r, dict) else {"message": "no response"}
+        if err and is_already_known(err.get("message", err)):
+            err = None
+        if err:
+            out.append(ValueError(err.get("message", err)))
+            if retried:
+                # отказ на повторе не доказывает, что первая попытка не дошла
+                state.append(None)
+                continue
+            NONCES.release(a.address, tx["nonce"])
+            state.append(False)
+        else:
+            out.append(HexBytes(keccak(bytes(raw))))
+            state.append(True)
+    if j is not None:
+        j.sent(raws, state)
+    return out
+
+def sign_and_send(w3: Web3, acct, tx: dict, kind: str | None = None):
+    """
+    Подписать и отправить tx с nonce из NONCES.
+    На 'nonce too low' / 'replacement underpriced' — resync и одна повторная попытка,
+    'already known' — tx уже в mempool, возвращается её хеш; на прочих ошибках nonce возвращается в пул.
+    Транспортная ошибка (таймаут, обрыв): тот же raw отправляется ещё раз; если и это не прошло,
+    tx могла уйти — nonce не возвращается, строка журнала остаётся 'signed'.
+    Если ведётся журнал батча — raw пишется в него до отправки (kind — тип tx для восстановления).
+    """
+    j = get_journal(w3)
+    for attempt in range(2):
+        raw = None
+        try:
+            with phase("sign"):
+                raw = _sign(acct, tx)
+            if j is not None:
+                j.signed([(acct.address, tx["nonce"], raw, kind)])
+            with phase("send"):
+                try:
+                    txh = w3.eth.send_raw_transaction(raw)
+                except Exception as e:
+                    if not _maybe_sent(e):
+                        raise
+                    try:
+                        txh = w3.eth.send_raw_transaction(raw)
+                    except Exception as e2:
+                        if is_already_known(e2):
+                            raise
+                        # первая попытка могла дойти — отказ на повторе ничего не доказывает
+                        raise e from e2
+            if j is not None:
+                j.sent([raw], [True])
+            return txh
+        except Exception as e:
+            if raw is not None and _maybe_sent(e):
+                # могла уйти в сеть: nonce занят, журнал доотправит raw при восстановлении
+                raise
+            if raw is not None and is_already_known(e):
+                from eth_utils import keccak
+                from hexbytes import HexBytes
+                if j is not None:
+                    j.sent([raw], [True])
+                return HexBytes(keccak(bytes(raw)))
+            if j is not None and raw is not None:
+                j.sent([raw], [False])
+            if attempt == 0 and is_nonce_error(e):
+                tx = dict(tx)
+                NONCES.resync(w3, acct.address)
+                tx["nonce"] = NONCES.next(w3, acct.address)
+                continue
+            NONCES.release(acct.address, tx["nonce"])
+            raise
 
 def erc20_min_abi():
     # balanceOf, decimals, symbol, approve, allowance, transfer
@@ -193,11 +373,14 @@ def position_manager_abi():
        ]}
     ]
 
-def sleep_with_jitter(base: int, jitter: int, reason: str = ""):
-    """Поспать base + rand(0..jitter) секунд, с логом причины."""
-    t = base + random.randint(0, max(jitter, 0))
+def sleep_logged(t: float, reason: str = ""):
     if reason:
         print(f"sleep {t}s  ({reason})")
     else:
         print(f"sleep {t}s")
-    time.sleep(t)
+    with phase("sleep"):
+        time.sleep(t * SLEEP_SCALE)
+
+def sleep_with_jitter(base: int, jitter: int, reason: str = ""):
+    """Поспать base + rand(0..jitter) секунд, с логом причины."""
+    sleep_logged(base + random.randint(0, max(jitter, 0)), reason)
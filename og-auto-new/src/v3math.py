@@ -0,0 +1,309 @@
+# src/v3math.py
+"""
+Математика Uniswap V3 локально, в целых числах — как в контрактах (TickMath, SqrtPriceMath,
+LiquidityAmounts), чтобы параметры mint считались без пробных tx и совпадали с тем, что посчитает пул.
+
+- тик <-> sqrtPriceX96, выравнивание тиков по tickSpacing тира комиссии
+- цена (с учётом decimals) -> sqrtPriceX96 для инициализации пула
+- ликвидность <-> суммы токенов для позиции [tickLower, tickUpper)
+- exactInput-своп в пределах текущего диапазона ликвидности (SwapMath.computeSwapStep)
+- *_many — то же для многих позиций разом: numpy, если установлен (float64, для оценок/отбора),
+  иначе тот же точный целочисленный расчёт в цикле
+"""
+from math import isqrt
+from typing import List, Sequence, Tuple
+
+Q96 = 1 << 96
+Q128 = 1 << 128
+Q192 = 1 << 192
+MAX_UINT256 = (1 << 256) - 1
+
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+# fee (в сотых долях bps) -> tickSpacing, как enableFeeAmount в UniswapV3Factory
+TICK_SPACING = {100: 1, 500: 10, 3000: 60, 10000: 200}
+
+# множители sqrt(1.0001)^-(2^i) в Q128 — константы TickMath.getSqrtRatioAtTick
+_RATIO_BITS = (
+    (0x2, 0xfff97272373d413259a46990580e213a),
+    (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0),
+    (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0),
+    (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053),
+    (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54),
+    (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9),
+    (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5),
+    (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6),
+    (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604),
+    (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+
+def _div_up(a: int, b: int) -> int:
+    return -(-a // b)
+
+def _mul_div_up(a: int, b: int, d: int) -> int:
+    return _div_up(a * b, d)
+
+# ---- TickMath ----
+
+def tick_spacing(fee: int) -> int:
+    try:
+        return TICK_SPACING[int(fee)]
+    except KeyError:
+        raise ValueError(f"unknown V3 fee tier: {fee}") from None
+
+def sqrt_ratio_at_tick(tick: int) -> int:
+    """TickMath.getSqrtRatioAtTick: sqrt(1.0001^tick) * 2^96, округление вверх."""
+    tick = int(tick)
+    if not MIN_TICK <= tick <= MAX_TICK:
+        raise ValueError(f"tick out of range: {tick}")
+    a = abs(tick)
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if a & 0x1 else Q128
+    for bit, mul in _RATIO_BITS:
+        if a & bit:
+            ratio = (ratio * mul) >> 128
+    if tick > 0:
+        ratio = MAX_UINT256 // ratio
+    return (ratio >> 32) + (1 if ratio % (1 << 32) else 0)
+
+def tick_at_sqrt_ratio(sqrt_price_x96: int) -> int:
+    """TickMath.getTickAtSqrtRatio: наибольший tick с sqrt_ratio_at_tick(tick) <= price."""
+    p = int(sqrt_price_x96)
+    if not MIN_SQRT_RATIO <= p < MAX_SQRT_RATIO:
+        raise ValueError(f"sqrtPriceX96 out of range: {p}")
+    # в контракте — log2 по битам; здесь то же через бинарный поиск по точной функции
+    lo, hi = MIN_TICK, MAX_TICK
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if sqrt_ratio_at_tick(mid) <= p:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def align_tick(tick: int, spacing: int, up: bool = False) -> int:
+    """Ближайший кратный spacing тик (вниз / вверх), не выходя за [MIN_TICK, MAX_TICK]."""
+    t = int(tick) // spacing * spacing
+    if up and t < tick:
+        t += spacing
+    lo, hi = usable_range(spacing)
+    return min(max(t, lo), hi)
+
+def usable_range(spacing: int) -> Tuple[int, int]:
+    """Крайние тики, которые тир допускает (full range позиция)."""
+    lo = -(-MIN_TICK // spacing) * spacing
+    return lo, MAX_TICK // spacing * spacing
+
+def range_around(tick: int, fee: int, width: int = 0) -> Tuple[int, int]:
+    """
+    Диапазон позиции вокруг текущего тика: ±width тиков, выровненный по spacing тира;
+    width <= 0 — весь допустимый диапазон. Нижний < верхнего всегда.
+    """
+    s = tick_spacing(fee)
+    if width <= 0:
+        return usable_range(s)
+    lo = align_tick(int(tick) - int(width), s)
+    hi = align_tick(int(tick) + int(width), s, up=True)
+    if hi <= lo:
+        hi = lo + s
+    return lo, hi
+
+# ---- цена ----
+
+def encode_price_sqrt(amount1: int, amount0: int) -> int:
+    """sqrtPriceX96 для цены amount1/amount0 (сырые единицы токенов), как encodePriceSqrt в тестах V3."""
+    if amount0 <= 0 or amount1 <= 0:
+        raise ValueError("amounts must be positive")
+    return isqrt((int(amount1) << 192) // int(amount0))
+
+def price_to_sqrt_x96(price: float, decimals0: int = 18, decimals1: int = 18) -> int:
+    """
+    Человеческая цена (сколько token1 за 1 token0) -> sqrtPriceX96.
+    Decimals переводят её в сырые единицы: raw = price * 10^(d1 - d0).
+    """
+    from fractions import Fraction
+    fr = Fraction(str(price)) * Fraction(10) ** (int(decimals1) - int(decimals0))
+    if fr <= 0:
+        raise ValueError("price must be positive")
+    p = isqrt(fr.numerator * Q192 // fr.denominator)
+    return min(max(p, MIN_SQRT_RATIO), MAX_SQRT_RATIO - 1)
+
+def sqrt_x96_to_price(sqrt_price_x96: int, decimals0: int = 18, decimals1: int = 18) -> float:
+    return (int(sqrt_price_x96) / Q96) ** 2 * 10 ** (int(decimals0) - int(decimals1))
+
+# ---- SqrtPriceMath: суммы на отрезке цены ----
+
+def amount0_delta(sa: int, sb: int, liquidity: int, round_up: bool = False) -> int:
+    """token0 между sqrt-ценами sa и sb при ликвидности L: L * 2^96 * (sb - sa) / sb / sa."""
+    if sa > sb:
+        sa, sb = sb, sa
+    num1, num2 = int(liquidity) << 96, sb - sa
+    if round_up:
+        return _div_up(_mul_div_up(num1, num2, sb), sa)
+    return num1 * num2 // sb // sa
+
+def amount1_delta(sa: int, sb: int, liquidity: int, round_up: bool = False) -> int:
+    """token1 между sa и sb: L * (sb - sa) / 2^96."""
+    if sa > sb:
+        sa, sb = sb, sa
+    return _mul_div_up(int(liquidity), sb - sa, Q96) if round_up else int(liquidity) * (sb - sa) // Q96
+
+# ---- LiquidityAmounts ----
+
+def liquidity_for_amount0(sa: int, sb: int, amount0: int) -> int:
+    if sa > sb:
+        sa, sb = sb, sa
+    return int(amount0) * (sa * sb // Q96) // (sb - sa)
+
+def liquidity_for_amount1(sa: int, sb: int, amount1: int) -> int:
+    if sa > sb:
+        sa, sb = sb, sa
+    return int(amount1) * Q96 // (sb - sa)
+
+def liquidity_for_amounts(sqrt_p: int, sa: int, sb: int, amount0: int, amount1: int) -> int:
+    """LiquidityAmounts.getLiquidityForAmounts: максимум L, который влезает в оба desired."""
+    if sa > sb:
+        sa, sb = sb, sa
+    if sqrt_p <= sa:
+        return liquidity_for_amount0(sa, sb, amount0)
+    if sqrt_p < sb:
+        return min(liquidity_for_amount0(sqrt_p, sb, amount0), liquidity_for_amount1(sa, sqrt_p, amount1))
+    return liquidity_for_amount1(sa, sb, amount1)
+
+def amounts_for_liquidity(sqrt_p: int, sa: int, sb: int, liquidity: int,
+                          round_up: bool = False) -> Tuple[int, int]:
+    """
+    Сколько token0/token1 стоит позиция L на [sa, sb] при цене sqrt_p.
+    round_up=True — как считает пул при mint (столько он реально заберёт).
+    """
+    if sa > sb:
+        sa, sb = sb, sa
+    if sqrt_p <= sa:
+        return amount0_delta(sa, sb, liquidity, round_up), 0
+    if sqrt_p < sb:
+        return amount0_delta(sqrt_p, sb, liquidity, round_up), amount1_delta(sa, sqrt_p, liquidity, round_up)
+    return 0, amount1_delta(sa, sb, liquidity, round_up)
+
+def position(sqrt_p: int, tick_lower: int, tick_upper: int, amount0: int, amount1: int) -> Tuple[int, int, int]:
+    """Mint с desired (amount0, amount1) -> (liquidity, amount0, amount1), которые пул фактически возьмёт."""
+    sa, sb = sqrt_ratio_at_tick(tick_lower), sqrt_ratio_at_tick(tick_upper)
+    liq = liquidity_for_amounts(int(sqrt_p), sa, sb, int(amount0), int(amount1))
+    a0, a1 = amounts_for_liquidity(int(sqrt_p), sa, sb, liq, round_up=True)
+    return liq, a0, a1
+
+def with_slippage(amount: int, bps: int) -> int:
+    """Нижняя граница суммы для amount*Min: amount * (1 - bps/10000), вниз."""
+    return int(amount) * (10_000 - int(bps)) // 10_000
+
+# ---- своп (SwapMath, один шаг без пересечения тиков) ----
+
+def next_sqrt_price_from_input(sqrt_p: int, liquidity: int, amount_in: int, zero_for_one: bool) -> int:
+    """SqrtPriceMath.getNextSqrtPriceFromInput: цена после amount_in (уже без комиссии)."""
+    sqrt_p, liquidity, amount_in = int(sqrt_p), int(liquidity), int(amount_in)
+    if liquidity <= 0:
+        raise ValueError("zero liquidity")
+    if amount_in == 0:
+        return sqrt_p
+    if zero_for_one:
+        # token0 in: цена вниз, getNextSqrtPriceFromAmount0RoundingUp
+        num = liquidity << 96
+        return _mul_div_up(num, sqrt_p, num + amount_in * sqrt_p)
+    # token1 in: цена вверх, getNextSqrtPriceFromAmount1RoundingDown
+    return sqrt_p + (amount_in << 96) // liquidity
+
+def swap_exact_input(sqrt_p: int, liquidity: int, amount_in: int, fee: int,
+                     zero_for_one: bool) -> Tuple[int, int]:
+    """
+    exactInput при постоянной ликвидности (своп не выходит из текущего диапазона):
+    (amount_out, sqrt_price_after). Комиссия тира снимается со входа, как в пуле.
+    """
+    less_fee = int(amount_in) * (1_000_000 - int(fee)) // 1_000_000
+    nxt = next_sqrt_price_from_input(sqrt_p, liquidity, less_fee, zero_for_one)
+    if not MIN_SQRT_RATIO <= nxt < MAX_SQRT_RATIO:
+        raise ValueError("price limit")
+    if zero_for_one:
+        return amount1_delta(nxt, sqrt_p, liquidity), nxt
+    return amount0_delta(sqrt_p, nxt, liquidity), nxt
+
+def price_impact_bps(sqrt_before: int, sqrt_after: int) -> int:
+    """Сдвиг цены (token1/token0) в bps; направление не важно."""
+    b, a = int(sqrt_before) ** 2, int(sqrt_after) ** 2
+    return abs(a - b) * 10_000 // b
+
+# ---- много позиций разом ----
+
+def _np():
+    # optional: без numpy *_many считают точным циклом
+    try:
+        import numpy
+        return numpy
+    except ImportError:
+        return None
+
+def sqrt_ratios_at_ticks(ticks: Sequence[int], exact: bool = False) -> List:
+    """
+    sqrtPriceX96 для многих тиков. numpy + exact=False — float64 (относительная ошибка ~1e-15,
+    для отбора/оценок); иначе — точные int, как sqrt_ratio_at_tick.
+    """
+    np = _np()
+    if np is None or exact:
+        return [sqrt_ratio_at_tick(t) for t in ticks]
+    t = np.asarray(ticks, dtype=np.float64)
+    return (np.power(1.0001, t / 2) * float(Q96)).tolist()
+
+def liquidity_many(sqrt_p: Sequence[int], sqrt_a: Sequence[int], sqrt_b: Sequence[int],
+                   amounts0: Sequence[int], amounts1: Sequence[int],
+                   exact: bool = False) -> List[Tuple[int, int, int]]:
+    """
+    LiquidityAmounts для многих позиций разом: [(liquidity, amount0, amount1)].
+    Ликвидность и суммы — вниз, как liquidity_for_amounts + amounts_for_liquidity.
+    numpy + exact=False — векторно во float64 (ошибка ~1e-15 относительно, возможен сдвиг на 1);
+    иначе — точный целочисленный расчёт в цикле.
+    """
+    n = len(sqrt_p)
+    np = _np()
+    if np is None or exact or n == 0:
+        out = []
+        for p, a, b, x, y in zip(sqrt_p, sqrt_a, sqrt_b, amounts0, amounts1):
+            liq = liquidity_for_amounts(int(p), int(a), int(b), int(x), int(y))
+            out.append((liq, *amounts_for_liquidity(int(p), int(a), int(b), liq)))
+        return out
+    q = float(Q96)
+
+    def arr(v):
+        return np.asarray([float(x) for x in v], dtype=np.float64)
+
+    p, a, b = arr(sqrt_p) / q, arr(sqrt_a) / q, arr(sqrt_b) / q
+    sa, sb = np.minimum(a, b), np.maximum(a, b)
+    x, y = arr(amounts0), arr(amounts1)
+    pc = np.clip(p, sa, sb)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        l0 = np.where(pc < sb, x * pc * sb / (sb - pc), np.inf)
+        l1 = np.where(pc > sa, y / (pc - sa), np.inf)
+    liq = np.minimum(l0, l1)
+    liq = np.floor(np.where(np.isfinite(liq), liq, 0.0))
+    a0 = np.floor(liq * (sb - pc) / (pc * sb))
+    a1 = np.floor(liq * (pc - sa))
+    return [(int(l_), int(u0), int(u1)) for l_, u0, u1 in zip(liq.tolist(), a0.tolist(), a1.tolist())]
+
+def positions_many(sqrt_p: Sequence[int], lowers: Sequence[int], uppers: Sequence[int],
+                   amounts0: Sequence[int], amounts1: Sequence[int],
+                   exact: bool = False) -> List[Tuple[int, int, int]]:
+    """
+    Как position() для многих позиций [tickLower, tickUpper): [(liquidity, amount0, amount1)].
+    Для отбора/оценок: суммы вниз (liquidity_many); точные mint-параметры конкретной tx — position().
+    """
+    sa = sqrt_ratios_at_ticks(lowers, exact)
+    sb = sqrt_ratios_at_ticks(uppers, exact)
+    return liquidity_many(sqrt_p, sa, sb, amounts0, amounts1, exact)
@@ -0,0 +1,9 @@
+import os
+
+# до импорта src.config: in-memory цепь и быстрые поллеры, без пауз и без state store по умолчанию
+os.environ.setdefault("BACKEND", "sim")
+os.environ.setdefault("SLEEP_SCALE", "0")
+os.environ.setdefault("HEAD_POLL_INTERVAL", "0.02")
+os.environ.setdefault("RECEIPT_POLL_INTERVAL", "0.02")
+os.environ.setdefault("JOURNAL_RECOVER_TIMEOUT", "5")
+os.environ.setdefault("STATE_DB_PATH", "")
@@ -0,0 +1,77 @@
+import hashlib
+from collections import Counter
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from src import dex
+from src.allowances import MAX_UINT256, AllowanceLedger
+from src.config import ROUTER, TOKENS
+from src.nonce import NONCES
+from src.simchain import SimProvider
+
+TOKEN = sorted(m["address"] for m in TOKENS.values())[0]
+
+class _Counting(SimProvider):
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+
+    def make_request(self, method, params):
+        self.calls[method] += 1
+        return super().make_request(method, params)
+
+def _acct(tag: str):
+    a = Account.from_key("0x" + hashlib.sha256(f"test-allowances:{tag}".encode()).hexdigest())
+    NONCES.reset(a.address)
+    return a
+
+@pytest.fixture
+def sim():
+    prov = _Counting()
+    return Web3(prov), prov
+
+def test_get_reads_chain_once(sim):
+    w3, prov = sim
+    owner = _acct("get").address
+    prov.chain.token(TOKEN).allowances[(owner.lower(), ROUTER.lower())] = 50
+    led = AllowanceLedger()
+    assert led.get(w3, owner, TOKEN, ROUTER) == 50
+    assert led.get(w3, owner.lower(), TOKEN.lower(), ROUTER) == 50
+    assert prov.calls["eth_call"] == 1
+
+def test_seed_skips_known_triples(sim):
+    w3, prov = sim
+    owners = [_acct(f"seed{i}").address for i in range(3)]
+    led = AllowanceLedger()
+    led.set(owners[0], TOKEN, ROUTER, 7)
+    assert led.seed(w3, [(o, TOKEN, ROUTER) for o in owners]) == 2
+    assert prov.calls["eth_call"] == 1  # одна пачка на оставшиеся два
+    assert led.peek(owners[0], TOKEN, ROUTER) == 7
+    assert led.seed(w3, [(o, TOKEN, ROUTER) for o in owners]) == 0
+
+def test_spend_and_forget():
+    led = AllowanceLedger()
+    led.set("0xa", "0xt", "0xs", 100)
+    led.spend("0xa", "0xt", "0xs", 30)
+    assert led.peek("0xa", "0xt", "0xs") == 70
+    led.spend("0xa", "0xt", "0xs", 500)
+    assert led.peek("0xa", "0xt", "0xs") == 0
+    led.set("0xa", "0xt", "0xs", MAX_UINT256)
+    led.spend("0xa", "0xt", "0xs", 10**30)
+    assert led.peek("0xa", "0xt", "0xs") == MAX_UINT256  # бесконечный approve не убывает
+    led.forget("0xa", "0xt", "0xs")
+    assert led.peek("0xa", "0xt", "0xs") is None
+
+def test_ensure_allowance_approves_once(sim, monkeypatch):
+    w3, prov = sim
+    monkeypatch.setattr(dex, "ALLOWANCES", AllowanceLedger())
+    acct = _acct("ensure")
+    assert dex.ensure_allowance(w3, acct, TOKEN, ROUTER, 10**18) is not None
+    reads = prov.calls["eth_call"]
+    # хватает — ни approve, ни allowance() из цепи
+    assert dex.ensure_allowance(w3, acct, TOKEN, ROUTER, 10**18) is None
+    assert prov.calls["eth_call"] == reads
+    assert w3.eth.get_transaction_count(acct.address) == 1
+    assert prov.chain.token(TOKEN).allowances[(acct.address.lower(), ROUTER.lower())] >= 10**18
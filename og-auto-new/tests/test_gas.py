@@ -0,0 +1,54 @@
+from src.gas import GasModel, shape
+
+KEY = shape("swap", "0xaaa", "0xbbb", 3000)
+
+def _send(m: GasModel, nonce: int, fallback: int = 400_000) -> int:
+    tx = {"from": "0xWallet", "nonce": nonce}
+    return m.apply(None, KEY, tx, fallback)
+
+def test_percentile_with_margin():
+    m = GasModel(window=64, percentile=95, margin=0.25, min_samples=1)
+    for i in range(20):
+        m.observe(KEY, 100_000 + i)
+    assert m.predict(KEY) == 125_023  # p95 из 20 — 19-е значение: 100_018 * 1.25 = 125_022.5 -> ceil
+
+def test_unknown_shape_has_no_prediction():
+    assert GasModel().predict("approve:0xabc:fresh") is None
+
+def test_out_of_gas_raises_floor_over_long_window():
+    m = GasModel(window=64, percentile=95, margin=0.25, min_samples=1)
+    for _ in range(30):
+        m.observe(KEY, 100_000)
+    limit = _send(m, 1)
+    assert limit == 125_000
+    m.settle("0xWallet", 1, {"status": 0, "gasUsed": limit})
+    assert m.predict(KEY) == 156_250
+    # новые успешные выборки пол не опускают
+    for _ in range(30):
+        m.observe(KEY, 100_000)
+    assert m.predict(KEY) == 156_250
+
+def test_revert_below_limit_is_not_out_of_gas():
+    m = GasModel(window=64, percentile=95, margin=0.25, min_samples=1)
+    m.observe(KEY, 100_000)
+    limit = _send(m, 1)
+    m.settle("0xWallet", 1, {"status": 0, "gasUsed": limit // 2})
+    assert m.predict(KEY) == limit
+
+def test_floor_applies_to_estimates():
+    m = GasModel(window=64, percentile=95, margin=0.25, min_samples=5)
+    m._estimates[KEY] = 80_000
+    limit = _send(m, 1)
+    assert limit == 100_000
+    m.settle("0xWallet", 1, {"status": 0, "gasUsed": limit})
+    assert m.predict(KEY) == 125_000
+
+def test_success_receipt_feeds_window():
+    m = GasModel(window=4, percentile=100, margin=0.0, min_samples=1)
+    m.observe(KEY, 50_000)
+    _send(m, 7)
+    m.settle("0xWallet", 7, {"status": 1, "gasUsed": 60_000})
+    assert m.predict(KEY) == 60_000
+    # receipt без записи inflight игнорируется
+    m.settle("0xWallet", 8, {"status": 1, "gasUsed": 90_000})
+    assert m.predict(KEY) == 60_000
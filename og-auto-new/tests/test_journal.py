@@ -0,0 +1,147 @@
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from src import chain, journal, orchestrator
+from src.config import SIM_BASE_FEE, SIM_CHAIN_ID
+from src.journal import Journal
+from src.plan import NativeTransfer, Sleep, Swap, WalletPlan
+from src.simchain import SimProvider
+from src.state import StateStore
+
+ACCT = Account.from_key("0x" + "11" * 32)
+DEST = "0x000000000000000000000000000000000000dEaD"
+
+class _Crash(Exception):
+    pass
+
+@pytest.fixture
+def w3():
+    return Web3(SimProvider())
+
+@pytest.fixture
+def store(tmp_path):
+    return StateStore(str(tmp_path / "state.sqlite"))
+
+def _raw(nonce: int, value: int = 1) -> bytes:
+    tx = {"chainId": SIM_CHAIN_ID, "nonce": nonce, "to": DEST, "value": value, "gas": 21_000,
+          "maxFeePerGas": SIM_BASE_FEE * 2, "maxPriorityFeePerGas": 1, "type": 2}
+    return bytes(ACCT.sign_transaction(tx).rawTransaction)
+
+def _hash(raw: bytes) -> str:
+    return Web3.keccak(raw).hex()
+
+def _plan(*actions) -> WalletPlan:
+    return WalletPlan(owner=ACCT.address, seed="7", actions=list(actions))
+
+def _crash_in(j: Journal, idx: int, raw: bytes, kind: str, sent=None) -> None:
+    """Действие idx подписало tx и процесс упал: next_idx не сдвинулся."""
+    with pytest.raises(_Crash):
+        with j.action(ACCT.address, idx):
+            j.signed([(ACCT.address, 0, raw, kind)])
+            if sent is not None:
+                j.sent([raw], [sent])
+            raise _Crash()
+
+def _state(store: StateStore, raw: bytes):
+    rows = store.rows("SELECT state, status FROM journal WHERE hash = ?", (_hash(raw),))
+    return (rows[0]["state"], rows[0]["status"]) if rows else None
+
+TRANSFER = NativeTransfer(to=DEST, amount_wei=1)
+TAIL = NativeTransfer(to=DEST, amount_wei=2)
+
+def test_signed_not_sent_is_broadcast_and_action_skipped(w3, store):
+    plan = _plan(TRANSFER, TAIL)
+    j = Journal(store)
+    j.begin("7", [plan])
+    raw = _raw(0)
+    _crash_in(j, 0, raw, "transfer")
+    assert _state(store, raw) == ("signed", None)
+
+    bid, seed, todo = Journal(store).recover(w3)
+    assert (bid, seed) == (j.batch, "7")
+    assert w3.eth.get_transaction_receipt(_hash(raw))["status"] == 1
+    assert _state(store, raw) == ("done", 1)
+    # transfer на idx 0 уже ушёл — продолжаем со следующего действия
+    assert [(p.owner, start) for p, start in todo] == [(ACCT.address, 1)]
+
+def test_sent_but_not_mined_is_rebroadcast(w3, store):
+    # нода приняла tx и потеряла её (рестарт, вытеснение из mempool) — в цепи её нет
+    j = Journal(store)
+    j.begin("7", [_plan(TRANSFER, TAIL)])
+    raw = _raw(0)
+    _crash_in(j, 0, raw, "transfer", sent=True)
+    assert _state(store, raw) == ("sent", None)
+
+    _, _, todo = Journal(store).recover(w3)
+    assert w3.eth.get_transaction_count(ACCT.address) == 1
+    assert _state(store, raw) == ("done", 1)
+    assert [start for _, start in todo] == [1]
+
+def test_sent_and_mined_is_reconciled_without_resend(w3, store, capsys):
+    j = Journal(store)
+    j.begin("7", [_plan(TRANSFER, TAIL)])
+    raw = _raw(0)
+    w3.eth.send_raw_transaction(raw)
+    _crash_in(j, 0, raw, "transfer", sent=True)
+
+    _, _, todo = Journal(store).recover(w3)
+    assert "1 mined, 0 re-sent, 0 dropped" in capsys.readouterr().out
+    assert _state(store, raw) == ("done", 1)
+    assert [start for _, start in todo] == [1]
+
+def test_dropped_tx_repeats_the_action(w3, store):
+    # nonce 0 заняла другая tx — сохранённый raw уже не пройдёт, действие надо повторить
+    j = Journal(store)
+    j.begin("7", [_plan(TRANSFER, TAIL)])
+    raw = _raw(0)
+    w3.eth.send_raw_transaction(_raw(0, value=5))
+    _crash_in(j, 0, raw, "transfer")
+
+    _, _, todo = Journal(store).recover(w3)
+    assert _state(store, raw) == ("dropped", None)
+    assert [start for _, start in todo] == [0]
+
+def test_non_terminal_tx_does_not_skip_action(w3, store):
+    # упали после approve, до самого swap: swap надо выполнить
+    swap = Swap(token_in="USDT", token_out="WETH", amount_in=10, fee=3000)
+    j = Journal(store)
+    j.begin("7", [_plan(swap, TAIL)])
+    raw = _raw(0)
+    _crash_in(j, 0, raw, "approve")
+
+    _, _, todo = Journal(store).recover(w3)
+    assert _state(store, raw) == ("done", 1)
+    assert [start for _, start in todo] == [0]
+
+def test_finished_and_sleep_only_plans(w3, store):
+    j = Journal(store)
+    j.begin("7", [_plan(TRANSFER, Sleep(seconds=5))])
+    with j.action(ACCT.address, 0):
+        pass
+    # остались только паузы — кошелёк не продолжаем, но батч всё равно незавершён
+    bid, _, todo = Journal(store).recover(w3)
+    assert bid == j.batch and todo == []
+    j.finish()
+    assert Journal(store).recover(w3) is None
+
+def test_resume_runs_left_actions(w3, store, monkeypatch):
+    pk = "0x" + "11" * 32
+    plan = _plan(TRANSFER, TAIL)
+    j = Journal(store)
+    j.begin("7", [plan])
+    raw = _raw(0)
+    _crash_in(j, 0, raw, "transfer")
+
+    fresh = Journal(store)
+    ran = []
+    monkeypatch.setattr(chain, "get_w3", lambda: w3)
+    monkeypatch.setattr(journal, "get_journal", lambda w3=None: fresh)
+    monkeypatch.setattr(orchestrator, "PRIVATE_KEYS", [pk])
+    monkeypatch.setattr(orchestrator, "_prefetch", lambda plans: None)
+    monkeypatch.setattr(orchestrator, "_execute",
+                        lambda wallets, plans, starts, c, s: ran.append((wallets, plans, starts)))
+
+    assert orchestrator._resume(None, None) is True
+    assert ran == [([pk], [plan], [1])]
+    assert fresh.batch is None and fresh.unfinished() is None
@@ -0,0 +1,73 @@
+from collections import Counter
+
+import pytest
+from web3 import Web3
+
+from src import multicall
+from src.config import MULTICALL3, TOKENS, V3_FACTORY, V3_FEE
+from src.simchain import SimProvider
+
+OWNER = "0x" + "a1" * 20
+SPENDER = "0x" + "55" * 20
+EOA = "0x000000000000000000000000000000000000dEaD"
+T0, T1 = sorted(m["address"] for m in TOKENS.values())[:2]
+
+class _Counting(SimProvider):
+    def __init__(self, fail_get_code: int = 0):
+        super().__init__()
+        self.calls = Counter()
+        self.fail_get_code = fail_get_code
+
+    def make_request(self, method, params):
+        self.calls[method] += 1
+        if method == "eth_getCode" and self.fail_get_code:
+            self.fail_get_code -= 1
+            raise ConnectionError("connection reset")
+        return super().make_request(method, params)
+
+    def make_batch_request(self, calls):
+        self.calls["batch"] += 1
+        for m, _ in calls:
+            self.calls[m] += 1
+        return super().make_batch_request(calls)
+
+def _w3(with_multicall: bool = True, **kw):
+    prov = _Counting(**kw)
+    tok = prov.chain.token(T0)
+    tok.allowances[(OWNER.lower(), SPENDER.lower())] = 123
+    tok.balances[OWNER.lower()] = 456
+    if not with_multicall:
+        prov.chain.contracts.pop(MULTICALL3.lower())
+        prov.chain.code.pop(MULTICALL3.lower())
+    return Web3(prov), prov
+
+def _reads(w3):
+    return (
+        multicall.allowances(w3, [(OWNER, T0, SPENDER), (OWNER, T1, SPENDER), (OWNER, EOA, SPENDER)]),
+        multicall.balances(w3, [(OWNER, T0)]),
+        multicall.decimals(w3, [T0, T1]),
+        multicall.pools(w3, V3_FACTORY, [(T0, T1, V3_FEE), (T0, T1, 1)]),
+    )
+
+@pytest.mark.parametrize("with_multicall", [True, False])
+def test_bulk_reads(with_multicall):
+    w3, prov = _w3(with_multicall)
+    allow, bal, dec, pools = _reads(w3)
+    # вызов в адрес без кода ничего не вернул -> None, а не исключение на всю пачку
+    assert allow == [123, 0, None]
+    assert bal == [456]
+    assert dec == [prov.chain.token(T0).decimals, prov.chain.token(T1).decimals]
+    assert pools[0] == Web3.to_checksum_address(prov.chain.pool(T0, T1, V3_FEE).address)
+    assert pools[1] == multicall.ZERO_ADDRESS
+    if with_multicall:
+        # одна пачка = один eth_call
+        assert prov.calls["eth_call"] == 4 and prov.calls["batch"] == 0
+    else:
+        assert prov.calls["batch"] == 4
+
+def test_get_code_error_is_not_cached():
+    w3, prov = _w3(fail_get_code=1)
+    assert multicall.allowances(w3, [(OWNER, T0, SPENDER)]) == [123]
+    assert prov.calls["batch"] == 1
+    assert multicall.allowances(w3, [(OWNER, T0, SPENDER)]) == [123]
+    assert prov.calls["eth_getCode"] == 2 and prov.calls["batch"] == 1
@@ -0,0 +1,97 @@
+import threading
+from types import SimpleNamespace
+
+from src.nonce import NonceManager, is_already_known, is_nonce_error
+
+ADDR = "0xAbC0000000000000000000000000000000000001"
+
+class _Chain:
+    def __init__(self, count: int):
+        self.count = count
+        self.reads = 0
+        self.eth = SimpleNamespace(get_transaction_count=self._count)
+        self.provider = SimpleNamespace()
+
+    def _count(self, address, block):
+        assert block == "pending"
+        self.reads += 1
+        return self.count
+
+def test_next_reads_chain_once():
+    w3, nm = _Chain(5), NonceManager()
+    assert [nm.next(w3, ADDR) for _ in range(3)] == [5, 6, 7]
+    assert w3.reads == 1
+    assert nm.pending(ADDR.lower()) == [5, 6, 7]
+
+def test_release_last_nonce_is_reused():
+    w3, nm = _Chain(0), NonceManager()
+    n = nm.next(w3, ADDR)
+    nm.release(ADDR, n)
+    assert nm.next(w3, ADDR) == n
+    assert w3.reads == 1
+
+def test_release_with_gap_rereads_chain():
+    w3, nm = _Chain(0), NonceManager()
+    a, b = nm.next(w3, ADDR), nm.next(w3, ADDR)
+    assert (a, b) == (0, 1)
+    nm.release(ADDR, a)             # b уже выдан — локально дырку не залатать
+    w3.count = 1
+    assert nm.next(w3, ADDR) == 1
+    assert w3.reads == 2
+
+def test_confirm_and_resync():
+    w3, nm = _Chain(10), NonceManager()
+    for _ in range(3):
+        nm.next(w3, ADDR)
+    nm.confirm(ADDR, 10)
+    assert nm.pending(ADDR) == [11, 12]
+    w3.count = 12
+    assert nm.resync(w3, ADDR) == 12
+    assert nm.pending(ADDR) == [12]
+    assert nm.next(w3, ADDR) == 12
+
+def test_prime_uses_one_batch():
+    w3, nm = _Chain(0), NonceManager()
+    calls = []
+
+    def batch(reqs):
+        calls.append(reqs)
+        return [{"result": hex(7)}, {"error": {"message": "boom"}}]
+
+    w3.provider.make_batch_request = batch
+    other = "0x0000000000000000000000000000000000000002"
+    assert nm.prime(w3, [ADDR, other]) == 1
+    assert len(calls) == 1
+    assert nm.next(w3, ADDR) == 7 and w3.reads == 0
+    assert nm.next(w3, other) == 0 and w3.reads == 1
+
+def test_prime_without_batch_leaves_nonce_free():
+    w3, nm = _Chain(3), NonceManager()
+    assert nm.prime(w3, [ADDR]) == 1
+    assert nm.prime(w3, [ADDR]) == 0
+    assert nm.pending(ADDR) == []
+    assert nm.next(w3, ADDR) == 3 and w3.reads == 1
+
+def test_prime_concurrent_with_next():
+    w3, nm = _Chain(0), NonceManager()
+    addrs = ["0x%040x" % i for i in range(1, 33)]
+    got = []
+
+    def worker():
+        got.extend(nm.next(w3, a) for a in addrs)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    nm.prime(w3, addrs)
+    for t in threads:
+        t.join()
+    for a in addrs:
+        assert nm.pending(a) == [0, 1, 2, 3]
+
+def test_error_classification():
+    assert is_nonce_error(ValueError({"code": -32000, "message": "nonce too low"}))
+    assert is_nonce_error(Exception("replacement transaction underpriced"))
+    assert not is_nonce_error(Exception("already known"))
+    assert is_already_known(ValueError({"code": -32000, "message": "already known"}))
+    assert not is_already_known(Exception("insufficient funds"))
@@ -0,0 +1,60 @@
+import hashlib
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from src import chain, orchestrator, strategy
+from src.nonce import NONCES
+from src.plan import NativeTransfer, Sleep, WalletPlan
+from src.simchain import SimProvider
+
+DEST = "0x000000000000000000000000000000000000bEEF"
+
+def _keys(tag: str, n: int):
+    return ["0x" + hashlib.sha256(f"test-orchestrator:{tag}:{i}".encode()).hexdigest() for i in range(n)]
+
+@pytest.mark.parametrize("scheduled", [False, True])
+def test_wallets_run_concurrently_each_in_order(monkeypatch, scheduled):
+    w3 = Web3(SimProvider())
+    monkeypatch.setattr(chain, "get_w3", lambda: w3)
+    keys = _keys(f"order:{scheduled}", 4)
+    plans = []
+    for pk in keys:
+        owner = Account.from_key(pk).address
+        NONCES.reset(owner)
+        plans.append(WalletPlan(owner=owner, seed="7", actions=[
+            NativeTransfer(to=DEST, amount_wei=1), Sleep(seconds=3),
+            NativeTransfer(to=DEST, amount_wei=2), NativeTransfer(to=DEST, amount_wei=3),
+        ]))
+    before = w3.eth.get_balance(DEST)
+    orchestrator._execute(keys, plans, [0] * len(keys), 4, scheduled)
+    for p in plans:
+        assert w3.eth.get_transaction_count(p.owner) == 3
+    assert w3.eth.get_balance(DEST) - before == 4 * (1 + 2 + 3)
+
+def test_concurrency_limit_and_wallet_isolation(monkeypatch):
+    lock = threading.Lock()
+    active, peak, done = [0], [0], []
+    keys = _keys("limit", 6)
+
+    def run(w3, pk, cfg, plan, start):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        if pk == keys[2]:
+            raise RuntimeError("boom")
+        done.append(pk)
+
+    monkeypatch.setattr(chain, "get_w3", lambda: None)
+    monkeypatch.setattr(strategy, "run_for_wallet", run)
+    monkeypatch.setattr(orchestrator, "time", SimpleNamespace(sleep=lambda s: None))
+    orchestrator._execute(keys, [None] * 6, [0] * 6, 3, False)
+    assert peak[0] == 3
+    assert sorted(done) == sorted(k for k in keys if k != keys[2])
@@ -0,0 +1,71 @@
+import time
+from collections import Counter
+
+from web3 import Web3
+
+from src.config import TOKENS, V3_FACTORY, V3_FEE
+from src.pools import ZERO_ADDRESS, PoolIndex
+from src.simchain import SimChain, SimProvider
+
+TA, TB, TC = sorted(m["address"] for m in TOKENS.values())[:3]
+
+class _Counting(SimProvider):
+    def __init__(self, chain=None):
+        super().__init__(chain)
+        self.calls = Counter()
+
+    def make_request(self, method, params):
+        self.calls[method] += 1
+        return super().make_request(method, params)
+
+def _sim(chain_id: int | None = None):
+    prov = _Counting(SimChain(chain_id) if chain_id else None)
+    return Web3(prov), prov
+
+def test_get_caches_and_persists(tmp_path):
+    w3, prov = _sim()
+    path = str(tmp_path / "pools.json")
+    idx = PoolIndex(path)
+    addr = idx.get(w3, V3_FACTORY, TA, TB, V3_FEE)
+    assert addr == Web3.to_checksum_address(prov.chain.pool(TA, TB, V3_FEE).address)
+    assert idx.get(w3, V3_FACTORY, TB, TA, V3_FEE) == addr  # порядок токенов не важен
+    assert prov.calls["eth_call"] == 1
+    # новый процесс: адрес пула — из файла, без getPool
+    assert PoolIndex(path).get(w3, V3_FACTORY, TA, TB, V3_FEE) == addr
+    assert prov.calls["eth_call"] == 1
+
+def test_missing_pool_is_cached_only_for_ttl(tmp_path):
+    w3, prov = _sim()
+    idx = PoolIndex(str(tmp_path / "pools.json"), zero_ttl=0.5)
+    assert idx.get(w3, V3_FACTORY, TA, TB, 1) == ZERO_ADDRESS
+    assert idx.get(w3, V3_FACTORY, TA, TB, 1) == ZERO_ADDRESS
+    assert prov.calls["eth_call"] == 1
+    p = prov.chain.create_pool(TA, TB, 1, 1 << 96)
+    time.sleep(0.55)
+    assert idx.get(w3, V3_FACTORY, TA, TB, 1) == Web3.to_checksum_address(p.address)
+    assert PoolIndex(idx.path).lookup(w3, V3_FACTORY, TA, TB, 1) is not None
+
+def test_invalidate_drops_cached_zero(tmp_path):
+    w3, prov = _sim()
+    idx = PoolIndex(str(tmp_path / "pools.json"))
+    assert idx.get(w3, V3_FACTORY, TA, TB, 1) == ZERO_ADDRESS
+    prov.chain.create_pool(TA, TB, 1, 1 << 96)
+    idx.invalidate(w3, V3_FACTORY, TA, TB, 1)
+    assert idx.get(w3, V3_FACTORY, TA, TB, 1) != ZERO_ADDRESS
+
+def test_warm_is_one_multicall(tmp_path):
+    w3, prov = _sim()
+    idx = PoolIndex(str(tmp_path / "pools.json"))
+    triples = [(TA, TB, V3_FEE), (TA, TC, V3_FEE), (TB, TC, V3_FEE), (TA, TB, 1)]
+    assert idx.warm(w3, V3_FACTORY, triples) == 4
+    assert prov.calls["eth_call"] == 1
+    assert idx.warm(w3, V3_FACTORY, triples) == 0
+    assert idx.get_many(w3, V3_FACTORY, triples)[3] == ZERO_ADDRESS
+
+def test_index_is_per_chain(tmp_path):
+    path = str(tmp_path / "pools.json")
+    w3a, _ = _sim()
+    w3b, _ = _sim(chain_id=4242)
+    PoolIndex(path).get(w3a, V3_FACTORY, TA, TB, V3_FEE)
+    # та же фабрика в другой сети — в индексе её пула нет
+    assert PoolIndex(path).lookup(w3b, V3_FACTORY, TA, TB, V3_FEE) is None
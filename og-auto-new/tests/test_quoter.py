@@ -0,0 +1,58 @@
+import pytest
+
+from src import v3math
+from src.pools import POOLS
+from src.quoter import SwapQuoter
+
+T0, T1, POOL = "0x" + "1" * 40, "0x" + "2" * 40, "0x" + "3" * 40
+FEE = 3000
+LIQ = 10**21
+# цена посередине ячейки [60, 120)
+TICK = 90
+SQRT_P = v3math.sqrt_ratio_at_tick(TICK)
+
+@pytest.fixture
+def quoter(monkeypatch):
+    def make(quoter_addr="", skip_crossing=False):
+        q = SwapQuoter(None, factory="0xfactory", quoter=quoter_addr, slippage_bps=50,
+                       max_impact_bps=10_000, skip_crossing=skip_crossing)
+        monkeypatch.setattr(POOLS, "get_many", lambda w3, factory, triples: [POOL] * len(triples))
+        monkeypatch.setattr(q, "pool_state", lambda pool: (SQRT_P, TICK, LIQ))
+        return q
+    return make
+
+def test_inside_cell_is_exact_local_quote(quoter):
+    q = quoter().quote(T0, T1, FEE, 10**15)
+    got, _ = v3math.swap_exact_input(SQRT_P, LIQ, 10**15, FEE, True)
+    assert q.source == "local" and q.amount_out == got
+    assert q.min_out == v3math.with_slippage(got, 50)
+
+def test_crossing_without_quoter_uses_in_cell_bound(quoter):
+    amt = 10**19
+    q = quoter().quote(T0, T1, FEE, amt)
+    got, nxt = v3math.swap_exact_input(SQRT_P, LIQ, amt, FEE, True)
+    assert nxt < v3math.sqrt_ratio_at_tick(60)   # правда выходит из ячейки
+    bound = v3math.amount1_delta(v3math.sqrt_ratio_at_tick(60), SQRT_P, LIQ)
+    assert q.source == "local_bound" and q.amount_out == got
+    assert 0 < bound < got
+    assert q.min_out == v3math.with_slippage(bound, 50)
+
+def test_crossing_upwards_bound(quoter):
+    q = quoter().quote(T1, T0, FEE, 10**19)
+    bound = v3math.amount0_delta(SQRT_P, v3math.sqrt_ratio_at_tick(120), LIQ)
+    assert q.source == "local_bound"
+    assert q.min_out == v3math.with_slippage(bound, 50)
+
+def test_crossing_skipped_behind_flag(quoter):
+    q = quoter(skip_crossing=True).quote(T0, T1, FEE, 10**19)
+    assert q.skip == "crosses tick without quoter" and q.min_out == 0
+    assert quoter(skip_crossing=True).quote(T0, T1, FEE, 10**15).skip is None
+
+def test_crossing_with_quoter_goes_remote(quoter, monkeypatch):
+    q = quoter(quoter_addr="0x" + "4" * 40)
+    seen = []
+    monkeypatch.setattr(q, "_quote_remote", lambda items, pools: seen.extend(items) or
+                        [q._judge(123, 0, "quoter") for _ in items])
+    res = q.quote_many([(T0, T1, FEE, 10**15), (T0, T1, FEE, 10**19)])
+    assert [r.source for r in res] == ["local", "quoter"]
+    assert seen == [(T0, T1, FEE, 10**19)]
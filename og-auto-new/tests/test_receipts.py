@@ -0,0 +1,63 @@
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from src.config import SIM_BASE_FEE, SIM_CHAIN_ID
+from src.head import get_head
+from src.receipts import ReceiptTracker
+from src.simchain import SimProvider
+
+ACCT = Account.from_key("0x" + "22" * 32)
+DEST = "0x000000000000000000000000000000000000dEaD"
+
+class _NoBlockReceipts(SimProvider):
+    """Нода без eth_getBlockReceipts."""
+
+    def make_request(self, method, params):
+        if method == "eth_getBlockReceipts":
+            return {"jsonrpc": "2.0", "id": 0, "error": {"code": -32601, "message": "method not found"}}
+        return super().make_request(method, params)
+
+def _send(w3: Web3, nonce: int) -> str:
+    tx = {"chainId": SIM_CHAIN_ID, "nonce": nonce, "to": DEST, "value": 1, "gas": 21_000,
+          "maxFeePerGas": SIM_BASE_FEE * 2, "maxPriorityFeePerGas": 1, "type": 2}
+    return w3.eth.send_raw_transaction(ACCT.sign_transaction(tx).rawTransaction).hex()
+
+@pytest.mark.parametrize("provider", [SimProvider, _NoBlockReceipts])
+def test_many_hashes_resolve_from_one_poller(provider):
+    w3 = Web3(provider())
+    tr = ReceiptTracker(w3, poll_interval=0.02, timeout=5)
+    seen = get_head(w3).peek()
+    hashes = [_send(w3, n) for n in range(5)]
+    futs = [tr.track(h, since=seen) for h in hashes]
+    recs = [f.result(timeout=5) for f in futs]
+    assert [r["transactionHash"].hex() for r in recs] == hashes
+    assert all(r["status"] == 1 for r in recs)
+    assert tr.pending() == 0
+
+def test_track_is_idempotent_and_remembers_done():
+    w3 = Web3(SimProvider())
+    tr = ReceiptTracker(w3, poll_interval=0.02, timeout=5)
+    seen = get_head(w3).peek()
+    h = _send(w3, 0)
+    f = tr.track(h, since=seen)
+    assert tr.track(h) is f
+    f.result(timeout=5)
+    assert tr.track(h) is f  # уже готовый — без нового опроса
+
+def test_mined_before_track_is_found():
+    # tx попала в блок раньше, чем её отдали трекеру, и поллер этот блок уже прошёл
+    w3 = Web3(SimProvider())
+    tr = ReceiptTracker(w3, poll_interval=0.02, timeout=5)
+    tr.track(_send(w3, 0)).result(timeout=5)
+    seen = get_head(w3).peek()
+    h = _send(w3, 1)
+    _send(w3, 2)
+    assert tr.track(h, since=seen).result(timeout=5)["transactionHash"].hex() == h
+
+def test_unknown_hash_times_out():
+    w3 = Web3(SimProvider())
+    tr = ReceiptTracker(w3, poll_interval=0.02, timeout=5)
+    with pytest.raises(TimeoutError):
+        tr.track("0x" + "ab" * 32, timeout=0.2).result(timeout=5)
+    assert tr.pending() == 0
@@ -0,0 +1,32 @@
+import pytest
+
+from src import contracts_llm, specs
+from src.specs import SpecCache
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    c = SpecCache(str(tmp_path / "specs.json"))
+    monkeypatch.setattr(specs, "get_spec_cache", lambda: c)
+    return c
+
+def _ids(sel):
+    p = sel["params"]
+    return p["name"].lower(), p["symbol"].lower()
+
+def test_cached_spec_comes_first(cache):
+    assert cache.add_many([{"kind": "erc20_fixed", "params": {"name": "Alpha", "symbol": "ALP"}}]) == 1
+    assert contracts_llm._local_fallback("0x0")["params"]["symbol"] == "ALP"
+
+def test_mark_seen_rejects_repeats(cache):
+    sel = contracts_llm._fallback_spec(123, 45)
+    assert cache.mark_seen(sel)
+    assert not cache.mark_seen(contracts_llm._fallback_spec(124, 45))
+    assert not SpecCache(cache.path).mark_seen(contracts_llm._fallback_spec(123, 46))  # с диска
+
+def test_fallback_unique_after_random_space_exhausted(cache):
+    # все 90 случайных символов F10..F99 уже выданы в прошлых запусках
+    for sym in range(10, 100):
+        assert cache.mark_seen(contracts_llm._fallback_spec(sym, sym))
+    got = [_ids(contracts_llm._local_fallback("0x0")) for _ in range(5)]
+    assert got[0] == ("farm1000", "f1000")
+    assert len({n for n, _ in got}) == 5 and len({s for _, s in got}) == 5
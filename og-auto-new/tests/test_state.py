@@ -0,0 +1,106 @@
+import hashlib
+import time
+from types import SimpleNamespace
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from src import allowances, dex, gas, state, util
+from src.allowances import AllowanceLedger
+from src.config import ROUTER, TOKENS
+from src.nonce import NONCES
+from src.simchain import SimProvider
+from src.state import StateStore
+
+TOKEN_IN, TOKEN_OUT = sorted(m["address"] for m in TOKENS.values())[:2]
+
+class _W3:
+    def __init__(self, cid: int):
+        self.eth = SimpleNamespace(chain_id=cid)
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(state, "STATE_DB_PATH", str(tmp_path / "state.sqlite"))
+    monkeypatch.setattr(state, "_STATES", {})
+    monkeypatch.setattr(util, "_CHAIN_IDS", {})  # кэш по id(w3): id временных объектов переиспользуются
+    return tmp_path
+
+def test_store_per_chain_of_callers_w3(stores):
+    a, b = _W3(1), _W3(16601)
+    sa, sb = state.get_state(a), state.get_state(b)
+    assert sa is not sb
+    assert sa.path == str(stores / "state.1.sqlite")
+    assert sb.path == str(stores / "state.16601.sqlite")
+    assert state.get_state(_W3(1)) is sa
+
+def test_chains_do_not_share_rows(stores):
+    a, b = _W3(1), _W3(2)
+    state.get_state(a).put_gas("swap:x", [100_000])
+    state.get_state(a).flush()
+    assert [r["shape"] for r in state.get_state(a).rows("SELECT shape FROM gas")] == ["swap:x"]
+    assert state.get_state(b).rows("SELECT shape FROM gas") == []
+
+def test_disabled_without_path(monkeypatch):
+    monkeypatch.setattr(state, "STATE_DB_PATH", "")
+    assert state.get_state(_W3(1)) is None
+
+def _allowance(store: StateStore, owner: str, token: str, spender: str):
+    store.flush()
+    rows = store.rows("SELECT value FROM allowances WHERE owner = ? AND token = ? AND spender = ?",
+                      (owner.lower(), token.lower(), spender.lower()))
+    return int(rows[0]["value"]) if rows else None
+
+def _until(pred, timeout: float = 5.0):
+    # on_ok / on_fail зовутся из колбэка future — чуть позже, чем _send вернул receipt
+    end = time.monotonic() + timeout
+    while not pred() and time.monotonic() < end:
+        time.sleep(0.01)
+    return pred()
+
+def test_only_confirmed_allowances_are_persisted(tmp_path):
+    store = StateStore(str(tmp_path / "s.sqlite"))
+    led = AllowanceLedger()
+    led.sink = store.put_allowance
+    k = ("0xa", "0xt", "0xs")
+    led.set(*k, 100)
+    assert _allowance(store, *k) is None  # отправлен, но не подтверждён
+    led.confirm_approve(*k, 100)
+    assert _allowance(store, *k) == 100
+    led.spend(*k, 30)
+    assert _allowance(store, *k) == 100
+    led.confirm_spend(*k, 30)
+    assert _allowance(store, *k) == 70
+    led.forget(*k)
+    assert _allowance(store, *k) is None
+
+def test_receipts_drive_persisted_allowance(tmp_path, monkeypatch):
+    w3 = Web3(SimProvider())
+    store = StateStore(str(tmp_path / "s.sqlite"))
+    led = AllowanceLedger()
+    led.sink = store.put_allowance
+    monkeypatch.setattr(dex, "ALLOWANCES", led)
+    acct = Account.from_key("0x" + hashlib.sha256(b"test-state:receipts").hexdigest())
+    NONCES.reset(acct.address)
+
+    dex.ensure_allowance(w3, acct, TOKEN_IN, ROUTER, 10**18)
+    assert _until(lambda: _allowance(store, acct.address, TOKEN_IN, ROUTER) is not None)
+    approved = _allowance(store, acct.address, TOKEN_IN, ROUTER)
+    assert approved >= 10**18
+
+    # ревертнувшийся swap: запись сбрасывается, следующий запуск перечитает цепь
+    dex.v3_exactInputSingle(w3, acct, TOKEN_IN, TOKEN_OUT, 10**15, min_amount_out=2**200)
+    assert _until(lambda: _allowance(store, acct.address, TOKEN_IN, ROUTER) is None)
+
+def test_attach_restores_fresh_confirmed_allowances(tmp_path, monkeypatch):
+    store = StateStore(str(tmp_path / "s.sqlite"))
+    store.put_allowance(("0xa", "0xt", "0xs"), 5)
+    store.put("allowances", {"owner": "0xb", "token": "0xt", "spender": "0xs", "value": "9", "updated": 0.0})
+    store.flush()
+    led, model = AllowanceLedger(), gas.GasModel()
+    monkeypatch.setattr(allowances, "ALLOWANCES", led)
+    monkeypatch.setattr(gas, "GAS", model)
+    assert store.attach() == {"allowances": 1, "gas": 0}
+    assert led.peek("0xa", "0xt", "0xs") == 5
+    assert led.peek("0xb", "0xt", "0xs") is None  # старше STATE_ALLOWANCE_TTL — из цепи
+    assert led.sink == store.put_allowance and model.sink == store.put_gas
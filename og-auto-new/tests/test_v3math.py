@@ -0,0 +1,128 @@
+import random
+
+import pytest
+
+from src import v3math as m
+
+def test_tick_bounds_match_sqrt_ratio_bounds():
+    assert m.sqrt_ratio_at_tick(m.MIN_TICK) == m.MIN_SQRT_RATIO
+    assert m.sqrt_ratio_at_tick(m.MAX_TICK) == m.MAX_SQRT_RATIO
+    assert m.tick_at_sqrt_ratio(m.MIN_SQRT_RATIO) == m.MIN_TICK
+    assert m.tick_at_sqrt_ratio(m.MAX_SQRT_RATIO - 1) == m.MAX_TICK - 1
+
+def test_tick_out_of_range():
+    with pytest.raises(ValueError):
+        m.sqrt_ratio_at_tick(m.MAX_TICK + 1)
+    with pytest.raises(ValueError):
+        m.tick_at_sqrt_ratio(m.MAX_SQRT_RATIO)
+
+def test_sqrt_ratio_known_values():
+    # значения из тестов TickMath в v3-core
+    assert m.sqrt_ratio_at_tick(0) == m.Q96
+    assert m.sqrt_ratio_at_tick(50) == 79426470787362580746886972461
+    assert m.sqrt_ratio_at_tick(-50) == 79030349367926598376800521322
+
+def test_tick_sqrt_round_trip():
+    rnd = random.Random(1)
+    ticks = [m.MIN_TICK, -1, 0, 1, m.MAX_TICK - 1] + [rnd.randint(m.MIN_TICK, m.MAX_TICK - 1) for _ in range(200)]
+    for t in ticks:
+        p = m.sqrt_ratio_at_tick(t)
+        assert m.tick_at_sqrt_ratio(p) == t
+        # любая цена внутри ячейки [t, t+1) даёт тот же тик
+        assert m.tick_at_sqrt_ratio(m.sqrt_ratio_at_tick(t + 1) - 1) == t
+
+def test_encode_price_sqrt():
+    assert m.encode_price_sqrt(1, 1) == m.Q96
+    assert m.encode_price_sqrt(100, 1) == 10 * m.Q96
+    assert m.price_to_sqrt_x96(1.0) == m.Q96
+    # 2000 USDC(6) за 1 WETH(18)
+    p = m.price_to_sqrt_x96(2000, decimals0=18, decimals1=6)
+    assert m.sqrt_x96_to_price(p, decimals0=18, decimals1=6) == pytest.approx(2000, rel=1e-12)
+
+def test_range_around_is_aligned():
+    for fee, spacing in m.TICK_SPACING.items():
+        lo, hi = m.range_around(12345, fee, 600)
+        assert lo % spacing == 0 and hi % spacing == 0
+        assert lo <= 12345 - 600 and hi >= 12345 + 600 and lo < hi
+        full = m.range_around(0, fee)
+        assert full == m.usable_range(spacing)
+        assert m.MIN_TICK <= full[0] and full[1] <= m.MAX_TICK
+
+# LiquidityAmounts из тестов v3-periphery: диапазон [100/110, 110/100], desired 100 / 200
+@pytest.mark.parametrize("price,liq,amounts", [
+    ((1, 1), 2148, (99, 99)),        # цена внутри диапазона
+    ((99, 110), 1048, (99, 0)),      # ниже — только token0
+    ((111, 100), 2097, (0, 199)),    # выше — только token1
+])
+def test_liquidity_amounts_vectors(price, liq, amounts):
+    sa, sb = m.encode_price_sqrt(100, 110), m.encode_price_sqrt(110, 100)
+    p = m.encode_price_sqrt(*price)
+    assert m.liquidity_for_amounts(p, sa, sb, 100, 200) == liq
+    assert m.amounts_for_liquidity(p, sa, sb, liq) == amounts
+
+# exact=True — целочисленный цикл, exact=False — numpy (если установлен; иначе тот же цикл)
+@pytest.mark.parametrize("exact", [True, False])
+def test_liquidity_many_matches_vectors(exact):
+    sa, sb = m.encode_price_sqrt(100, 110), m.encode_price_sqrt(110, 100)
+    prices = [m.encode_price_sqrt(*p) for p in ((1, 1), (99, 110), (111, 100))]
+    got = m.liquidity_many(prices, [sa] * 3, [sb] * 3, [100] * 3, [200] * 3, exact=exact)
+    assert got == [(2148, 99, 99), (1048, 99, 0), (2097, 0, 199)]
+
+def test_positions_many_exact_matches_scalar():
+    rnd = random.Random(3)
+    ps, los, his, a0s, a1s = [], [], [], [], []
+    for _ in range(50):
+        tick = rnd.randint(-50_000, 50_000)
+        lo, hi = m.range_around(tick, 500, rnd.choice((0, 10, 100, 1000)))
+        ps.append(m.sqrt_ratio_at_tick(tick + rnd.randint(-2_000, 2_000)))
+        los.append(lo)
+        his.append(hi)
+        a0s.append(rnd.randint(10**12, 10**24))
+        a1s.append(rnd.randint(10**12, 10**24))
+    want = []
+    for p, lo, hi, a0, a1 in zip(ps, los, his, a0s, a1s):
+        sa, sb = m.sqrt_ratio_at_tick(lo), m.sqrt_ratio_at_tick(hi)
+        liq = m.liquidity_for_amounts(p, sa, sb, a0, a1)
+        assert liq == m.position(p, lo, hi, a0, a1)[0]
+        want.append((liq, *m.amounts_for_liquidity(p, sa, sb, liq)))
+    assert m.positions_many(ps, los, his, a0s, a1s, exact=True) == want
+    assert m.sqrt_ratios_at_ticks(los, exact=True) == [m.sqrt_ratio_at_tick(t) for t in los]
+
+    np = pytest.importorskip("numpy")
+    fast = m.positions_many(ps, los, his, a0s, a1s)
+    for (l_, u0, u1), (wl, w0, w1) in zip(fast, want):
+        assert np.isclose(l_, wl, rtol=1e-9) and np.isclose(u0, w0, rtol=1e-9, atol=1)
+        assert np.isclose(u1, w1, rtol=1e-9, atol=1)
+
+def test_many_without_numpy_is_exact(monkeypatch):
+    monkeypatch.setattr(m, "_np", lambda: None)
+    p, lo, hi = m.sqrt_ratio_at_tick(100), -600, 600
+    liq, a0, a1 = m.positions_many([p], [lo], [hi], [10**18], [10**18])[0]
+    assert liq == m.position(p, lo, hi, 10**18, 10**18)[0]
+    assert m.positions_many([], [], [], [], []) == []
+
+def test_position_never_exceeds_desired():
+    rnd = random.Random(2)
+    for _ in range(100):
+        tick = rnd.randint(-50_000, 50_000)
+        p = m.sqrt_ratio_at_tick(tick) + rnd.randint(0, 10**9)
+        lo, hi = m.range_around(tick, 3000, rnd.choice((0, 60, 600, 6000)))
+        a0, a1 = rnd.randint(10**12, 10**24), rnd.randint(10**12, 10**24)
+        liq, need0, need1 = m.position(p, lo, hi, a0, a1)
+        assert liq > 0
+        assert need0 <= a0 and need1 <= a1
+        # одна из сторон выбрана почти целиком — ликвидность максимальна
+        assert max(need0 / a0, need1 / a1) > 0.999
+
+def test_with_slippage():
+    assert m.with_slippage(10_000, 50) == 9_950
+    assert m.with_slippage(1, 50) == 0
+
+def test_swap_step_moves_price_the_right_way():
+    p, liq = m.Q96, 10**24
+    out, nxt = m.swap_exact_input(p, liq, 10**18, 3000, zero_for_one=True)
+    assert nxt < p and 0 < out < 10**18
+    out, nxt = m.swap_exact_input(p, liq, 10**18, 3000, zero_for_one=False)
+    assert nxt > p and 0 < out < 10**18
+    with pytest.raises(ValueError):
+        m.swap_exact_input(p, 0, 1, 3000, True)